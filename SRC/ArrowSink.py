@@ -0,0 +1,428 @@
+#!/usr/bin/env python
+
+########################################################################
+# PETRUS/SRC/ArrowSink.py:
+# This is the Arrow Sink Module of PETRUS tool
+# It publishes the Preprocessing results of each receiver and day as
+# an Arrow IPC stream, so that other processes can use them while
+# PETRUS runs without parsing the PREPRO OBS text files: through a
+# memory-mapped file or through a local socket
+#
+#  Project:        PETRUS
+#  File:           ArrowSink.py
+#  Date(YY/MM/DD): 26/10/17
+#
+#   Author: PETRUS contributors
+#
+# -----------------------------------------------------------------
+# Date       | Author             | Action
+# -----------------------------------------------------------------
+# 26/10/17   | PETRUS contrib.    | Created
+#
+# Usage:
+#   ArrowSink.py $STREAM
+#   (follows an Arrow stream, .arrows file or .sock socket, and
+#   reports its record batches)
+########################################################################
+
+
+# Import External and Internal functions and Libraries
+#----------------------------------------------------------------------
+import sys, os
+import time
+import socket
+import threading
+from InputOutput import getPreproCols
+from InputOutput import buildPreproTable
+from InputOutput import pyarrow
+if pyarrow is not None:
+    import pyarrow.ipc
+    import pyarrow.compute
+
+# Arrow streams
+#----------------------------------------------------------------------
+# Arrow stream of a receiver and day inside OUT/PPVE, without extension
+ArrowStreamFmt = "PREPRO_OBS_%s_Y%02dD%03d"
+
+# Extension of each kind of Arrow stream
+ArrowStreamExt = {"FILE": ".arrows", "SOCKET": ".sock"}
+
+# Consumers waiting to be accepted by a socket
+ArrowSocketBacklog = 16
+
+# Period to look for new record batches in a stream file [s]
+ArrowPollPeriod = 0.1
+
+# End of stream mark
+ArrowEndOfStream = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+# Arrow sink functions
+#----------------------------------------------------------------------
+def readArrowStreamFile(Path, Pos=None, Schema=None):
+
+    # Purpose: read the record batches of an Arrow stream file without
+    #          copying them: they point into the memory-mapped file.
+    #          It may be still being written, so a trailing incomplete
+    #          message is left for later
+
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to Arrow stream file
+    # Pos: int
+    #         Position to go on reading from (with its Schema), as
+    #         returned by a previous call
+    # Schema: pyarrow.Schema
+    #         Schema of the stream, if Pos is given
+
+    # Returns
+    # =======
+    # Batches: list
+    #         Record batches read (zero-copy)
+    # Pos: int
+    #         Position after the last complete message
+    # Schema: pyarrow.Schema
+    #         Schema of the stream
+    # Complete: bool
+    #         True if the end of the stream was reached
+
+    Batches = []
+    Complete = False
+    Source = pyarrow.memory_map(Path, 'r')
+    Source.seek(Pos if Pos is not None else 0)
+    while True:
+        Pos = Source.tell()
+        try:
+            Message = pyarrow.ipc.read_message(Source)
+
+        # The end of the data: either the end of the stream mark, or
+        # the writer has not written more yet
+        except EOFError:
+            Source.seek(Pos)
+            Complete = Source.read(len(ArrowEndOfStream)) == ArrowEndOfStream
+            break
+
+        # An incomplete message being written
+        except OSError:
+            break
+
+        if Schema is None:
+            Schema = pyarrow.ipc.read_schema(Message)
+        else:
+            Batches.append(pyarrow.ipc.read_record_batch(Message, Schema))
+
+    return Batches, Pos, Schema, Complete
+
+# End of readArrowStreamFile()
+
+
+def followArrowStream(Path, Timeout=None):
+
+    # Purpose: follow an Arrow stream of Preprocessing results while it
+    #          is being published, up to its end
+
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to Arrow stream: file (.arrows), read through memory
+    #         mapping, or socket (.sock), read as it is received
+    # Timeout: float
+    #         Maximum time to wait for the stream to start [s] (None:
+    #         wait forever)
+
+    # Returns
+    # =======
+    # Batch: pyarrow.RecordBatch (generator)
+    #         Record batches of Preprocessing results, in order
+
+    # Wait for the stream
+    Start = time.perf_counter()
+    while not os.path.exists(Path):
+        if Timeout is not None and time.perf_counter() - Start > Timeout:
+            return
+        time.sleep(ArrowPollPeriod)
+
+    # Socket: read the stream as it is received
+    if Path.endswith(ArrowStreamExt["SOCKET"]):
+        Connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        Connection.connect(Path)
+        with Connection.makefile('rb') as Source:
+            for Batch in pyarrow.ipc.open_stream(Source):
+                yield Batch
+        Connection.close()
+        return
+
+    # File: map the new record batches as they are written
+    Pos = None
+    Schema = None
+    Complete = False
+    while not Complete:
+        Batches, Pos, Schema, Complete = readArrowStreamFile(Path,
+        Pos=Pos, Schema=Schema)
+        for Batch in Batches:
+            yield Batch
+        if not Batches and not Complete:
+            time.sleep(ArrowPollPeriod)
+
+# End of followArrowStream()
+
+
+def acceptArrowConsumers(ArrowSink):
+
+    # Purpose: accept the consumers of an Arrow socket, sending them
+    #          the schema of the stream (run in a background thread)
+
+    # Parameters
+    # ==========
+    # ArrowSink: dict
+    #         Arrow sink (see createArrowSink)
+
+    # Returns
+    # =======
+    # Nothing
+
+    while True:
+        try:
+            Connection, Addr = ArrowSink["SOCKET"].accept()
+        except OSError:
+            # Socket closed
+            return
+
+        Source = Connection.makefile('wb')
+        try:
+            Writer = pyarrow.ipc.new_stream(Source, ArrowSink["SCHEMA"])
+            Source.flush()
+        except OSError:
+            Connection.close()
+            continue
+
+        with ArrowSink["LOCK"]:
+            ArrowSink["CONSUMERS"].append((Connection, Source, Writer))
+
+# End of acceptArrowConsumers()
+
+
+def createArrowSink(Path, Mode, Rows=0, ResumeSod=None):
+
+    # Purpose: open the Arrow stream of the Preprocessing results of a
+    #          receiver and day
+
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to Arrow stream, without extension
+    # Mode: str
+    #         FILE: memory-mappable stream file
+    #         SOCKET: local socket the consumers connect to. Each one
+    #         receives the record batches published since it connected
+    # Rows: int
+    #         Rows gathered in each record batch (0: one record batch
+    #         each time results are published)
+    # ResumeSod: float
+    #         Last epoch of the checkpoint, if resuming. The results of
+    #         the stream file up to it are kept
+
+    # Returns
+    # =======
+    # ArrowSink: dict
+    #         Arrow sink:
+    #         ArrowSink["PATH"]: path to Arrow stream
+    #         ArrowSink["SCHEMA"]: schema of the stream
+    #         ArrowSink["ROWS"]: rows gathered in each record batch
+    #         ArrowSink["BUFFER"], ["NROWS"]: columns and rows pending
+    #         to be published
+    #         ArrowSink["FILE"], ["WRITER"]: stream file and writer (FILE)
+    #         ArrowSink["SOCKET"], ["CONSUMERS"], ["LOCK"]: listening
+    #         socket, consumers connected and their lock (SOCKET)
+
+    Path = Path + ArrowStreamExt[Mode]
+    ArrowSink = {"PATH": Path, "SCHEMA": buildPreproTable([]).schema,
+    "ROWS": Rows, "BUFFER": [], "NROWS": 0, "FILE": None, "WRITER": None,
+    "SOCKET": None, "CONSUMERS": [], "LOCK": threading.Lock()}
+
+    # Display Message
+    print("INFO: Creating Arrow stream: %s..." % Path)
+
+    # Create output directory, if needed
+    if not os.path.exists(os.path.dirname(Path)):
+        os.makedirs(os.path.dirname(Path))
+
+    if Mode == "FILE":
+        # Keep the results already published, if resuming
+        Kept = []
+        if ResumeSod is not None and os.path.exists(Path):
+            Batches, Pos, Schema, Complete = readArrowStreamFile(Path)
+            Kept = [Batch.filter(pyarrow.compute.less_equal(
+                Batch.column("SOD"), ResumeSod)) for Batch in Batches]
+
+        # Start the new stream aside and rename it, so that the
+        # consumers of the previous one are not disturbed
+        TmpFile = os.path.dirname(Path) + "/." + os.path.basename(Path) + ".tmp"
+        ArrowSink["FILE"] = open(TmpFile, 'wb')
+        ArrowSink["WRITER"] = pyarrow.ipc.new_stream(ArrowSink["FILE"],
+        ArrowSink["SCHEMA"])
+        for Batch in Kept:
+            if Batch.num_rows > 0:
+                ArrowSink["WRITER"].write_batch(Batch)
+        ArrowSink["FILE"].flush()
+        os.replace(TmpFile, Path)
+
+    else:
+        # Listen to the consumers
+        if os.path.exists(Path):
+            os.remove(Path)
+        ArrowSink["SOCKET"] = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        ArrowSink["SOCKET"].bind(Path)
+        ArrowSink["SOCKET"].listen(ArrowSocketBacklog)
+        threading.Thread(target=acceptArrowConsumers, args=(ArrowSink,),
+        daemon=True).start()
+
+    return ArrowSink
+
+# End of createArrowSink()
+
+
+def publishPreproArrow(ArrowSink, PreproObsInfo):
+
+    # Purpose: publish Preprocessing results (an epoch, or the whole
+    #          day of the batch engine), as soon as there are rows
+    #          enough for a record batch
+
+    # Parameters
+    # ==========
+    # ArrowSink: dict
+    #         Arrow sink (see createArrowSink)
+    # PreproObsInfo: dict or numpy structured array
+    #         Dictionary containing Preprocessing info for the
+    #         current epoch, or one row per satellite (PreproObsDtype)
+
+    # Returns
+    # =======
+    # Nothing
+
+    Cols = getPreproCols(PreproObsInfo)
+    if len(Cols["SOD"]) == 0:
+        return
+
+    ArrowSink["BUFFER"].append(Cols)
+    ArrowSink["NROWS"] += len(Cols["SOD"])
+    if ArrowSink["NROWS"] >= ArrowSink["ROWS"]:
+        flushArrowSink(ArrowSink)
+
+# End of publishPreproArrow()
+
+
+def flushArrowSink(ArrowSink):
+
+    # Purpose: publish the rows pending in the Arrow sink as a record
+    #          batch (e.g. before a checkpoint)
+
+    # Parameters
+    # ==========
+    # ArrowSink: dict
+    #         Arrow sink (see createArrowSink)
+
+    # Returns
+    # =======
+    # Nothing
+
+    if ArrowSink["NROWS"] == 0:
+        return
+
+    Batch = buildPreproTable(ArrowSink["BUFFER"]).combine_chunks().to_batches()[0]
+    ArrowSink["BUFFER"] = []
+    ArrowSink["NROWS"] = 0
+
+    # Stream file: append it and make it visible to the consumers
+    if ArrowSink["WRITER"] is not None:
+        ArrowSink["WRITER"].write_batch(Batch)
+        ArrowSink["FILE"].flush()
+
+    # Socket: send it to every consumer, forgetting the ones gone
+    else:
+        with ArrowSink["LOCK"]:
+            for Consumer in list(ArrowSink["CONSUMERS"]):
+                Connection, Source, Writer = Consumer
+                try:
+                    Writer.write_batch(Batch)
+                    Source.flush()
+                except OSError:
+                    ArrowSink["CONSUMERS"].remove(Consumer)
+                    Connection.close()
+
+# End of flushArrowSink()
+
+
+def closeArrowSink(ArrowSink):
+
+    # Purpose: end the Arrow stream
+
+    # Parameters
+    # ==========
+    # ArrowSink: dict
+    #         Arrow sink (see createArrowSink)
+
+    # Returns
+    # =======
+    # Nothing
+
+    # Publish the rows pending
+    flushArrowSink(ArrowSink)
+
+    # Stream file: write the end of the stream
+    if ArrowSink["WRITER"] is not None:
+        ArrowSink["WRITER"].close()
+        ArrowSink["FILE"].close()
+
+    # Socket: stop accepting consumers and end their streams
+    else:
+        ArrowSink["SOCKET"].close()
+        os.remove(ArrowSink["PATH"])
+        with ArrowSink["LOCK"]:
+            for Connection, Source, Writer in ArrowSink["CONSUMERS"]:
+                try:
+                    Writer.close()
+                    Source.close()
+                except OSError:
+                    pass
+                Connection.close()
+            ArrowSink["CONSUMERS"] = []
+
+# End of closeArrowSink()
+
+
+#----------------------------------------------------------------------
+# INTERNAL FUNCTIONS
+#----------------------------------------------------------------------
+
+def displayUsage():
+    sys.stderr.write("ERROR: Please provide path to Arrow stream "\
+        "(.arrows file or .sock socket):\n"\
+        "  ArrowSink.py $STREAM\n")
+
+#######################################################
+# MAIN BODY
+#######################################################
+
+if __name__ == "__main__":
+    # Check InputOutput Arguments
+    if len(sys.argv) != 2:
+        displayUsage()
+        sys.exit(-1)
+    if pyarrow is None:
+        sys.stderr.write("ERROR: Arrow streams require the pyarrow package\n")
+        sys.exit(-1)
+
+    # Follow the stream
+    NRows = 0
+    Start = time.perf_counter()
+    for Batch in followArrowStream(sys.argv[1]):
+        NRows = NRows + Batch.num_rows
+        print("SOD %05d-%05d: %d rows" % (Batch.column("SOD")[0].as_py(),
+        Batch.column("SOD")[-1].as_py(), Batch.num_rows))
+
+    print("INFO: %d rows in %.2f s" % (NRows, time.perf_counter() - Start))
+
+########################################################################
+# END OF ARROW SINK MODULE
+########################################################################
@@ -0,0 +1,756 @@
+#!/usr/bin/env python
+
+########################################################################
+# PETRUS/SRC/Benchmarks.py:
+# This is the Benchmarks Module of PETRUS tool
+# It measures the throughput of PETRUS building blocks on
+# synthetic inputs
+#
+#  Project:        PETRUS
+#  File:           Benchmarks.py
+#  Date(YY/MM/DD): 26/10/17
+#
+#   Author: PETRUS contributors
+#
+# -----------------------------------------------------------------
+# Date       | Author             | Action
+# -----------------------------------------------------------------
+# 26/10/17   | PETRUS contrib.    | Created
+#
+# Usage:
+#   Benchmarks.py $BENCHMARK [$NSATS]
+#   Benchmarks.py PREPRO_CHECK [$NSATS]
+#   (checks that all the engines and kernel backends give the same
+#   PREPRO OBS output, bit for bit; exits with -1 otherwise)
+########################################################################
+
+
+# Import External and Internal functions and Libraries
+#----------------------------------------------------------------------
+import sys
+import time
+import resource
+import tempfile
+import multiprocessing
+from collections import OrderedDict
+import numpy as np
+from COMMON import GnssConstants as Const
+from InputOutput import readObsEpoch
+from InputOutput import readObsFile
+from InputOutput import iterObsEpochs
+from InputOutput import readObsEpochs
+from InputOutput import readRinexObsFile
+from InputOutput import computeObsEpochIdx
+from InputOutput import readConf
+from InputOutput import processConf
+from InputOutput import generatePreproFile
+from InputOutput import PreproHdr
+from InputOutput import PreproObsCols
+from InputOutput import PreproObsDtype
+from InputOutput import getPreproCols
+from InputOutput import pyarrow
+from Preprocessing import runPreProcMeas
+from Preprocessing import runPreProcMeasVector
+from Preprocessing import runPreProcMeasBatch
+from Preprocessing import initPreproState
+from Kernels import setKernelBackend
+from ArrowSink import createArrowSink
+from ArrowSink import publishPreproArrow
+from ArrowSink import closeArrowSink
+from ArrowSink import readArrowStreamFile
+
+# Synthetic inputs
+#----------------------------------------------------------------------
+# OBS file header
+ObsHdr = "#SOD DOY YEAR CONST PRN ELEV AZIM C1 L1 P2 L2 S1 S2\n"
+
+# OBS file line format
+ObsFmt = "%d %03d %d G %02d %.3f %.3f %.3f %.3f %.3f %.3f %.3f %.3f\n"
+
+def generateObsFile(Path, NEpochs=Const.S_IN_D, NSats=10, Seed=0):
+
+    # Purpose: generate a synthetic 1 Hz OBS file
+
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to OBS file
+    # NEpochs: int
+    #         Number of epochs (SoD from 0 to NEpochs-1)
+    # NSats: int
+    #         Number of satellites in view at each epoch
+    # Seed: int
+    #         Random generator seed
+
+    # Returns
+    # =======
+    # Nothing
+
+    Rng = np.random.default_rng(Seed)
+    with open(Path, 'w') as f:
+        f.write(ObsHdr)
+        for Sod in range(NEpochs):
+            for Sat in range(NSats):
+                Prn = (Sat * 3 + Sod // 3600) % 32 + 1
+                Elev = 5.0 + 80.0 * abs(np.sin(Sod / 7000.0 + Sat))
+                Range = 2.0e7 + 1.0e3 * np.sin(Sod / 1000.0 + Sat)
+                C1 = Range + Rng.normal(0, 0.5)
+                L1 = (Range + Rng.normal(0, 0.005)) / Const.GPS_L1_WAVE + 100.0
+                f.write(ObsFmt % (Sod, 1, 2015, Prn, Elev, 180.0,
+                C1, L1, C1 + 2.0, L1 * 0.779, 45.0, 40.0))
+
+# End of generateObsFile()
+
+
+# RINEX header lines
+RinexHdr2 = [
+"     2.11           OBSERVATION DATA    M (MIXED)           RINEX VERSION / TYPE",
+"     6    C1    L1    P2    L2    S1    S2                  # / TYPES OF OBSERV",
+"                                                            END OF HEADER"]
+RinexHdr3 = [
+"     3.04           OBSERVATION DATA    M (MIXED)           RINEX VERSION / TYPE",
+"G    6 C1C L1C C2W L2W S1C S2W                              SYS / # / OBS TYPES",
+"S    6 C1C L1C C2W L2W S1C S2W                              SYS / # / OBS TYPES",
+"                                                            END OF HEADER"]
+
+def getRinexSatId(Sat):
+    # SBAS satellites are labelled as GPS with PRN + 100 in OBS files
+    if Sat["PRN"] > 100:
+        return "S%02d" % (Sat["PRN"] - 100)
+    return "%s%02d" % (Sat["CONST"], Sat["PRN"])
+
+def generateRinexFile(Path, ObsFile, Version=3):
+
+    # Purpose: generate a RINEX observation file with the content of
+    #          an OBS file (2015, January)
+
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to RINEX file
+    # ObsFile: str
+    #         Path to OBS file
+    # Version: int
+    #         RINEX version [2|3]
+
+    # Returns
+    # =======
+    # Nothing
+
+    ObsData, EpochIdx = readObsFile(ObsFile)
+    Cols = ["C1", "L1", "P2", "L2", "S1", "S2"]
+    with open(Path, 'w') as f:
+        f.write("\n".join(RinexHdr3 if Version == 3 else RinexHdr2) + "\n")
+        for EpochInfo in iterObsEpochs(ObsData, EpochIdx):
+            Sod = int(EpochInfo["SOD"][0])
+            Time = (EpochInfo["DOY"][0], Sod // 3600, Sod // 60 % 60,
+            float(Sod % 60))
+            Obs = ["".join(["%14.3f  " % Sat[Col] for Col in Cols])
+            for Sat in EpochInfo]
+            if Version == 3:
+                f.write("> 2015 01 %02d %02d %02d%11.7f  0%3d\n" %
+                (Time + (len(EpochInfo),)))
+                for Sat, SatObs in zip(EpochInfo, Obs):
+                    f.write("%s%s\n" % (getRinexSatId(Sat), SatObs.rstrip()))
+            else:
+                SatIds = "".join([getRinexSatId(Sat) for Sat in EpochInfo])
+                f.write(" 15  1 %2d %2d %2d%11.7f  0%3d%s\n" %
+                (Time + (len(EpochInfo), SatIds[:36])))
+                for i in range(36, len(SatIds), 36):
+                    f.write("%32s%s\n" % ("", SatIds[i:i + 36]))
+                for SatObs in Obs:
+                    f.write(SatObs[:80].rstrip() + "\n" + 
+                    SatObs[80:].rstrip() + "\n")
+
+# End of generateRinexFile()
+
+
+# Benchmark functions
+#----------------------------------------------------------------------
+def runMeasured(Function, Args):
+
+    # Purpose: run a function in a child process measuring its
+    #          wall-clock time and peak memory
+
+    # Parameters
+    # ==========
+    # Function: function
+    #         Function to be measured. It returns the number of
+    #         processed epochs
+    # Args: tuple
+    #         Function arguments
+
+    # Returns
+    # =======
+    # Result: list
+    #         [Time [s], Peak RSS [MB], Number of epochs]
+
+    # Function run in the child process
+    def child(Queue):
+        Start = time.perf_counter()
+        NEpochs = Function(*Args)
+        Elapsed = time.perf_counter() - Start
+        Queue.put([Elapsed,
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        NEpochs])
+
+    # Fork so that the peak memory of each run is measured separately
+    Context = multiprocessing.get_context("fork")
+    Queue = Context.Queue()
+    Process = Context.Process(target=child, args=(Queue,))
+    Process.start()
+    Result = Queue.get()
+    Process.join()
+
+    return Result
+
+# End of runMeasured()
+
+
+def readLine(ObsFile):
+    NEpochs = 0
+    with open(ObsFile, 'r') as f:
+        f.readline()
+        while readObsEpoch(f) != []:
+            NEpochs = NEpochs + 1
+    return NEpochs
+
+def readBulk(ObsFile):
+    ObsData, EpochIdx = readObsFile(ObsFile)
+    return sum(1 for EpochInfo in iterObsEpochs(ObsData, EpochIdx))
+
+def readStream(ObsFile):
+    with open(ObsFile, 'r') as f:
+        return sum(1 for EpochInfo in readObsEpochs(f))
+
+def benchmarkObsReaders(WorkDir, NSats):
+
+    # Purpose: compare the OBS readers on a 24h, 1 Hz file
+
+    # Parameters
+    # ==========
+    # WorkDir: str
+    #         Directory for the synthetic inputs
+    # NSats: int
+    #         Number of satellites in view at each epoch
+
+    # Returns
+    # =======
+    # Results: dict
+    #         [Time [s], Peak RSS [MB], Number of epochs] per reader
+
+    ObsFile = WorkDir + "/OBS_BNCH_Y15D001.dat"
+    generateObsFile(ObsFile, Const.S_IN_D, NSats)
+
+    Results = OrderedDict({})
+    Results["LINE (readObsEpoch)"] = runMeasured(readLine, (ObsFile,))
+    Results["BULK (readObsFile)"] = runMeasured(readBulk, (ObsFile,))
+    Results["STREAM (readObsEpochs)"] = runMeasured(readStream, (ObsFile,))
+
+    return Results
+
+# End of benchmarkObsReaders()
+
+
+def convertRinex(RinexFile, ObsFile):
+    ObsData, EpochIdx = readRinexObsFile(RinexFile)
+    with open(ObsFile, 'w') as f:
+        f.write(ObsHdr)
+        np.savetxt(f, ObsData, fmt=ObsFmt.replace(" G ", " %s ").split())
+    ObsData, EpochIdx = readObsFile(ObsFile)
+    return sum(1 for EpochInfo in iterObsEpochs(ObsData, EpochIdx))
+
+def readRinex(RinexFile):
+    ObsData, EpochIdx = readRinexObsFile(RinexFile)
+    return sum(1 for EpochInfo in iterObsEpochs(ObsData, EpochIdx))
+
+def benchmarkRinexReaders(WorkDir, NSats):
+
+    # Purpose: compare reading RINEX directly with converting it to
+    #          an OBS file and parsing it, on a 24h, 1 Hz file
+
+    # Parameters
+    # ==========
+    # WorkDir: str
+    #         Directory for the synthetic inputs
+    # NSats: int
+    #         Number of satellites in view at each epoch
+
+    # Returns
+    # =======
+    # Results: dict
+    #         [Time [s], Peak RSS [MB], Number of epochs] per reader
+
+    ObsFile = WorkDir + "/OBS_BNCH_Y15D001.dat"
+    generateObsFile(ObsFile, Const.S_IN_D, NSats)
+
+    # Generate the RINEX files in a child process, so that the OBS data
+    # read does not count in the peak memory of the readers
+    Context = multiprocessing.get_context("fork")
+    for Args in [(WorkDir + "/bnch0010.15o", ObsFile, 2),
+    (WorkDir + "/BNCH00XXX_R_20150010000_01D_01S_MO.rnx", ObsFile, 3)]:
+        Process = Context.Process(target=generateRinexFile, args=Args)
+        Process.start()
+        Process.join()
+
+    Results = OrderedDict({})
+    Results["CONVERT+BULK (RINEX 3)"] = runMeasured(convertRinex, 
+    (WorkDir + "/BNCH00XXX_R_20150010000_01D_01S_MO.rnx", 
+    WorkDir + "/OBS_CONV_Y15D001.dat"))
+    Results["RINEX 3 (readRinexObsFile)"] = runMeasured(readRinex, 
+    (WorkDir + "/BNCH00XXX_R_20150010000_01D_01S_MO.rnx",))
+    Results["RINEX 2 (readRinexObsFile)"] = runMeasured(readRinex, 
+    (WorkDir + "/bnch0010.15o",))
+
+    return Results
+
+# End of benchmarkRinexReaders()
+
+
+# Configuration of the preprocessing benchmarks
+BenchCfg = """INI_DATE 01/01/2015
+END_DATE 01/01/2015
+SAMPLING_RATE 1
+SBAS_MODE SBASL1
+NAV_SOLUTION GPS
+PREPRO_OUT 1
+RCVR_INFO STAT
+RCVR_FILE RCVR.dat
+NCHANNELS_GPS 36
+RCVR_MASK 5
+MIN_CNR 1 40
+MIN_NCS_TH 1 1 3
+MAX_PSR_OUTRNG 1 330000000
+MAX_CODE_RATE 1 952
+MAX_CODE_RATE_STEP 1 10
+MAX_PHASE_RATE 1 952
+MAX_PHASE_RATE_STEP 1 10
+HATCH_GAP_TH 6
+HATCH_TIME 100
+HATCH_STATE_F 1
+HATCH_DIV_TH 5
+HATCH_DIV_TIME 3
+"""
+
+# Receiver of the preprocessing benchmarks
+BenchRcvr = ["BNCH", 1, 1, 0.0, 0.0, 0.0, 5.0, 0.0, [0.0, 0.0, 0.0]]
+
+# Rows of each record batch of the Arrow output benchmark
+ArrowBenchRows = 65536
+
+def readBenchConf(WorkDir, Overrides=[]):
+    # Replace the benchmark parameters given in Overrides
+    Keys = [Override.split()[0] for Override in Overrides]
+    CfgFile = WorkDir + "/petrus.cfg"
+    with open(CfgFile, 'w') as f:
+        for Line in BenchCfg.splitlines():
+            if Line.split()[0] not in Keys:
+                f.write(Line + "\n")
+        for Override in Overrides:
+            f.write(Override + "\n")
+    return processConf(readConf(CfgFile))
+
+def runPrepro(ObsFile, Conf, Engine):
+    ObsData, EpochIdx = readObsFile(ObsFile)
+    PrevPreproState = initPreproState(Conf)
+    if Engine == "BATCH":
+        runPreProcMeasBatch(Conf, BenchRcvr, ObsData, PrevPreproState)
+        return len(EpochIdx) - 1
+    if Engine == "VECTOR":
+        runEngine = runPreProcMeasVector
+    else:
+        runEngine = runPreProcMeas
+    NEpochs = 0
+    for EpochInfo in iterObsEpochs(ObsData, EpochIdx):
+        runEngine(Conf, BenchRcvr, EpochInfo, PrevPreproState)
+        NEpochs = NEpochs + 1
+    return NEpochs
+
+def benchmarkPreproEngines(WorkDir, NSats):
+
+    # Purpose: compare the preprocessing engines on a 6h, 1 Hz file
+    #          (reading it is not measured)
+
+    # Parameters
+    # ==========
+    # WorkDir: str
+    #         Directory for the synthetic inputs
+    # NSats: int
+    #         Number of satellites in view at each epoch
+
+    # Returns
+    # =======
+    # Results: dict
+    #         [Time [s], Peak RSS [MB], Number of epochs] per engine
+
+    ObsFile = WorkDir + "/OBS_BNCH_Y15D001.dat"
+    generateObsFile(ObsFile, Const.S_IN_D // 4, NSats)
+    Conf = readBenchConf(WorkDir)
+
+    # Measure only the preprocessing
+    ReadTime = runMeasured(readBulk, (ObsFile,))[0]
+    Results = OrderedDict({})
+    for Engine in ["SCALAR", "VECTOR", "BATCH"]:
+        Results[Engine] = runMeasured(runPrepro, (ObsFile, Conf, Engine))
+        Results[Engine][0] = Results[Engine][0] - ReadTime
+
+    return Results
+
+# End of benchmarkPreproEngines()
+
+
+def benchmarkPreproKernels(WorkDir, NSats):
+
+    # Purpose: compare the backends of the preprocessing kernels with
+    #          the vector and batch engines on a 6h, 1 Hz file (reading
+    #          it and compiling the kernels are not measured)
+
+    # Parameters
+    # ==========
+    # WorkDir: str
+    #         Directory for the synthetic inputs
+    # NSats: int
+    #         Number of satellites in view at each epoch
+
+    # Returns
+    # =======
+    # Results: dict
+    #         [Time [s], Peak RSS [MB], Number of epochs] per engine
+    #         and backend
+
+    ObsFile = WorkDir + "/OBS_BNCH_Y15D001.dat"
+    generateObsFile(ObsFile, Const.S_IN_D // 4, NSats)
+    WarmUpFile = WorkDir + "/OBS_WARM_Y15D001.dat"
+    generateObsFile(WarmUpFile, 100, NSats)
+    Conf = readBenchConf(WorkDir)
+
+    # Measure only the preprocessing
+    ReadTime = runMeasured(readBulk, (ObsFile,))[0]
+    Results = OrderedDict({})
+    for Backend in ["PYTHON", "NUMBA"]:
+        # Compile the kernels before forking the measured run
+        Backend = setKernelBackend(Backend)
+        for Engine in ["VECTOR", "BATCH"]:
+            runPrepro(WarmUpFile, Conf, Engine)
+            Key = Engine + " " + Backend
+            Results[Key] = runMeasured(runPrepro, (ObsFile, Conf, Engine))
+            Results[Key][0] = Results[Key][0] - ReadTime
+
+    return Results
+
+# End of benchmarkPreproKernels()
+
+
+def writeText(Path, PreproEpochs):
+    with open(Path, 'w') as f:
+        f.write(PreproHdr)
+        for PreproObsInfo in PreproEpochs:
+            generatePreproFile(f, PreproObsInfo)
+    return len(PreproEpochs)
+
+def writeArrow(Path, PreproEpochs, Rows):
+    ArrowOut = createArrowSink(Path, "FILE", Rows)
+    for PreproObsInfo in PreproEpochs:
+        publishPreproArrow(ArrowOut, PreproObsInfo)
+    closeArrowSink(ArrowOut)
+    return len(PreproEpochs)
+
+def readText(Path):
+    PreproData = np.loadtxt(Path, dtype=np.dtype([(Col, PreproObsDtype[Field]) 
+    for Col, Field in PreproObsCols.items()]), ndmin=1)
+    return len(np.unique(PreproData["SOD"]))
+
+def readArrow(Path):
+    Batches, Pos, Schema, Complete = readArrowStreamFile(Path)
+    return len(np.unique(np.concatenate([Batch.column("SOD").to_numpy() 
+    for Batch in Batches])))
+
+def benchmarkPreproOutputs(WorkDir, NSats):
+
+    # Purpose: compare the PREPRO OBS text output with the Arrow stream
+    #          file, written epoch by epoch and read back, on the results
+    #          of a 6h, 1 Hz file (preprocessing is not measured). The
+    #          stream is written with a record batch per epoch and with
+    #          record batches of ArrowBenchRows rows
+
+    # Parameters
+    # ==========
+    # WorkDir: str
+    #         Directory for the synthetic inputs
+    # NSats: int
+    #         Number of satellites in view at each epoch
+
+    # Returns
+    # =======
+    # Results: dict
+    #         [Time [s], Peak RSS [MB], Number of epochs] per output
+
+    if pyarrow is None:
+        sys.stderr.write("ERROR: PREPRO_OUTPUTS requires the pyarrow package\n")
+        sys.exit(-1)
+
+    ObsFile = WorkDir + "/OBS_BNCH_Y15D001.dat"
+    generateObsFile(ObsFile, Const.S_IN_D // 4, NSats)
+    Conf = readBenchConf(WorkDir)
+
+    # Preprocess the whole file and split the results by epoch
+    ObsData, EpochIdx = readObsFile(ObsFile)
+    PreproObsInfo = runPreProcMeasBatch(Conf, BenchRcvr, ObsData, 
+    initPreproState(Conf))
+    PreproEpochs = np.split(PreproObsInfo, 
+    np.flatnonzero(np.diff(PreproObsInfo["Sod"])) + 1)
+
+    TextFile = WorkDir + "/PREPRO_OBS_BNCH_Y15D001.dat"
+    ArrowFile = WorkDir + "/PREPRO_OBS_BNCH_Y15D001"
+    ArrowEpochFile = WorkDir + "/PREPRO_OBS_BNCH_Y15D001_EPOCH"
+    Results = OrderedDict({})
+    Results["TEXT write"] = runMeasured(writeText, (TextFile, PreproEpochs))
+    Results["ARROW write (per epoch)"] = runMeasured(writeArrow, 
+    (ArrowEpochFile, PreproEpochs, 0))
+    Results["ARROW write (%d rows)" % ArrowBenchRows] = runMeasured(writeArrow, 
+    (ArrowFile, PreproEpochs, ArrowBenchRows))
+    Results["TEXT read (loadtxt)"] = runMeasured(readText, (TextFile,))
+    Results["ARROW read (per epoch)"] = runMeasured(readArrow, 
+    (ArrowEpochFile + ".arrows",))
+    Results["ARROW read (%d rows)" % ArrowBenchRows] = runMeasured(readArrow, 
+    (ArrowFile + ".arrows",))
+
+    return Results
+
+# End of benchmarkPreproOutputs()
+
+
+# Engines check
+#----------------------------------------------------------------------
+# Configurations of the engines check: parameters overriding BenchCfg
+# and receiver mask angle [deg]. They are chosen so that every
+# rejection cause and Hatch filter reset is found in the perturbed
+# synthetic data (see perturbObsData)
+CheckConfs = OrderedDict({})
+CheckConfs["DEFAULT"] = [[], 5.0]
+CheckConfs["CYCLE_SLIPS"] = [["MIN_NCS_TH 1 0.05 2", "HATCH_DIV_TH 0.3", 
+"HATCH_DIV_TIME 2"], 5.0]
+CheckConfs["RATE_STEPS"] = [["MAX_CODE_RATE_STEP 1 0.5", 
+"MAX_PHASE_RATE_STEP 1 0.5", "HATCH_GAP_TH 1"], 5.0]
+CheckConfs["RATES"] = [["MAX_CODE_RATE 1 0.8", "MAX_PHASE_RATE 1 0.8"], 5.0]
+CheckConfs["NO_DIVERGENCE"] = [["MIN_NCS_TH 1 0.02 1", "HATCH_DIV_TIME 0"], 
+5.0]
+CheckConfs["CHANNELS"] = [["NCHANNELS_GPS 4", "MIN_NCS_TH 0 1 3"], 30.0]
+
+# Engines and kernel backends of the engines check (the first one is
+# the reference)
+CheckRuns = [["SCALAR", "PYTHON"], ["VECTOR", "PYTHON"], ["VECTOR", "NUMBA"],
+["BATCH", "PYTHON"], ["BATCH", "NUMBA"]]
+
+def perturbObsData(ObsData, Seed=1):
+
+    # Purpose: add to synthetic OBS data the events that the
+    #          preprocessing has to detect: cycle slips, carrier phase
+    #          and code outliers, data gaps, low C/N0, out of range
+    #          pseudo-ranges and measurements of other constellations
+
+    # Parameters
+    # ==========
+    # ObsData: numpy structured array
+    #         OBS data sorted by SoD (ObsDtype)
+    # Seed: int
+    #         Random generator seed
+
+    # Returns
+    # =======
+    # ObsData: numpy structured array
+    #         Perturbed OBS data (ObsDtype)
+    # EpochIdx: numpy array
+    #         Epoch boundaries of the perturbed OBS data (see
+    #         computeObsEpochIdx)
+
+    Rng = np.random.default_rng(Seed)
+    ObsData = ObsData.copy()
+    NRows = len(ObsData)
+
+    # Cycle slips: jumps of the L1 of a satellite kept until the end
+    for Row in Rng.choice(NRows, NRows // 1000, replace=False):
+        Later = (ObsData["PRN"] == ObsData["PRN"][Row]) & \
+            (ObsData["SOD"] >= ObsData["SOD"][Row])
+        ObsData["L1"][Later] += Rng.integers(1, 20)
+
+    # Outliers of a single measurement
+    Rows = Rng.choice(NRows, NRows // 500, replace=False)
+    ObsData["L1"][Rows] += Rng.uniform(-5.0, 5.0, len(Rows))
+    Rows = Rng.choice(NRows, NRows // 500, replace=False)
+    ObsData["C1"][Rows] += Rng.uniform(-30.0, 30.0, len(Rows))
+    ObsData["C1"][Rng.choice(NRows, NRows // 2000, replace=False)] = 4.0e8
+    ObsData["S1"][Rng.choice(NRows, NRows // 100, replace=False)] = 30.0
+    ObsData["CONST"][Rng.choice(NRows, NRows // 200, replace=False)] = "E"
+
+    # Data gaps: single measurements and 20 s of a satellite
+    Kept = Rng.random(NRows) > 0.005
+    for Row in Rng.choice(NRows, NRows // 2000, replace=False):
+        Kept = Kept & ~((ObsData["PRN"] == ObsData["PRN"][Row]) & \
+            (ObsData["SOD"] >= ObsData["SOD"][Row]) & \
+            (ObsData["SOD"] < ObsData["SOD"][Row] + 20))
+    ObsData = ObsData[Kept]
+
+    return ObsData, computeObsEpochIdx(ObsData)
+
+# End of perturbObsData()
+
+
+def getPreproOutputs(ObsData, EpochIdx, Conf, Rcvr, Engine):
+
+    # Purpose: preprocess OBS data with an engine and get the raw
+    #          bytes of each PREPRO OBS column
+
+    # Parameters
+    # ==========
+    # ObsData, EpochIdx: numpy structured array, numpy array
+    #         OBS data and epoch boundaries (see readObsFile)
+    # Conf: dict
+    #         Configuration data
+    # Rcvr: list
+    #         Receiver information
+    # Engine: str
+    #         Preprocessing engine [SCALAR|VECTOR|BATCH]
+
+    # Returns
+    # =======
+    # Outputs: dict
+    #         Raw bytes of each PREPRO OBS column, of the type in
+    #         PreproObsDtype
+
+    PrevPreproState = initPreproState(Conf)
+    if Engine == "BATCH":
+        PreproEpochs = [runPreProcMeasBatch(Conf, Rcvr, ObsData, 
+        PrevPreproState)]
+    else:
+        if Engine == "VECTOR":
+            runEngine = runPreProcMeasVector
+        else:
+            runEngine = runPreProcMeas
+        PreproEpochs = [runEngine(Conf, Rcvr, EpochInfo, PrevPreproState)
+        for EpochInfo in iterObsEpochs(ObsData, EpochIdx)]
+
+    PreproCols = [getPreproCols(PreproObsInfo) for PreproObsInfo in PreproEpochs]
+    Outputs = OrderedDict({})
+    for Col, Field in PreproObsCols.items():
+        Outputs[Col] = np.concatenate([np.asarray(Cols[Col], 
+        dtype=PreproObsDtype[Field]) for Cols in PreproCols]).tobytes()
+
+    return Outputs
+
+# End of getPreproOutputs()
+
+
+def checkPreproEngines(WorkDir, NSats):
+
+    # Purpose: check that all the preprocessing engines and kernel
+    #          backends give the same PREPRO OBS output as the SCALAR
+    #          engine, bit for bit, on a perturbed 2h, 1 Hz file with
+    #          each of the CheckConfs configurations
+
+    # Parameters
+    # ==========
+    # WorkDir: str
+    #         Directory for the synthetic inputs
+    # NSats: int
+    #         Number of satellites in view at each epoch
+
+    # Returns
+    # =======
+    # Results: dict
+    #         Columns which differ from the reference (empty if
+    #         identical) per configuration and run
+
+    ObsFile = WorkDir + "/OBS_BNCH_Y15D001.dat"
+    generateObsFile(ObsFile, 7200, NSats)
+    ObsData, EpochIdx = readObsFile(ObsFile)
+    ObsData, EpochIdx = perturbObsData(ObsData)
+
+    Results = OrderedDict({})
+    for ConfName, (Overrides, Mask) in CheckConfs.items():
+        Conf = readBenchConf(WorkDir, Overrides)
+        Rcvr = BenchRcvr[:6] + [Mask] + BenchRcvr[7:]
+        RefOutputs = None
+        for Engine, Backend in CheckRuns:
+            # Without Numba, the NUMBA runs would repeat the PYTHON ones
+            if setKernelBackend(Backend) != Backend:
+                continue
+            Outputs = getPreproOutputs(ObsData, EpochIdx, Conf, Rcvr, Engine)
+            if RefOutputs is None:
+                RefOutputs = Outputs
+            Results["%-14s %s %s" % (ConfName, Engine, Backend)] = \
+                [Col for Col in Outputs if Outputs[Col] != RefOutputs[Col]]
+
+    setKernelBackend("PYTHON")
+
+    return Results
+
+# End of checkPreproEngines()
+
+
+# Available checks
+Checks = OrderedDict({})
+Checks["PREPRO_CHECK"] = checkPreproEngines
+
+
+# Available benchmarks
+Benchmarks = OrderedDict({})
+Benchmarks["OBS_READERS"] = benchmarkObsReaders
+Benchmarks["RINEX_READERS"] = benchmarkRinexReaders
+Benchmarks["PREPRO_ENGINES"] = benchmarkPreproEngines
+Benchmarks["PREPRO_KERNELS"] = benchmarkPreproKernels
+Benchmarks["PREPRO_OUTPUTS"] = benchmarkPreproOutputs
+
+
+#----------------------------------------------------------------------
+# INTERNAL FUNCTIONS
+#----------------------------------------------------------------------
+
+def displayUsage():
+    sys.stderr.write("ERROR: Please provide the benchmark or check to run "\
+        "[%s] and, optionally, the number of satellites per epoch\n" %
+        "|".join(list(Benchmarks.keys()) + list(Checks.keys())))
+
+#######################################################
+# MAIN BODY
+#######################################################
+
+if __name__ == "__main__":
+    # Check InputOutput Arguments
+    if len(sys.argv) not in [2, 3] or \
+        sys.argv[1] not in list(Benchmarks.keys()) + list(Checks.keys()):
+        displayUsage()
+        sys.exit(-1)
+
+    # Extract the arguments
+    Benchmark = sys.argv[1]
+    NSats = int(sys.argv[2]) if len(sys.argv) == 3 else 10
+
+    # Run the check in a temporary directory and report the differences
+    if Benchmark in Checks:
+        with tempfile.TemporaryDirectory() as WorkDir:
+            Results = Checks[Benchmark](WorkDir, NSats)
+        print("%-32s %s" % ("CHECK " + Benchmark, "DIFFERENT COLUMNS"))
+        for Name, DiffCols in Results.items():
+            print("%-32s %s" % (Name, ", ".join(DiffCols) if DiffCols else "-"))
+        if any(Results.values()):
+            sys.stderr.write("ERROR: The engines outputs are not identical\n")
+            sys.exit(-1)
+        print("INFO: The engines outputs are identical")
+        sys.exit(0)
+
+    # Run the benchmark in a temporary directory
+    with tempfile.TemporaryDirectory() as WorkDir:
+        Results = Benchmarks[Benchmark](WorkDir, NSats)
+
+    # Report
+    print("%-28s %10s %10s %12s %12s" %
+    ("BENCHMARK " + Benchmark, "TIME [s]", "RSS [MB]", "EPOCHS/s", "SPEED-UP"))
+    RefTime = list(Results.values())[0][0]
+    for Name, (Elapsed, Rss, NEpochs) in Results.items():
+        print("%-28s %10.3f %10.1f %12.0f %11.1fx" %
+        (Name, Elapsed, Rss, NEpochs / Elapsed, RefTime / Elapsed))
+
+########################################################################
+# END OF BENCHMARKS MODULE
+########################################################################
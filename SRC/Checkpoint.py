@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+
+########################################################################
+# PETRUS/SRC/Checkpoint.py:
+# This is the Checkpoint Module of PETRUS tool
+# It keeps the preprocessing state of each receiver and the position
+# of its PREPRO OBS file, so that an interrupted run can be resumed
+#
+#  Project:        PETRUS
+#  File:           Checkpoint.py
+#  Date(YY/MM/DD): 26/10/17
+#
+#   Author: PETRUS contributors
+#
+# -----------------------------------------------------------------
+# Date       | Author             | Action
+# -----------------------------------------------------------------
+# 26/10/17   | PETRUS contrib.    | Created
+#
+# Usage:
+#   Checkpoint.py $SCEN_PATH list
+#   Checkpoint.py $SCEN_PATH purge
+########################################################################
+
+
+# Import External and Internal functions and Libraries
+#----------------------------------------------------------------------
+import sys, os
+import numpy as np
+from Preprocessing import initPreproState
+from InputOutput import isPreproFileCompressed
+from InputOutput import PreproCompressWriter
+
+# Checkpoint layout
+#----------------------------------------------------------------------
+# Checkpoint directory inside the scenario
+CheckpointDirName = "/CACHE/CHECKPOINT"
+
+# Checkpoint file of a receiver
+CheckpointFileFmt = "CHECKPOINT_%s.npz"
+
+# Checkpoint information stored with the preprocessing state
+# JD: Julian Day being processed
+# SOD: last epoch processed
+# OUT_POS: size of the PREPRO OBS file up to that epoch [bytes]
+# DAY_DONE: 1 if the whole day was processed
+CheckpointInfo = ["JD", "SOD", "OUT_POS", "DAY_DONE"]
+
+# Checkpoint functions
+#----------------------------------------------------------------------
+def getCheckpointDir(Scen):
+
+    # Purpose: get the checkpoints directory of a scenario
+
+    # Parameters
+    # ==========
+    # Scen: str
+    #         Path to scenario
+
+    # Returns
+    # =======
+    # CheckpointDir: str
+    #         Path to checkpoints directory
+
+    return Scen + CheckpointDirName
+
+# End of getCheckpointDir()
+
+
+def getCheckpointFile(CheckpointDir, Rcvr):
+
+    # Purpose: get the checkpoint file of a receiver
+
+    # Parameters
+    # ==========
+    # CheckpointDir: str
+    #         Path to checkpoints directory
+    # Rcvr: str
+    #         Receiver acronym
+
+    # Returns
+    # =======
+    # CheckpointFile: str
+    #         Path to checkpoint file
+
+    return CheckpointDir + '/' + CheckpointFileFmt % Rcvr
+
+# End of getCheckpointFile()
+
+
+def syncOutputFile(f):
+
+    # Purpose: flush an output file to disk
+
+    # Parameters
+    # ==========
+    # f: File descriptor
+    #         Descriptor of output file
+
+    # Returns
+    # =======
+    # Pos: int
+    #         Size of the file written up to now [bytes]
+
+    f.flush()
+    os.fsync(f.fileno())
+
+    return f.tell()
+
+# End of syncOutputFile()
+
+
+def writeCheckpoint(CheckpointFile, PrevPreproState, Jd, Sod, OutPos, DayDone):
+
+    # Purpose: write the checkpoint of a receiver. It is written to a
+    #          temporary file and renamed, so that an interruption
+    #          never leaves a partial checkpoint
+
+    # Parameters
+    # ==========
+    # CheckpointFile: str
+    #         Path to checkpoint file
+    # PrevPreproState: dict
+    #         Preprocessing information of all the satellites
+    # Jd: int
+    #         Julian Day being processed
+    # Sod: float
+    #         Last epoch processed
+    # OutPos: int
+    #         Size of the PREPRO OBS file up to that epoch [bytes].
+    #         It must be already on disk (see syncOutputFile)
+    # DayDone: int
+    #         1 if the whole day was processed
+
+    # Returns
+    # =======
+    # Nothing
+
+    # Create checkpoints directory, if needed
+    if not os.path.exists(os.path.dirname(CheckpointFile)):
+        os.makedirs(os.path.dirname(CheckpointFile))
+
+    TmpFile = CheckpointFile + ".%d.tmp" % os.getpid()
+    with open(TmpFile, 'wb') as f:
+        np.savez(f, JD=Jd, SOD=Sod, OUT_POS=OutPos, DAY_DONE=DayDone,
+        **PrevPreproState)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(TmpFile, CheckpointFile)
+
+# End of writeCheckpoint()
+
+
+def readCheckpoint(CheckpointFile, Conf):
+
+    # Purpose: read the checkpoint of a receiver
+
+    # Parameters
+    # ==========
+    # CheckpointFile: str
+    #         Path to checkpoint file
+    # Conf: dict
+    #         Configuration dictionary
+
+    # Returns
+    # =======
+    # Checkpoint: dict
+    #         Checkpoint information (see CheckpointInfo), or None if
+    #         there is no checkpoint or it does not match the
+    #         configuration
+    # PrevPreproState: dict
+    #         Preprocessing information of all the satellites
+
+    if not os.path.exists(CheckpointFile):
+        return None, None
+
+    # Read the checkpoint
+    PrevPreproState = initPreproState(Conf)
+    with np.load(CheckpointFile) as Data:
+        Checkpoint = {Key: Data[Key].item() for Key in CheckpointInfo}
+
+        # Check the preprocessing state matches the configuration
+        # (e.g. the number of epochs to declare a cycle slip)
+        for Key, Value in PrevPreproState.items():
+            if Key not in Data or Data[Key].shape != Value.shape or \
+                Data[Key].dtype != Value.dtype:
+                print("WARNING: Checkpoint %s does not match the "\
+                    "configuration: ignored" % CheckpointFile)
+                return None, None
+            Value[...] = Data[Key]
+
+    return Checkpoint, PrevPreproState
+
+# End of readCheckpoint()
+
+
+def reopenOutputFile(Path, Pos, Threads=1):
+
+    # Purpose: reopen an output file to go on writing it from a
+    #          checkpoint, discarding what was written after it
+
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to file
+    # Pos: int
+    #         Size of the file at the checkpoint [bytes]
+    # Threads: int
+    #         Threads compressing the file, if it is compressed
+
+    # Returns
+    # =======
+    # f: File descriptor
+    #         Descriptor of output file
+
+    # Display Message
+    print("INFO: Resuming file: %s at byte %d..." % (Path, Pos))
+
+    # Compressed files end with a whole compressed block at every
+    # checkpoint, so the new blocks can be appended after it
+    if isPreproFileCompressed(Path):
+        f = open(Path, 'r+b')
+        f.truncate(Pos)
+        f.seek(Pos)
+        f = PreproCompressWriter(f, os.path.splitext(Path)[1], Threads)
+    else:
+        f = open(Path, 'r+')
+        f.truncate(Pos)
+        f.seek(Pos)
+
+    return f
+
+# End of reopenOutputFile()
+
+
+#----------------------------------------------------------------------
+# INTERNAL FUNCTIONS
+#----------------------------------------------------------------------
+
+def displayUsage():
+    sys.stderr.write("ERROR: Please provide path to SCENARIO and command:\n"\
+        "  Checkpoint.py $SCEN_PATH list\n"\
+        "  Checkpoint.py $SCEN_PATH purge\n")
+
+#######################################################
+# MAIN BODY
+#######################################################
+
+if __name__ == "__main__":
+    # Check InputOutput Arguments
+    if len(sys.argv) != 3 or sys.argv[2] not in ["list", "purge"]:
+        displayUsage()
+        sys.exit(-1)
+
+    # Extract the arguments
+    CheckpointDir = getCheckpointDir(sys.argv[1])
+    Command = sys.argv[2]
+    Names = sorted(os.listdir(CheckpointDir)) \
+        if os.path.isdir(CheckpointDir) else []
+
+    # Loop over checkpoints
+    for Name in Names:
+        if not Name.endswith(".npz"):
+            continue
+
+        # List them
+        if Command == "list":
+            with np.load(CheckpointDir + '/' + Name) as Data:
+                print("%s  JD %d  SOD %d  OUT_POS %d  %s" % (Name,
+                Data["JD"], Data["SOD"], Data["OUT_POS"],
+                "DAY DONE" if Data["DAY_DONE"] == 1 else "IN PROGRESS"))
+
+        # Or remove them
+        else:
+            os.remove(CheckpointDir + '/' + Name)
+            print("INFO: Removed %s" % Name)
+
+########################################################################
+# END OF CHECKPOINT MODULE
+########################################################################
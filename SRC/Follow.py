@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+
+########################################################################
+# PETRUS/SRC/Follow.py:
+# This is the Follow Module of PETRUS tool
+# It follows the OBS file of the current day while the receiver
+# logger appends epochs to it, delivering each epoch as soon as it
+# is complete, and measures the latency up to its output
+#
+#  Project:        PETRUS
+#  File:           Follow.py
+#  Date(YY/MM/DD): 26/10/17
+#
+#   Author: PETRUS contributors
+#
+# -----------------------------------------------------------------
+# Date       | Author             | Action
+# -----------------------------------------------------------------
+# 26/10/17   | PETRUS contrib.    | Created
+#
+########################################################################
+
+
+# Import External and Internal functions and Libraries
+#----------------------------------------------------------------------
+import os
+import time
+import select
+import ctypes
+import ctypes.util
+import numpy as np
+from COMMON import GnssConstants as Const
+from InputOutput import ObsIdx, ObsDtype
+from InputOutput import parseObsLines
+from InputOutput import computeObsEpochIdx
+
+# File watch
+#----------------------------------------------------------------------
+# inotify events waited for in the OBS directory: data appended to a
+# file, or a file created (or moved) into it
+IN_MODIFY = 0x00000002
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0x00000800
+InotifyMask = IN_MODIFY | IN_MOVED_TO | IN_CREATE
+
+# Size of the buffer to drain the inotify events
+InotifyBufferSize = 1 << 16
+
+# Latency histograms
+#----------------------------------------------------------------------
+# Upper edges of the latency bins [ms]. The last bin gathers the
+# latencies above the last edge
+LatencyEdges = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+# Latency file header
+LatencyHdr = "#LATENCY_MS COUNT\n"
+
+# File watch functions
+#----------------------------------------------------------------------
+def openFileWatch(Dir):
+
+    # Purpose: watch the changes of the files of a directory with
+    #          inotify, if the system provides it
+
+    # Parameters
+    # ==========
+    # Dir: str
+    #         Path to directory
+
+    # Returns
+    # =======
+    # Watch: int
+    #         inotify descriptor, or None if not available (then the
+    #         directory has to be polled)
+
+    LibcName = ctypes.util.find_library("c")
+    if LibcName is None:
+        return None
+    Libc = ctypes.CDLL(LibcName, use_errno=True)
+    if not hasattr(Libc, "inotify_init1"):
+        return None
+
+    Watch = Libc.inotify_init1(IN_NONBLOCK)
+    if Watch < 0:
+        return None
+    if Libc.inotify_add_watch(Watch, os.fsencode(Dir), InotifyMask) < 0:
+        os.close(Watch)
+        return None
+
+    return Watch
+
+# End of openFileWatch()
+
+
+def waitFileChange(Watch, Timeout):
+
+    # Purpose: wait for a change of the watched directory, or for the
+    #          timeout to expire
+
+    # Parameters
+    # ==========
+    # Watch: int
+    #         inotify descriptor (see openFileWatch). If None, it just
+    #         waits for the timeout (polling)
+    # Timeout: float
+    #         Maximum waiting time [s]
+
+    # Returns
+    # =======
+    # Nothing
+
+    if Watch is None:
+        time.sleep(Timeout)
+        return
+
+    # Wait and drain the events: the files are read anyway
+    Ready = select.select([Watch], [], [], Timeout)[0]
+    if Ready:
+        try:
+            while os.read(Watch, InotifyBufferSize):
+                pass
+        except BlockingIOError:
+            pass
+
+# End of waitFileChange()
+
+
+def closeFileWatch(Watch):
+
+    # Purpose: stop watching a directory
+
+    # Parameters
+    # ==========
+    # Watch: int
+    #         inotify descriptor (see openFileWatch)
+
+    # Returns
+    # =======
+    # Nothing
+
+    if Watch is not None:
+        os.close(Watch)
+
+# End of closeFileWatch()
+
+
+# Follow functions
+#----------------------------------------------------------------------
+def followObsEpochs(ObsFile, NextObsFile, ObsFilter, Conf, FollowInfo):
+
+    # Purpose: follow an OBS file while it grows, epoch by epoch.
+    #          An epoch is complete when a later one starts, when it is
+    #          the last epoch of the day or, if configured, when the
+    #          file has not grown for a while. It ends with the day:
+    #          after its last epoch, or once the OBS file of the next
+    #          day appears and this one has been read up to its end
+
+    # Parameters
+    # ==========
+    # ObsFile: str
+    #         Path to OBS file. It may not exist yet
+    # NextObsFile: str
+    #         Path to OBS file of the next day
+    # ObsFilter: dict
+    #         OBS filter (see buildObsFilter)
+    # Conf: dict
+    #         Configuration dictionary
+    # FollowInfo: dict
+    #         Updated before delivering each epoch:
+    #         FollowInfo["INGEST_TIME"]: time when the last line of the
+    #         epoch was read (time.perf_counter())
+
+    # Returns
+    # =======
+    # EpochInfo: numpy structured array (generator)
+    #         all the LoS of one epoch (ObsDtype)
+
+    PollPeriod = Conf["FOLLOW_TIMING"][0]
+    EpochTimeout = Conf["FOLLOW_TIMING"][1]
+    Watch = openFileWatch(os.path.dirname(ObsFile))
+    if Watch is None:
+        print("WARNING: inotify not available: polling %s every %.2f s" %
+        (ObsFile, PollPeriod))
+
+    # Wait for the OBS file
+    while not os.path.exists(ObsFile):
+        if os.path.exists(NextObsFile):
+            print("WARNING: No OBS file %s: skipped" % ObsFile)
+            closeFileWatch(Watch)
+            return
+        waitFileChange(Watch, PollPeriod)
+
+    # Incomplete line, epoch pending to be completed, and SoD of the
+    # last line and of the last epoch delivered
+    Rest = b""
+    Pending = np.zeros(0, dtype=ObsDtype)
+    PendingTime = 0.0
+    LastSod = -1.0
+    DeliveredSod = -1.0
+    LastDataTime = time.perf_counter()
+
+    with open(ObsFile, 'rb') as f:
+        while True:
+            # Check if the next day has started before reading, so that
+            # nothing written in between is lost
+            NextDay = os.path.exists(NextObsFile)
+            Data = f.read()
+            Now = time.perf_counter()
+
+            if Data:
+                LastDataTime = Now
+                Data = Rest + Data
+
+                # Keep the last incomplete line for the next read
+                EndOfLines = Data.rfind(b'\n')
+                Rest = Data[EndOfLines + 1:]
+                Lines = [Line for Line in \
+                    Data[:EndOfLines + 1].decode().splitlines() \
+                        if Line.strip() and not Line.startswith('#')]
+
+                if len(Lines) != 0:
+                    LastSod = float(Lines[-1].split(None, 1)[ObsIdx["SOD"]])
+
+                    # Parse the lines, dropping the late ones
+                    ObsData = parseObsLines(Lines, ObsFilter)
+                    Late = ObsData["SOD"] <= DeliveredSod
+                    if Late.any():
+                        print("WARNING: %d late OBS lines of %s dropped" %
+                        (np.count_nonzero(Late), ObsFile))
+                        ObsData = ObsData[~Late]
+
+                    # Deliver the complete epochs, keeping the last one
+                    if len(ObsData) != 0:
+                        ObsData = np.concatenate((Pending, ObsData))
+                        EpochIdx = computeObsEpochIdx(ObsData)
+                        FollowInfo["INGEST_TIME"] = Now
+                        for i in range(len(EpochIdx) - 2):
+                            DeliveredSod = ObsData["SOD"][EpochIdx[i]]
+                            yield ObsData[EpochIdx[i]:EpochIdx[i + 1]]
+                        Pending = ObsData[EpochIdx[-2]:]
+                        PendingTime = Now
+
+            # Deliver the pending epoch if it is complete
+            if len(Pending) != 0 and (LastSod > Pending["SOD"][0] or \
+                Pending["SOD"][0] + Conf["SAMPLING_RATE"] >= Const.S_IN_D or \
+                    (NextDay and not Data) or \
+                        (EpochTimeout > 0 and not Rest and \
+                            Now - LastDataTime >= EpochTimeout)):
+                FollowInfo["INGEST_TIME"] = PendingTime
+                DeliveredSod = Pending["SOD"][0]
+                yield Pending
+                Pending = np.zeros(0, dtype=ObsDtype)
+
+            # End of day
+            if DeliveredSod + Conf["SAMPLING_RATE"] >= Const.S_IN_D or \
+                (NextDay and not Data):
+                break
+
+            # Wait for more data
+            if not Data:
+                waitFileChange(Watch, PollPeriod)
+
+    closeFileWatch(Watch)
+
+# End of followObsEpochs()
+
+
+# Latency functions
+#----------------------------------------------------------------------
+def initLatencyHist():
+
+    # Purpose: initialize a latency histogram
+
+    # Returns
+    # =======
+    # LatencyHist: dict
+    #         LatencyHist["COUNTS"]: number of latencies in each bin
+    #         (see LatencyEdges)
+    #         LatencyHist["N"], ["SUM"], ["MAX"]: number, sum and
+    #         maximum of the latencies [ms]
+
+    return {"COUNTS": np.zeros(len(LatencyEdges) + 1, dtype=int),
+    "N": 0, "SUM": 0.0, "MAX": 0.0}
+
+# End of initLatencyHist()
+
+
+def updateLatencyHist(LatencyHist, Latency):
+
+    # Purpose: add a latency to the histogram
+
+    # Parameters
+    # ==========
+    # LatencyHist: dict
+    #         Latency histogram (see initLatencyHist)
+    # Latency: float
+    #         Latency [s]
+
+    # Returns
+    # =======
+    # Nothing
+
+    Latency = Latency * 1000.0
+    LatencyHist["COUNTS"][np.searchsorted(LatencyEdges, Latency)] += 1
+    LatencyHist["N"] += 1
+    LatencyHist["SUM"] += Latency
+    LatencyHist["MAX"] = max(LatencyHist["MAX"], Latency)
+
+# End of updateLatencyHist()
+
+
+def getLatencyPercentile(LatencyHist, Percentile):
+
+    # Purpose: get the upper edge of the bin containing a percentile
+    #          of the latencies
+
+    # Parameters
+    # ==========
+    # LatencyHist: dict
+    #         Latency histogram (see initLatencyHist)
+    # Percentile: float
+    #         Percentile [%]
+
+    # Returns
+    # =======
+    # Latency: float
+    #         Latency below which the percentile lies [ms]
+
+    Bin = np.searchsorted(np.cumsum(LatencyHist["COUNTS"]),
+    LatencyHist["N"] * Percentile / 100.0)
+
+    return LatencyEdges[Bin] if Bin < len(LatencyEdges) else LatencyHist["MAX"]
+
+# End of getLatencyPercentile()
+
+
+def writeLatencyFile(Path, LatencyHist):
+
+    # Purpose: write the latency histogram and report its summary
+
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to latency file
+    # LatencyHist: dict
+    #         Latency histogram (see initLatencyHist)
+
+    # Returns
+    # =======
+    # Nothing
+
+    Labels = ["<=%d" % Edge for Edge in LatencyEdges] + [">%d" % LatencyEdges[-1]]
+    with open(Path, 'w') as f:
+        f.write(LatencyHdr)
+        for Label, Count in zip(Labels, LatencyHist["COUNTS"]):
+            f.write("%s %d\n" % (Label, Count))
+
+    # Report
+    if LatencyHist["N"] > 0:
+        print("INFO: Latency of %d epochs: mean %.1f ms, p50 <= %d ms, "\
+            "p99 <= %d ms, max %.1f ms (%s)" % (LatencyHist["N"],
+            LatencyHist["SUM"] / LatencyHist["N"],
+            getLatencyPercentile(LatencyHist, 50),
+            getLatencyPercentile(LatencyHist, 99),
+            LatencyHist["MAX"], Path))
+
+# End of writeLatencyFile()
+
+########################################################################
+# END OF FOLLOW MODULE
+########################################################################
@@ -21,10 +21,34 @@
 # Import External and Internal functions and Libraries
 #----------------------------------------------------------------------
 import sys, os
+import time
+import glob
+import gzip, bz2, lzma
+import codecs
+import threading
+import queue
+import heapq
+import io
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from COMMON.Dates import convertYearMonthDay2JulianDay
+from COMMON.Dates import convertYearMonthDay2Doy
 from COMMON import GnssConstants as Const
 from COMMON.Coordinates import llh2xyz
+import numpy as np
+
+# PyArrow is optional: it is only needed for the Parquet outputs
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Zstandard is optional: it is only needed for the .zst PREPRO OBS files
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 
 # Input interfaces
@@ -63,6 +87,39 @@ ObsIdx["L2"]=10
 ObsIdx["S1"]=11
 ObsIdx["S2"]=12
 
+# OBS file columns types
+ObsType = OrderedDict({})
+ObsType["SOD"]="f8"
+ObsType["DOY"]="i4"
+ObsType["YEAR"]="i4"
+ObsType["CONST"]="U1"
+ObsType["PRN"]="i4"
+ObsType["ELEV"]="f8"
+ObsType["AZIM"]="f8"
+ObsType["C1"]="f8"
+ObsType["L1"]="f8"
+ObsType["P2"]="f8"
+ObsType["L2"]="f8"
+ObsType["S1"]="f8"
+ObsType["S2"]="f8"
+
+# OBS structured array type (fields laid out as in ObsIdx)
+ObsDtype = np.dtype([(Col, ObsType[Col]) for Col in ObsIdx])
+
+# OBS columns needed by the preprocessing
+# Geometry (also needed for the satellites below the mask angle)
+ObsGeomCols = ["SOD", "DOY", "CONST", "PRN", "ELEV", "AZIM"]
+# Single frequency measurements
+ObsSfCols = ["C1", "L1", "S1"]
+# Dual frequency measurements
+ObsDfCols = ["P2", "L2", "S2"]
+
+# Constellations of each navigation solution
+NavSolutionConst = OrderedDict({})
+NavSolutionConst["GPS"]=["G"]
+NavSolutionConst["GAL"]=["E"]
+NavSolutionConst["GPSGAL"]=["G", "E"]
+
 # Output interfaces
 #----------------------------------------------------------------------
 # PREPRO OBS 
@@ -75,6 +132,12 @@ PreproFmt = "%05d %03d %s %02d %8.3f %8.3f %4d %4d %4d "\
     "%15.3f %15.3f %15.3f %8.3f %10.3f %10.3f %10.3f %10.3f "\
     "%8.3f %8.3f %8.3f".split()
 
+# Whole line format, each field followed by a blank
+PreproRowFmt = "".join([Fmt + " " for Fmt in PreproFmt]) + "\n"
+
+# Lines formatted at once
+PreproBlockRows = 4096
+
 # File columns
 PreproIdx = OrderedDict({})
 PreproIdx["SOD"]=0
@@ -98,7 +161,101 @@ PreproIdx["GEOM FREE"]=17
 PreproIdx["VTEC RATE"]=18
 PreproIdx["iAATR"]=19
 
-# Rejection causes flags
+# Header label of each column
+PreproHdrLabels = OrderedDict(zip(PreproIdx, PreproHdr[1:].split()))
+
+# Rows written into the PREPRO OBS file (see PREPRO_ROWS)
+PreproRows = ["ALL", "VALID", "REJECTED"]
+
+# Preprocessed observations of one epoch, one row per satellite, 
+# as delivered by the vectorized preprocessing engines
+PreproObsType = OrderedDict({})
+PreproObsType["Sod"]="f8"
+PreproObsType["Doy"]="i4"
+PreproObsType["Const"]="U1"
+PreproObsType["Prn"]="i4"
+PreproObsType["Elevation"]="f8"
+PreproObsType["Azimuth"]="f8"
+PreproObsType["C1"]="f8"
+PreproObsType["P1"]="f8"
+PreproObsType["L1"]="f8"
+PreproObsType["L1Meters"]="f8"
+PreproObsType["S1"]="f8"
+PreproObsType["P2"]="f8"
+PreproObsType["L2"]="f8"
+PreproObsType["S2"]="f8"
+PreproObsType["SmoothC1"]="f8"
+PreproObsType["GeomFree"]="f8"
+PreproObsType["GeomFreePrev"]="f8"
+PreproObsType["ValidL1"]="i4"
+PreproObsType["RejectionCause"]="i4"
+PreproObsType["StatusL2"]="i4"
+PreproObsType["Status"]="i4"
+PreproObsType["RangeRateL1"]="f8"
+PreproObsType["RangeRateStepL1"]="f8"
+PreproObsType["PhaseRateL1"]="f8"
+PreproObsType["PhaseRateStepL1"]="f8"
+PreproObsType["VtecRate"]="f8"
+PreproObsType["iAATR"]="f8"
+PreproObsType["Mpp"]="f8"
+
+# Preprocessed observations structured array type
+PreproObsDtype = np.dtype([(Field, PreproObsType[Field]) for Field in PreproObsType])
+
+# Preprocessed observations written in each PREPRO OBS file column
+PreproObsCols = OrderedDict({})
+PreproObsCols["SOD"]="Sod"
+PreproObsCols["DOY"]="Doy"
+PreproObsCols["CONST"]="Const"
+PreproObsCols["PRN"]="Prn"
+PreproObsCols["ELEV"]="Elevation"
+PreproObsCols["AZIM"]="Azimuth"
+PreproObsCols["VALID"]="ValidL1"
+PreproObsCols["REJECT"]="RejectionCause"
+PreproObsCols["STATUS"]="Status"
+PreproObsCols["C1"]="C1"
+PreproObsCols["C1SMOOTHED"]="SmoothC1"
+PreproObsCols["L1"]="L1Meters"
+PreproObsCols["S1"]="S1"
+PreproObsCols["CODE RATE"]="RangeRateL1"
+PreproObsCols["CODE ACC"]="RangeRateStepL1"
+PreproObsCols["PHASE RATE"]="PhaseRateL1"
+PreproObsCols["PHASE ACC"]="PhaseRateStepL1"
+PreproObsCols["GEOM FREE"]="GeomFree"
+PreproObsCols["VTEC RATE"]="VtecRate"
+PreproObsCols["iAATR"]="iAATR"
+
+# PREPRO OBS Parquet output
+# Partition of each receiver and day inside OUT/PPVE
+PreproParquetDirFmt = "rcvr=%s/year=%02d/doy=%03d"
+
+# Part files of a partition, named after their first SoD
+PreproParquetFileFmt = "part-%05d.parquet"
+
+# Compressed PREPRO OBS files
+# Extension of each PREPRO_COMPRESS option
+PreproCompression = OrderedDict({})
+PreproCompression["NONE"]=""
+PreproCompression["GZ"]=".gz"
+PreproCompression["BZ2"]=".bz2"
+PreproCompression["XZ"]=".xz"
+PreproCompression["ZST"]=".zst"
+
+# Size of the blocks compressed independently by each thread [bytes]
+PreproCompressBlockSize = 1 << 20
+
+# Maximum number of blocks being compressed, per thread
+PreproCompressQueueSize = 2
+
+# PREPRO OBS background writer
+# Size of the blocks written by the writer thread [characters]
+PreproWriterBlockSize = 1 << 20
+
+# Rejection causes flags (REJ column of the PREPRO OBS files)
+# 11 (NOT_PREPROCESSED) flags the satellites in view that are not
+# preprocessed: out of the NAV_SOLUTION constellations, or Galileo
+# satellites, since only GPS L1 C/A is preprocessed (see
+# PreproStateConst in Preprocessing.py)
 REJECTION_CAUSE = OrderedDict({})
 REJECTION_CAUSE["NCHANNELS_GPS"]=1
 REJECTION_CAUSE["MASKANGLE"]=2
@@ -110,6 +267,7 @@ REJECTION_CAUSE["MAX_PHASE_RATE"]=7
 REJECTION_CAUSE["MAX_PHASE_RATE_STEP"]=8
 REJECTION_CAUSE["MAX_CODE_RATE"]=9
 REJECTION_CAUSE["MAX_CODE_RATE_STEP"]=10
+REJECTION_CAUSE["NOT_PREPROCESSED"]=11
 
 REJECTION_CAUSE_DESC = OrderedDict({})
 REJECTION_CAUSE_DESC["1: Number of Channels for GPS"]=1
@@ -122,6 +280,120 @@ REJECTION_CAUSE_DESC["7: Maximum Phase Rate"]=7
 REJECTION_CAUSE_DESC["8: Maximum Phase Rate Step"]=8
 REJECTION_CAUSE_DESC["9: Maximum Code Rate"]=9
 REJECTION_CAUSE_DESC["10: Maximum Code Rate Step"]=10
+REJECTION_CAUSE_DESC["11: Not Preprocessed (non GPS)"]=11
+
+# Optional configuration parameters
+#----------------------------------------------------------------------
+# Default values of the parameters that may be omitted in conf file
+ConfDefaults = OrderedDict({})
+ConfDefaults["SOD_WINDOW"]=None
+ConfDefaults["OBS_CACHE"]=[0, 1024]
+ConfDefaults["OBS_READER"]="BULK"
+ConfDefaults["OBS_FORMAT"]="OBS"
+ConfDefaults["GAL_FREQ"]="E1E5A"
+ConfDefaults["PREPRO_ENGINE"]="SCALAR"
+ConfDefaults["PREPRO_KERNELS"]="PYTHON"
+ConfDefaults["CHECKPOINT"]=[0, 3600]
+ConfDefaults["CARRY_PREPRO_STATE"]=0
+ConfDefaults["FOLLOW_TIMING"]=[0.1, 0]
+ConfDefaults["SERVER"]=[7010, 4, 4]
+ConfDefaults["PREPRO_PARQUET"]=[0, 131072]
+ConfDefaults["PREPRO_ARROW"]=["NONE", 0]
+ConfDefaults["PREPRO_WRITER"]=[0, 1024]
+ConfDefaults["PREPRO_COMPRESS"]=["NONE", 4]
+ConfDefaults["PREPRO_COLS"]=list(PreproIdx)
+ConfDefaults["PREPRO_ROWS"]="ALL"
+ConfDefaults["PREPRO_DECIMATION"]=0
+
+# OBS index
+#----------------------------------------------------------------------
+# Extension of the OBS index sidecar file
+ObsIndexExt = ".idx"
+
+# Header of the OBS index sidecar file
+ObsIndexHdr = "# OBS INDEX SIZE %d MTIME %d\n# SOD OFFSET NLINES\n"
+
+# OBS stream reader
+#----------------------------------------------------------------------
+# Size of the chunks read from the OBS file [characters]
+ObsChunkSize = 1 << 20
+
+# Compressed OBS files
+#----------------------------------------------------------------------
+# Supported extensions and their decompression modules
+ObsCompression = OrderedDict({})
+ObsCompression[".gz"]=gzip
+ObsCompression[".bz2"]=bz2
+ObsCompression[".xz"]=lzma
+
+# Size of the compressed blocks read by the decompression thread [bytes]
+ObsDecompressBlockSize = 1 << 20
+
+# Maximum number of decompressed blocks waiting to be parsed
+ObsDecompressQueueSize = 8
+
+# RINEX observation files
+#----------------------------------------------------------------------
+# Header labels (columns 61-80)
+RinexVersionLabel = "RINEX VERSION / TYPE"
+RinexObsTypes2Label = "# / TYPES OF OBSERV"
+RinexObsTypes3Label = "SYS / # / OBS TYPES"
+RinexEndOfHeaderLabel = "END OF HEADER"
+
+# Width of each observation field (F14.3 value, LLI and signal strength)
+RinexObsWidth = 16
+
+# Width of the observation value
+RinexValueWidth = 14
+
+# Observations per line in RINEX 2
+RinexObsPerLine2 = 5
+
+# Satellites per epoch line in RINEX 2
+RinexSatsPerLine2 = 12
+
+# RINEX 2 observation codes of each OBS column, by priority
+RinexObsCodes2 = OrderedDict({})
+RinexObsCodes2["C1"]=["C1", "P1"]
+RinexObsCodes2["L1"]=["L1"]
+RinexObsCodes2["P2"]=["P2", "C2"]
+RinexObsCodes2["L2"]=["L2"]
+RinexObsCodes2["S1"]=["S1"]
+RinexObsCodes2["S2"]=["S2"]
+
+# RINEX 3 observation codes of each OBS column, by constellation and
+# priority
+RinexObsCodes3 = OrderedDict({})
+RinexObsCodes3["G"] = OrderedDict({})
+RinexObsCodes3["G"]["C1"]=["C1C"]
+RinexObsCodes3["G"]["L1"]=["L1C"]
+RinexObsCodes3["G"]["P2"]=["C2W", "C2P", "C2Y", "C2D", "C2X", "C2L", "C2S"]
+RinexObsCodes3["G"]["L2"]=["L2W", "L2P", "L2Y", "L2D", "L2X", "L2L", "L2S"]
+RinexObsCodes3["G"]["S1"]=["S1C"]
+RinexObsCodes3["G"]["S2"]=["S2W", "S2P", "S2Y", "S2D", "S2X", "S2L", "S2S"]
+RinexObsCodes3["E"] = OrderedDict({})
+RinexObsCodes3["E"]["C1"]=["C1C", "C1X", "C1B"]
+RinexObsCodes3["E"]["L1"]=["L1C", "L1X", "L1B"]
+RinexObsCodes3["E"]["S1"]=["S1C", "S1X", "S1B"]
+RinexObsCodes3["S"] = OrderedDict({})
+RinexObsCodes3["S"]["C1"]=["C1C"]
+RinexObsCodes3["S"]["L1"]=["L1C"]
+RinexObsCodes3["S"]["S1"]=["S1C"]
+
+# RINEX 3 Galileo second frequency codes of each OBS column, by
+# GAL_FREQ and priority
+RinexGalFreqCodes3 = OrderedDict({})
+RinexGalFreqCodes3["E1E5A"] = OrderedDict({})
+RinexGalFreqCodes3["E1E5A"]["P2"]=["C5Q", "C5X", "C5I"]
+RinexGalFreqCodes3["E1E5A"]["L2"]=["L5Q", "L5X", "L5I"]
+RinexGalFreqCodes3["E1E5A"]["S2"]=["S5Q", "S5X", "S5I"]
+RinexGalFreqCodes3["E1E5B"] = OrderedDict({})
+RinexGalFreqCodes3["E1E5B"]["P2"]=["C7Q", "C7X", "C7I"]
+RinexGalFreqCodes3["E1E5B"]["L2"]=["L7Q", "L7X", "L7I"]
+RinexGalFreqCodes3["E1E5B"]["S2"]=["S7Q", "S7X", "S7I"]
+
+# SBAS satellites are labelled as GPS with PRN + 100 in OBS files
+RinexSbasPrnOffset = 100
 
 # Input functions
 #----------------------------------------------------------------------
@@ -390,6 +662,12 @@ def readConf(CfgFile):
                             # Check parameter and load it in Conf
                             Conf[Key] = checkConfParam(Key, Fields, 1, 1, [None], [None])
 
+                            # Check the selected frequencies
+                            if Conf[Key] not in RinexGalFreqCodes3:
+                                sys.stderr.write("ERROR: Unknown GAL_FREQ %s\n" %
+                                Conf[Key])
+                                sys.exit(-1)
+
                             # Increment number of read parameters
                             NReadParams = NReadParams + 1
 
@@ -411,6 +689,307 @@ def readConf(CfgFile):
                             # Increment number of read parameters
                             NReadParams = NReadParams + 1
 
+                        # SoD window to be processed [SECONDS] (Optional)
+                        #--------------------------------------------------------------------
+                        # p1: First SoD of the window
+                        # p2: Last SoD of the window
+                        #--------------------------------------------------------------------
+                        elif Key=='SOD_WINDOW':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 2, 2, 
+                            [0, 0], [Const.S_IN_D, Const.S_IN_D])
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # Parsed OBS data cache (Optional)
+                        #--------------------------------------------------------------------
+                        # p1: Use cache [0:OFF|1:ON]
+                        # p2: Maximum cache size [MB]
+                        #--------------------------------------------------------------------
+                        elif Key=='OBS_CACHE':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 2, 2, 
+                            [0, 0], [1, 1e8])
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # OBS reader [BULK|STREAM] (Optional)
+                        #--------------------------------------------------------------------
+                        # BULK: whole OBS file parsed in one pass
+                        # STREAM: OBS file parsed in chunks with bounded memory
+                        #--------------------------------------------------------------------
+                        elif Key=='OBS_READER':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 1, 1, [None], [None])
+
+                            # Check the selected reader
+                            if Conf[Key] not in ["BULK", "STREAM"]:
+                                sys.stderr.write("ERROR: Unknown OBS_READER %s\n" %
+                                Conf[Key])
+                                sys.exit(-1)
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # OBS input format [OBS|RINEX] (Optional)
+                        #--------------------------------------------------------------------
+                        # OBS: PETRUS OBS files
+                        # RINEX: RINEX 2.11/3.x observation files, with ELEV
+                        #        and AZIM from the SP3 files in INP/SP3
+                        #--------------------------------------------------------------------
+                        elif Key=='OBS_FORMAT':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 1, 1, [None], [None])
+
+                            # Check the selected format
+                            if Conf[Key] not in ["OBS", "RINEX"]:
+                                sys.stderr.write("ERROR: Unknown OBS_FORMAT %s\n" %
+                                Conf[Key])
+                                sys.exit(-1)
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # Preprocessing engine [SCALAR|VECTOR|BATCH] (Optional)
+                        #--------------------------------------------------------------------
+                        # SCALAR: satellite by satellite
+                        # VECTOR: each epoch in a single kernel call (only
+                        #         faster than SCALAR with PREPRO_KERNELS NUMBA)
+                        # BATCH: the whole day at once, arc by arc of each satellite
+                        #--------------------------------------------------------------------
+                        elif Key=='PREPRO_ENGINE':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 1, 1, [None], [None])
+
+                            # Check the selected engine
+                            if Conf[Key] not in ["SCALAR", "VECTOR", "BATCH"]:
+                                sys.stderr.write("ERROR: Unknown PREPRO_ENGINE %s\n" %
+                                Conf[Key])
+                                sys.exit(-1)
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # Preprocessing kernels backend [PYTHON|NUMBA] (Optional)
+                        #--------------------------------------------------------------------
+                        # PYTHON: kernels run by the Python interpreter
+                        # NUMBA: kernels compiled with Numba, if installed
+                        #--------------------------------------------------------------------
+                        elif Key=='PREPRO_KERNELS':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 1, 1, [None], [None])
+
+                            # Check the selected backend
+                            if Conf[Key] not in ["PYTHON", "NUMBA"]:
+                                sys.stderr.write("ERROR: Unknown PREPRO_KERNELS %s\n" %
+                                Conf[Key])
+                                sys.exit(-1)
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # Checkpoints of the preprocessing state (Optional)
+                        # [ACT(0/1) PERIOD(s)]
+                        #--------------------------------------------------------------------
+                        elif Key=='CHECKPOINT':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 2, 2, [0, 1], [1, 86400])
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # Carry the preprocessing state to the next day (Optional)
+                        # [0/1]
+                        #--------------------------------------------------------------------
+                        elif Key=='CARRY_PREPRO_STATE':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 1, 1, [0], [1])
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # Follow mode timing (Optional)
+                        # [POLL_PERIOD(s) EPOCH_TIMEOUT(s)]
+                        #--------------------------------------------------------------------
+                        # POLL_PERIOD: maximum wait for new OBS lines
+                        # EPOCH_TIMEOUT: time without new OBS lines to
+                        # consider the last epoch complete (0: wait for
+                        # the next epoch)
+                        #--------------------------------------------------------------------
+                        elif Key=='FOLLOW_TIMING':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 2, 2, [0.001, 0], [60, 60])
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # Server settings (Optional)
+                        # [PORT WORKERS MAX_BATCHES]
+                        #--------------------------------------------------------------------
+                        # PORT: local TCP and UDP port
+                        # WORKERS: worker processes preprocessing the streams
+                        # MAX_BATCHES: batches of lines of a receiver being
+                        # preprocessed before stopping reading it (TCP) or
+                        # dropping its datagrams (UDP)
+                        #--------------------------------------------------------------------
+                        elif Key=='SERVER':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 3, 3, [1, 1, 1], [65535, 1024, 1024])
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # PREPRO OBS Parquet output (Optional)
+                        # [0/1 ROW_GROUP_ROWS]
+                        #--------------------------------------------------------------------
+                        # Written into OUT/PPVE/rcvr=<ACR>/year=<YY>/doy=<DDD>,
+                        # besides the PREPRO OBS text file (if PREPRO_OUT is 1)
+                        # ROW_GROUP_ROWS: rows of each Parquet row group
+                        #--------------------------------------------------------------------
+                        elif Key=='PREPRO_PARQUET':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 2, 2, [0, 1024], [1, 16777216])
+
+                            # Check that it can be written
+                            if Conf[Key][0] == 1 and pyarrow is None:
+                                sys.stderr.write("ERROR: PREPRO_PARQUET requires "\
+                                    "the pyarrow package\n")
+                                sys.exit(-1)
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # PREPRO OBS Arrow output (Optional)
+                        # [NONE|FILE|SOCKET BATCH_ROWS]
+                        #--------------------------------------------------------------------
+                        # Arrow IPC stream of the results of each receiver and day
+                        # NONE: no Arrow output
+                        # FILE: written into OUT/PPVE/PREPRO_OBS_<ACR>_Y<YY>D<DDD>.arrows
+                        # SOCKET: sent to the consumers connected to the local
+                        # socket OUT/PPVE/PREPRO_OBS_<ACR>_Y<YY>D<DDD>.sock
+                        # BATCH_ROWS: rows gathered in each record batch (0: one
+                        # record batch per epoch, or per day with the BATCH engine)
+                        #--------------------------------------------------------------------
+                        elif Key=='PREPRO_ARROW':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 2, 2, [None, 0], [None, 16777216])
+
+                            # Check the selected output
+                            if Conf[Key][0] not in ["NONE", "FILE", "SOCKET"]:
+                                sys.stderr.write("ERROR: Unknown PREPRO_ARROW %s\n" %
+                                Conf[Key][0])
+                                sys.exit(-1)
+
+                            # Check that it can be written
+                            if Conf[Key][0] != "NONE" and pyarrow is None:
+                                sys.stderr.write("ERROR: PREPRO_ARROW requires "\
+                                    "the pyarrow package\n")
+                                sys.exit(-1)
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # PREPRO OBS background writer (Optional)
+                        # [ACT(0/1) QUEUE_SIZE]
+                        #--------------------------------------------------------------------
+                        # Write the PREPRO OBS file from a background thread,
+                        # so that the preprocessing does not wait for the disk
+                        # QUEUE_SIZE: maximum number of formatted epochs waiting
+                        # to be written
+                        #--------------------------------------------------------------------
+                        elif Key=='PREPRO_WRITER':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 2, 2, [0, 1], [1, 1048576])
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # PREPRO OBS file compression (Optional)
+                        # [NONE|GZ|BZ2|XZ|ZST THREADS]
+                        #--------------------------------------------------------------------
+                        # Written into PREPRO_OBS_<ACR>_Y<YY>D<DDD>.dat.<gz|bz2|xz|zst>
+                        # THREADS: threads compressing blocks of the file
+                        #--------------------------------------------------------------------
+                        elif Key=='PREPRO_COMPRESS':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 2, 2, [None, 1], [None, 256])
+
+                            # Check the selected compression
+                            if Conf[Key][0] not in PreproCompression:
+                                sys.stderr.write("ERROR: Unknown PREPRO_COMPRESS %s\n" %
+                                Conf[Key][0])
+                                sys.exit(-1)
+
+                            # Check that it can be written
+                            if Conf[Key][0] == "ZST" and zstandard is None:
+                                sys.stderr.write("ERROR: PREPRO_COMPRESS ZST requires "\
+                                    "the zstandard package\n")
+                                sys.exit(-1)
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # PREPRO OBS file columns (Optional)
+                        # [ALL|COL1 COL2...]
+                        #--------------------------------------------------------------------
+                        # Columns written, named as in PreproIdx without blanks
+                        # (e.g. SOD PRN ELEV VALID REJECT C1SMOOTHED CODERATE)
+                        #--------------------------------------------------------------------
+                        elif Key=='PREPRO_COLS':
+                            # Check parameter and load it in Conf
+                            Cols = checkConfParam(Key, Fields, 1, len(PreproIdx), 
+                            [None] * len(PreproIdx), [None] * len(PreproIdx))
+                            if not isinstance(Cols, list):
+                                Cols = [Cols]
+
+                            # Check the selected columns and keep them in
+                            # the file order
+                            ConfCols = OrderedDict([("".join(Col.split()), Col) \
+                                for Col in PreproIdx])
+                            for Col in Cols:
+                                if Col not in ConfCols and Col != "ALL":
+                                    sys.stderr.write("ERROR: Unknown PREPRO_COLS %s\n" %
+                                    Col)
+                                    sys.exit(-1)
+                            Conf[Key] = [Col for ConfCol, Col in ConfCols.items() \
+                                if ConfCol in Cols or "ALL" in Cols]
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # PREPRO OBS file rows [ALL|VALID|REJECTED] (Optional)
+                        #--------------------------------------------------------------------
+                        # ALL: all the satellites in view
+                        # VALID: only the valid measurements
+                        # REJECTED: only the rejected measurements (REJECT > 0)
+                        #--------------------------------------------------------------------
+                        elif Key=='PREPRO_ROWS':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 1, 1, [None], [None])
+
+                            # Check the selected rows
+                            if Conf[Key] not in PreproRows:
+                                sys.stderr.write("ERROR: Unknown PREPRO_ROWS %s\n" %
+                                Conf[Key])
+                                sys.exit(-1)
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # PREPRO OBS file decimation [SECONDS] (Optional)
+                        #--------------------------------------------------------------------
+                        # Only the epochs multiple of it are written, whatever
+                        # the OBS rate (0: all the epochs)
+                        #--------------------------------------------------------------------
+                        elif Key=='PREPRO_DECIMATION':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 1, 1, [0], [Const.S_IN_D])
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
                         # Rx Position Information [STATIC|DYN]
                         #-----------------------------------------------
                         # STAT: RIMS static positions
@@ -789,8 +1368,14 @@ def processConf(Conf):
     # =======
     # Conf: dict
     #         Dictionary containing configuration with
-    #         Julian Days
+    #         Julian Days and default values of the
+    #         optional parameters
     
+    # Set default values of the optional parameters not configured
+    for Key, Value in ConfDefaults.items():
+        if Key not in Conf:
+            Conf[Key] = Value
+
     ConfCopy = Conf.copy()
     for Key in ConfCopy:
         Value = ConfCopy[Key]
@@ -918,6 +1503,330 @@ def splitLine(Line):
 # End of splitLine()
 
 
+def findObsFile(ObsFile):
+    
+    # Purpose: find the OBS file or its compressed variant
+       
+    # Parameters
+    # ==========
+    # ObsFile: str
+    #         Path to uncompressed OBS file
+
+    # Returns
+    # =======
+    # ObsFile: str
+    #         Path to the existing OBS file: the uncompressed one
+    #         or, if not found, the first compressed variant found
+    
+
+    # If the uncompressed file does not exist
+    if not os.path.exists(ObsFile):
+        # Look for the compressed variants
+        for Ext in ObsCompression:
+            if os.path.exists(ObsFile + Ext):
+                return ObsFile + Ext
+
+    return ObsFile
+
+# End of findObsFile()
+
+
+def findObsFragments(ObsFile):
+    
+    # Purpose: find the partial OBS files (fragments) delivered instead
+    #          of a whole OBS file, named as the OBS file with a "_<PART>"
+    #          suffix (e.g. OBS_TLSA_Y15D001_00.dat)
+       
+    # Parameters
+    # ==========
+    # ObsFile: str
+    #         Path to uncompressed OBS file
+
+    # Returns
+    # =======
+    # ObsFragments: list
+    #         Paths to the existing fragments, sorted by name. Each one
+    #         is uncompressed or, if not found, its first compressed
+    #         variant found
+    
+
+    Root, Ext = os.path.splitext(ObsFile)
+    ObsFragments = []
+
+    # Look for the fragments and their compressed variants
+    for Fragment in sorted(glob.glob(Root + "_*" + Ext + "*")):
+        for CompExt in [""] + list(ObsCompression):
+            if Fragment.endswith(Ext + CompExt):
+                Fragment = findObsFile(Fragment[:len(Fragment) - len(CompExt)])
+                if Fragment not in ObsFragments:
+                    ObsFragments.append(Fragment)
+                break
+
+    return ObsFragments
+
+# End of findObsFragments()
+
+
+def findRinexFile(ObsDir, Rcvr, Year, Doy):
+    
+    # Purpose: find the RINEX observation file of a receiver and day
+       
+    # Parameters
+    # ==========
+    # ObsDir: str
+    #         Path to OBS input directory
+    # Rcvr: str
+    #         Receiver acronym (4 characters)
+    # Year: int
+    #         Year
+    # Doy: int
+    #         Day of Year
+
+    # Returns
+    # =======
+    # RinexFile: str
+    #         Path to the RINEX file: RINEX 3 long name or RINEX 2
+    #         short name, either uncompressed or compressed
+    
+
+    # Candidate names: RINEX 3 long names first
+    Candidates = [RinexFile for RinexFile in sorted(glob.glob(ObsDir + '/' + 
+    "%s*_R_%04d%03d*_MO.rnx*" % (Rcvr.upper(), Year, Doy)))
+    if os.path.splitext(RinexFile)[1] in [".rnx"] + list(ObsCompression)]
+    for Name in [Rcvr.lower(), Rcvr.upper()]:
+        Candidates.append(ObsDir + '/' + "%s%03d0.%02do" % 
+        (Name, Doy, Year % 100))
+
+    # Take the first one found
+    for RinexFile in Candidates:
+        RinexFile = findObsFile(RinexFile)
+        if os.path.exists(RinexFile):
+            return RinexFile
+
+    sys.stderr.write("ERROR: RINEX file of %s Y%02dD%03d not found in %s\n" %
+    (Rcvr, Year % 100, Doy, ObsDir))
+    sys.exit(-1)
+
+# End of findRinexFile()
+
+
+def isObsFileCompressed(ObsFile):
+    
+    # Purpose: check whether the OBS file is compressed
+       
+    # Parameters
+    # ==========
+    # ObsFile: str
+    #         Path to OBS file
+
+    # Returns
+    # =======
+    # Compressed: bool
+    #         True if the file has a supported compression extension
+    
+
+    return os.path.splitext(ObsFile)[1] in ObsCompression
+
+# End of isObsFileCompressed()
+
+
+class ObsDecompressReader:
+    
+    # Purpose: read-only text file object over a compressed OBS file.
+    #          Decompression runs in a background thread that feeds a
+    #          bounded queue, so that it overlaps with the parsing
+    #          and preprocessing done by the reader
+       
+    # Attributes
+    # ==========
+    # DecompressTime: float
+    #         Time spent by the thread decompressing [s]
+    # WaitTime: float
+    #         Time the reader waited for decompressed data [s]
+    
+
+    def __init__(self, ObsFile):
+        self.DecompressTime = 0.0
+        self.WaitTime = 0.0
+        self.Buffer = ""
+        self.Pos = 0
+        self.EndOfFile = False
+        self.Queue = queue.Queue(ObsDecompressQueueSize)
+        self.Stop = threading.Event()
+        self.Thread = threading.Thread(target=self.decompress, 
+        args=(ObsFile,), daemon=True)
+        self.Thread.start()
+
+    def decompress(self, ObsFile):
+        # Decompress blocks until the end of file or until stopped
+        try:
+            Module = ObsCompression[os.path.splitext(ObsFile)[1]]
+            Decoder = codecs.getincrementaldecoder("utf-8")()
+            with Module.open(ObsFile, 'rb') as f:
+                while not self.Stop.is_set():
+                    Start = time.perf_counter()
+                    Block = f.read(ObsDecompressBlockSize)
+                    Text = Decoder.decode(Block, final=not Block)
+                    self.DecompressTime += time.perf_counter() - Start
+                    if Text:
+                        self.put(Text)
+                    if not Block:
+                        break
+
+            self.put(None)
+
+        except Exception as Error:
+            # Propagate the error to the reader
+            self.put(Error)
+
+    def put(self, Item):
+        # Put an item in the queue unless the reader is closed
+        while not self.Stop.is_set():
+            try:
+                self.Queue.put(Item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def get(self):
+        # Wait for the next decompressed text (None at the end of file)
+        if self.EndOfFile:
+            return None
+        Start = time.perf_counter()
+        Item = self.Queue.get()
+        self.WaitTime += time.perf_counter() - Start
+        if Item is None:
+            self.EndOfFile = True
+        elif isinstance(Item, Exception):
+            raise Item
+
+        return Item
+
+    def fill(self):
+        # Append the next decompressed text to what is left unread of
+        # the buffer. Return False at the end of file
+        Text = self.get()
+        if Text is None:
+            return False
+        self.Buffer = self.Buffer[self.Pos:] + Text
+        self.Pos = 0
+
+        return True
+
+    def read(self, Size=-1):
+        # Return the rest of the file, joined once
+        if Size < 0:
+            Texts = [self.Buffer[self.Pos:]]
+            Text = self.get()
+            while Text is not None:
+                Texts.append(Text)
+                Text = self.get()
+            self.Buffer = ""
+            self.Pos = 0
+            return "".join(Texts)
+
+        # Or up to Size characters, waiting for data if needed
+        while self.Pos >= len(self.Buffer) and self.fill():
+            pass
+        Text = self.Buffer[self.Pos:self.Pos + Size]
+        self.Pos += len(Text)
+
+        return Text
+
+    def __iter__(self):
+        # Yield the lines of the file
+        Rest = ""
+        Text = self.read(ObsDecompressBlockSize)
+        while Text:
+            Lines = (Rest + Text).split('\n')
+            Rest = Lines.pop()
+            for Line in Lines:
+                yield Line
+            Text = self.read(ObsDecompressBlockSize)
+
+        if Rest:
+            yield Rest
+
+    def readline(self):
+        # Read characters until the end of line, from the buffer
+        EndOfLine = self.Buffer.find('\n', self.Pos)
+        while EndOfLine < 0:
+            # Only the unread part of the line is kept when filling
+            Searched = len(self.Buffer) - self.Pos
+            if not self.fill():
+                EndOfLine = len(self.Buffer) - 1
+                break
+            EndOfLine = self.Buffer.find('\n', Searched)
+        Line = self.Buffer[self.Pos:EndOfLine + 1]
+        self.Pos = EndOfLine + 1
+
+        return Line
+
+    def close(self):
+        # Stop the decompression thread
+        self.Stop.set()
+        self.Thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *Args):
+        self.close()
+
+# End of class ObsDecompressReader
+
+
+def openObsFile(ObsFile):
+    
+    # Purpose: open the OBS file for reading, decompressing it in
+    #          a background thread if it is compressed
+       
+    # Parameters
+    # ==========
+    # ObsFile: str
+    #         Path to OBS file
+
+    # Returns
+    # =======
+    # f: file descriptor
+    #         OBS file opened in text mode
+    
+
+    if isObsFileCompressed(ObsFile):
+        return ObsDecompressReader(ObsFile)
+
+    return open(ObsFile, 'r')
+
+# End of openObsFile()
+
+
+def reportObsDecompression(ObsFile, f, ReadTime):
+    
+    # Purpose: report the decompression time of a compressed OBS file
+    #          separately from its parsing time
+       
+    # Parameters
+    # ==========
+    # ObsFile: str
+    #         Path to OBS file
+    # f: file descriptor
+    #         OBS file opened with openObsFile
+    # ReadTime: float
+    #         Wall-clock time spent reading the OBS file [s]
+
+    # Returns
+    # =======
+    # Nothing
+    
+
+    if isinstance(f, ObsDecompressReader):
+        print("INFO: Read %s: decompression %.3f s (background), "\
+            "parsing %.3f s, waiting for data %.3f s" % 
+            (ObsFile, f.DecompressTime, ReadTime - f.WaitTime, f.WaitTime))
+
+# End of reportObsDecompression()
+
+
 def readObsEpoch(f):
     
     # Purpose: read one epoch of OBS file (all the LoS)
@@ -963,41 +1872,1631 @@ def readObsEpoch(f):
 # End of readObsEpoch()
 
 
-def createOutputFile(Path, Hdr):
+def computeObsEpochIdx(ObsData):
     
-    # Purpose: open output file and write its header
+    # Purpose: compute the epoch boundaries of OBS data
        
     # Parameters
     # ==========
-    # Path: str
-    #         Path to file
-    # Hdr: str
-    #         File header
+    # ObsData: numpy structured array
+    #         OBS data sorted by SoD (ObsDtype)
 
     # Returns
     # =======
-    # f: File descriptor
-    #         Descriptor of output file
+    # EpochIdx: numpy array
+    #         Index of the first row of each epoch, followed by
+    #         the number of rows, i.e. epoch i spans rows
+    #         EpochIdx[i]:EpochIdx[i+1]
     
-    # Display Message
-    print("INFO: Creating file: %s..." % Path)
 
-    # Create output directory, if needed
-    if not os.path.exists(os.path.dirname(Path)):
-        os.makedirs(os.path.dirname(Path))
+    # If there is no data, there are no epochs
+    if len(ObsData) == 0:
+        return np.zeros(1, dtype=int)
 
-    # Open PREPRO OBS file
-    f = open(Path, 'w')
+    # Epochs start where the SoD changes
+    EpochIdx = np.concatenate((
+        [0],
+        np.flatnonzero(np.diff(ObsData["SOD"])) + 1,
+        [len(ObsData)]))
 
-    # Write header
-    f.write(Hdr)
+    return EpochIdx
+
+# End of computeObsEpochIdx()
+
+
+def buildObsIndex(ObsFile):
+    
+    # Purpose: scan the OBS file and build its epoch index
+       
+    # Parameters
+    # ==========
+    # ObsFile: str
+    #         Path to OBS file
+
+    # Returns
+    # =======
+    # ObsIndex: dict
+    #         Epoch index of the OBS file:
+    #         ObsIndex["SOD"][i]: SoD of epoch i
+    #         ObsIndex["OFFSET"][i]: byte offset of its first line
+    #         ObsIndex["NLINES"][i]: number of lines of the epoch
+    #         ObsIndex["SIZE"], ObsIndex["MTIME"]: size and mtime
+    #         of the OBS file when the index was built
+    
+
+    # Initialize index
+    Sods = []
+    Offsets = []
+    NLines = []
+
+    # Get file size and modification time
+    Stat = os.stat(ObsFile)
+
+    # Open the file in binary mode to count bytes
+    with open(ObsFile, 'rb') as f:
+        # Skip header line
+        Offset = len(f.readline())
+        PrevSod = None
+
+        # Loop over lines keeping only the SoD field
+        for Line in f:
+            LineSplit = Line.split(None, 1)
+            if len(LineSplit) != 0:
+                Sod = LineSplit[ObsIdx["SOD"]]
+
+                # New epoch
+                if Sod != PrevSod:
+                    Sods.append(float(Sod))
+                    Offsets.append(Offset)
+                    NLines.append(0)
+                    PrevSod = Sod
+
+                NLines[-1] = NLines[-1] + 1
+
+            Offset = Offset + len(Line)
+
+    ObsIndex = OrderedDict({})
+    ObsIndex["SOD"] = np.array(Sods, dtype=float)
+    ObsIndex["OFFSET"] = np.array(Offsets, dtype=np.int64)
+    ObsIndex["NLINES"] = np.array(NLines, dtype=np.int64)
+    ObsIndex["SIZE"] = Stat.st_size
+    ObsIndex["MTIME"] = Stat.st_mtime_ns
+
+    return ObsIndex
+
+# End of buildObsIndex()
+
+
+def writeObsIndex(IndexFile, ObsIndex):
+    
+    # Purpose: persist the OBS epoch index in its sidecar file
+       
+    # Parameters
+    # ==========
+    # IndexFile: str
+    #         Path to OBS index sidecar file
+    # ObsIndex: dict
+    #         Epoch index of the OBS file (see buildObsIndex)
+
+    # Returns
+    # =======
+    # Nothing
+    
+
+    # Write a temporary file and rename it, so that concurrent
+    # readers never see a partial index
+    TmpFile = IndexFile + ".%d.tmp" % os.getpid()
+    try:
+        with open(TmpFile, 'w') as f:
+            f.write(ObsIndexHdr % (ObsIndex["SIZE"], ObsIndex["MTIME"]))
+            for Sod, Offset, NLines in zip(ObsIndex["SOD"], 
+            ObsIndex["OFFSET"], ObsIndex["NLINES"]):
+                f.write("%.3f %d %d\n" % (Sod, Offset, NLines))
+
+        os.replace(TmpFile, IndexFile)
+
+    except OSError:
+        # The OBS directory may be read-only, the index is only a speed-up
+        sys.stderr.write("WARNING: Cannot write OBS index file %s\n" % IndexFile)
+        if os.path.exists(TmpFile):
+            os.remove(TmpFile)
+
+# End of writeObsIndex()
+
+
+def readObsIndex(ObsFile):
+    
+    # Purpose: get the epoch index of the OBS file from its sidecar
+    #          file, building and persisting it if it does not exist
+    #          or if the OBS file size or mtime changed
+       
+    # Parameters
+    # ==========
+    # ObsFile: str
+    #         Path to OBS file
+
+    # Returns
+    # =======
+    # ObsIndex: dict
+    #         Epoch index of the OBS file (see buildObsIndex)
+    
+
+    # Sidecar file
+    IndexFile = ObsFile + ObsIndexExt
+
+    # Get file size and modification time
+    Stat = os.stat(ObsFile)
+
+    # If the sidecar file exists
+    if os.path.exists(IndexFile):
+        with open(IndexFile, 'r') as f:
+            # Check that it has been built for the current OBS file
+            HdrSplit = f.readline().split()
+            if len(HdrSplit) == 7 and \
+                int(HdrSplit[4]) == Stat.st_size and \
+                    int(HdrSplit[6]) == Stat.st_mtime_ns:
+                # Load it (an OBS file without epochs has an empty
+                # index)
+                IndexData = np.loadtxt(f, comments='#', ndmin=2).reshape(-1, 3)
+                ObsIndex = OrderedDict({})
+                ObsIndex["SOD"] = IndexData[:, 0]
+                ObsIndex["OFFSET"] = IndexData[:, 1].astype(np.int64)
+                ObsIndex["NLINES"] = IndexData[:, 2].astype(np.int64)
+                ObsIndex["SIZE"] = Stat.st_size
+                ObsIndex["MTIME"] = Stat.st_mtime_ns
+
+                return ObsIndex
+
+    # Otherwise, (re)build the index and persist it
+    ObsIndex = buildObsIndex(ObsFile)
+    writeObsIndex(IndexFile, ObsIndex)
+
+    return ObsIndex
+
+# End of readObsIndex()
+
+
+def buildObsFilter(Conf, Rcvr):
+    
+    # Purpose: build the OBS filter of a receiver from the configuration.
+    #          It gives the column projection and the row predicates
+    #          to be applied by the OBS readers, so that they deliver
+    #          only what the preprocessing needs
+       
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # Rcvr: list
+    #         Receiver information: position, masking angle...
+
+    # Returns
+    # =======
+    # ObsFilter: dict
+    #         ObsFilter["COLS"]: OBS columns to be materialised
+    #         ObsFilter["CONST"]: constellations to be preprocessed
+    #         ObsFilter["PRN"]: range of PRNs to be preprocessed
+    #         ObsFilter["MIN_ELEV"]: minimum elevation
+    #         Out of CONST or PRN, or below MIN_ELEV, the rows are kept
+    #         (the preprocessing reports them as rejected) but only
+    #         their geometry columns are materialised
+    #         ObsFilter["SOD_WINDOW"]: SoD window to be kept
+    #         ObsFilter["RATE"]: sampling rate. Only the epochs on
+    #         its grid (SoD multiple of it) are kept
+    #         Any predicate set to None is not applied
+    
+
+    ObsFilter = OrderedDict({})
+
+    # Dual frequency measurements are only needed out of SBASL1 mode
+    if Conf["SBAS_MODE"] == "SBASL1":
+        ObsFilter["COLS"] = ObsGeomCols + ObsSfCols
+    else:
+        ObsFilter["COLS"] = ObsGeomCols + ObsSfCols + ObsDfCols
+
+    # Keep the columns in the OBS file order
+    ObsFilter["COLS"] = [Col for Col in ObsIdx if Col in ObsFilter["COLS"]]
+
+    # Row predicates
+    ObsFilter["CONST"] = NavSolutionConst[Conf["NAV_SOLUTION"]]
+    ObsFilter["PRN"] = [1, Const.MAX_NUM_SATS_CONSTEL]
+    ObsFilter["MIN_ELEV"] = Rcvr[RcvrIdx["MASK"]]
+    ObsFilter["SOD_WINDOW"] = Conf["SOD_WINDOW"]
+    ObsFilter["RATE"] = Conf["SAMPLING_RATE"]
+
+    return ObsFilter
+
+# End of buildObsFilter()
+
+
+def applyObsFilter(ObsData, ObsFilter):
+    
+    # Purpose: apply the OBS filter row predicates and column
+    #          projection to OBS data
+       
+    # Parameters
+    # ==========
+    # ObsData: numpy structured array
+    #         OBS data with, at least, the projected columns
+    # ObsFilter: dict
+    #         OBS filter (see buildObsFilter)
+
+    # Returns
+    # =======
+    # FilteredData: numpy structured array
+    #         Selected rows laid out as in ObsIdx (ObsDtype). The
+    #         columns not projected, and the measurements of the
+    #         satellites not preprocessed or below the minimum
+    #         elevation, are set to 0
+    
+
+    # Select rows
+    Selected = np.ones(len(ObsData), dtype=bool)
+    if ObsFilter["SOD_WINDOW"] is not None:
+        Selected &= (ObsData["SOD"] >= ObsFilter["SOD_WINDOW"][0]) & \
+            (ObsData["SOD"] <= ObsFilter["SOD_WINDOW"][1])
+    if ObsFilter["RATE"] is not None and ObsFilter["RATE"] > 1:
+        Selected &= (ObsData["SOD"] % ObsFilter["RATE"]) == 0
+    ObsData = ObsData[Selected]
+
+    # Get satellites not preprocessed or below the minimum elevation
+    Masked = np.zeros(len(ObsData), dtype=bool)
+    if ObsFilter["CONST"] is not None:
+        Masked |= ~np.isin(ObsData["CONST"], ObsFilter["CONST"])
+    if ObsFilter["PRN"] is not None:
+        Masked |= (ObsData["PRN"] < ObsFilter["PRN"][0]) | \
+            (ObsData["PRN"] > ObsFilter["PRN"][1])
+    if ObsFilter["MIN_ELEV"] is not None:
+        Masked |= ObsData["ELEV"] < ObsFilter["MIN_ELEV"]
+
+    # Materialise only the projected columns
+    FilteredData = np.zeros(len(ObsData), dtype=ObsDtype)
+    for Col in ObsFilter["COLS"]:
+        FilteredData[Col] = ObsData[Col]
+        if Col in ObsSfCols or Col in ObsDfCols:
+            FilteredData[Col][Masked] = 0
+
+    return FilteredData
+
+# End of applyObsFilter()
+
+
+def parseObsLines(Lines, ObsFilter=None, SkipRows=0, MaxRows=None):
+    
+    # Purpose: parse OBS lines into a typed structured array
+       
+    # Parameters
+    # ==========
+    # Lines: file descriptor or list
+    #         OBS file or lines to be parsed
+    # ObsFilter: dict
+    #         OBS filter (see buildObsFilter). If None, all the rows
+    #         and columns are parsed
+    # SkipRows: int
+    #         Number of lines to be skipped at the beginning
+    # MaxRows: int
+    #         Maximum number of lines to be parsed. If None, all
+
+    # Returns
+    # =======
+    # ObsData: numpy structured array
+    #         OBS data (ObsDtype)
+    
+
+    # If there is no filter, parse all the columns
+    if ObsFilter is None:
+        return np.loadtxt(Lines, dtype=ObsDtype, skiprows=SkipRows, 
+        max_rows=MaxRows, comments=None, ndmin=1)
+
+    # Otherwise, only the projected ones
+    ObsData = np.loadtxt(Lines, 
+    dtype=np.dtype([(Col, ObsType[Col]) for Col in ObsFilter["COLS"]]), 
+    usecols=[ObsIdx[Col] for Col in ObsFilter["COLS"]],
+    skiprows=SkipRows, max_rows=MaxRows, comments=None, ndmin=1)
+
+    # And apply the row predicates
+    return applyObsFilter(ObsData, ObsFilter)
+
+# End of parseObsLines()
+
+
+def readObsIndexed(ObsFile, ObsFilter):
+    
+    # Purpose: read only the epochs of the OBS file within the SoD window
+    #          and on the sampling grid, seeking directly to them through
+    #          the OBS index, so that the others are never split
+       
+    # Parameters
+    # ==========
+    # ObsFile: str
+    #         Path to OBS file
+    # ObsFilter: dict
+    #         OBS filter (see buildObsFilter)
+
+    # Returns
+    # =======
+    # ObsData: numpy structured array
+    #         OBS data of the selected epochs (ObsDtype)
+    
+
+    # Get the OBS index
+    ObsIndex = readObsIndex(ObsFile)
+
+    # Select the epochs within the window and on the sampling grid
+    Selected = np.ones(len(ObsIndex["SOD"]), dtype=bool)
+    if ObsFilter["SOD_WINDOW"] is not None:
+        Selected &= (ObsIndex["SOD"] >= ObsFilter["SOD_WINDOW"][0]) & \
+            (ObsIndex["SOD"] <= ObsFilter["SOD_WINDOW"][1])
+    if ObsFilter["RATE"] is not None and ObsFilter["RATE"] > 1:
+        Selected &= (ObsIndex["SOD"] % ObsFilter["RATE"]) == 0
+    Epochs = np.flatnonzero(Selected)
+
+    # If there is no epoch selected
+    if len(Epochs) == 0:
+        return np.zeros(0, dtype=ObsDtype)
+
+    # Get the bytes range of each epoch
+    Starts = ObsIndex["OFFSET"]
+    Ends = np.append(ObsIndex["OFFSET"][1:], ObsIndex["SIZE"])
+
+    # Group consecutive epochs in contiguous runs of bytes
+    Runs = np.split(Epochs, np.flatnonzero(np.diff(Epochs) != 1) + 1)
+
+    # Read only those bytes
+    Blocks = []
+    with open(ObsFile, 'rb') as f:
+        for Run in Runs:
+            f.seek(Starts[Run[0]])
+            Blocks.append(f.read(Ends[Run[-1]] - Starts[Run[0]]))
+    Lines = b"".join(Blocks).decode().splitlines()
+
+    # Parse them
+    ObsData = parseObsLines(Lines, ObsFilter, 
+    MaxRows=int(np.sum(ObsIndex["NLINES"][Epochs])))
+
+    return ObsData
+
+# End of readObsIndexed()
+
+
+def readObsFile(ObsFile, ObsFilter=None):
+    
+    # Purpose: read the whole OBS file in one pass into a typed
+    #          structured array
+       
+    # Parameters
+    # ==========
+    # ObsFile: str
+    #         Path to OBS file, which may be compressed
+    # ObsFilter: dict
+    #         OBS filter (see buildObsFilter). If None, all the rows
+    #         and columns are read. If it has a SoD window or a
+    #         sampling rate, only the selected epochs are read
+
+    # Returns
+    # =======
+    # ObsData: numpy structured array
+    #         OBS data, one row per LoS, with the columns laid out
+    #         as in ObsIdx (ObsDtype).
+    #         ObsData[1][ObsIdx["PRN"]] or ObsData["PRN"][1] is
+    #         the PRN of the second line
+    # EpochIdx: numpy array
+    #         Epoch boundaries (see computeObsEpochIdx)
+    
+
+    # If the file is compressed
+    if isObsFileCompressed(ObsFile):
+        # Parse all the lines as they are decompressed
+        Start = time.perf_counter()
+        with openObsFile(ObsFile) as f:
+            ObsData = parseObsLines(f, ObsFilter, SkipRows=1)
+            reportObsDecompression(ObsFile, f, time.perf_counter() - Start)
+
+    # If only a window or a subsampling are requested
+    elif ObsFilter is not None and (ObsFilter["SOD_WINDOW"] is not None or \
+        (ObsFilter["RATE"] is not None and ObsFilter["RATE"] > 1)):
+        # Seek to the selected epochs through the OBS index
+        ObsData = readObsIndexed(ObsFile, ObsFilter)
+
+    else:
+        # Parse all the lines at once skipping the header
+        ObsData = parseObsLines(ObsFile, ObsFilter, SkipRows=1)
+
+    # Compute epoch boundaries
+    EpochIdx = computeObsEpochIdx(ObsData)
+
+    return ObsData, EpochIdx
+
+# End of readObsFile()
+
+
+def sliceObsWindow(ObsData, SodWindow):
+    
+    # Purpose: select the epochs of OBS data within a SoD window
+       
+    # Parameters
+    # ==========
+    # ObsData: numpy structured array
+    #         OBS data sorted by SoD (ObsDtype)
+    # SodWindow: list
+    #         First and last SoD of the window. If None, all the 
+    #         data is selected
+
+    # Returns
+    # =======
+    # ObsData: numpy structured array
+    #         View of the OBS data within the window
+    # EpochIdx: numpy array
+    #         Epoch boundaries (see computeObsEpochIdx)
+    
+
+    # If a window is requested
+    if SodWindow is not None:
+        # Look for the window bounds
+        First = np.searchsorted(ObsData["SOD"], SodWindow[0], side="left")
+        Last = np.searchsorted(ObsData["SOD"], SodWindow[1], side="right")
+        ObsData = ObsData[First:Last]
+
+    # Compute epoch boundaries
+    EpochIdx = computeObsEpochIdx(ObsData)
+
+    return ObsData, EpochIdx
+
+# End of sliceObsWindow()
+
+
+def iterObsEpochs(ObsData, EpochIdx):
+    
+    # Purpose: iterate over the epochs of OBS data
+       
+    # Parameters
+    # ==========
+    # ObsData: numpy structured array
+    #         OBS data (ObsDtype)
+    # EpochIdx: numpy array
+    #         Epoch boundaries (see computeObsEpochIdx)
+
+    # Returns
+    # =======
+    # EpochInfo: numpy structured array (generator)
+    #         slice of ObsData with all the LoS of one epoch
+    
+
+    # Loop over epochs
+    for i in range(len(EpochIdx) - 1):
+        yield ObsData[EpochIdx[i]:EpochIdx[i + 1]]
+
+# End of iterObsEpochs()
+
+
+def readObsEpochs(f, ObsFilter=None, ChunkSize=ObsChunkSize):
+    
+    # Purpose: read the OBS file epoch by epoch with bounded memory.
+    #          Large chunks are read and parsed at once and their lines
+    #          grouped by SoD, without seeking, so that it also works
+    #          on pipes and other non-seekable streams
+       
+    # Parameters
+    # ==========
+    # f: file descriptor
+    #         OBS file, positioned at its header line
+    # ObsFilter: dict
+    #         OBS filter (see buildObsFilter). If None, all the rows
+    #         and columns are read
+    # ChunkSize: int
+    #         Number of characters read at once
+
+    # Returns
+    # =======
+    # EpochInfo: numpy structured array (generator)
+    #         all the LoS of one epoch (ObsDtype)
+    
+
+    # Function to parse a list of lines and yield the complete epochs
+    # keeping the last one, which may continue in the next chunk
+    def parseLines(Lines, Pending):
+        # Skip the lines out of the sampling grid splitting only their SoD
+        if Rate is not None and Rate > 1:
+            Lines = [Line for Line in Lines if Line.strip() and \
+                float(Line.split(None, 1)[ObsIdx["SOD"]]) % Rate == 0]
+
+        # Parse lines
+        if len(Lines) != 0:
+            ObsData = parseObsLines(Lines, ObsFilter)
+        else:
+            ObsData = np.zeros(0, dtype=ObsDtype)
+
+        # Prepend the rows of the previous pending epoch
+        if len(Pending) != 0:
+            ObsData = np.concatenate((Pending, ObsData))
+
+        # Split epochs
+        EpochIdx = computeObsEpochIdx(ObsData)
+
+        return ObsData, EpochIdx
+
+    # End of parseLines()
+
+    # Get SoD window and sampling rate
+    if ObsFilter is not None:
+        SodWindow = ObsFilter["SOD_WINDOW"]
+        Rate = ObsFilter["RATE"]
+    else:
+        SodWindow = None
+        Rate = None
+
+    # Initialize the incomplete line and epoch carried over chunks
+    Rest = ""
+    Pending = np.zeros(0, dtype=ObsDtype)
+    Header = True
+
+    # Read chunks until the end of the file
+    Chunk = f.read(ChunkSize)
+    while Chunk:
+        Chunk = Rest + Chunk
+
+        # Skip header line
+        if Header:
+            EndOfHdr = Chunk.find('\n')
+            if EndOfHdr < 0:
+                Rest = Chunk
+                Chunk = f.read(ChunkSize)
+                continue
+            Chunk = Chunk[EndOfHdr + 1:]
+            Header = False
+
+        # Keep the last incomplete line for the next chunk
+        EndOfLines = Chunk.rfind('\n')
+        Rest = Chunk[EndOfLines + 1:]
+
+        # If there are complete lines
+        if EndOfLines > 0:
+            ObsData, EpochIdx = parseLines(
+                Chunk[:EndOfLines].splitlines(), Pending)
+
+            # Yield all the epochs but the last one
+            for i in range(len(EpochIdx) - 2):
+                EpochInfo = ObsData[EpochIdx[i]:EpochIdx[i + 1]]
+                Sod = EpochInfo["SOD"][0]
+                if SodWindow is None or \
+                    (Sod >= SodWindow[0] and Sod <= SodWindow[1]):
+                    yield EpochInfo
+                elif Sod > SodWindow[1]:
+                    return
+
+            # Keep the last one
+            if len(ObsData) != 0:
+                Pending = ObsData[EpochIdx[-2]:]
+
+        Chunk = f.read(ChunkSize)
+
+    # End of while Chunk:
+
+    # Yield the epochs left, including the last line if it
+    # had no end of line
+    if len(Pending) != 0 or Rest.strip():
+        ObsData, EpochIdx = parseLines(Rest.splitlines(), Pending)
+        for i in range(len(EpochIdx) - 1):
+            EpochInfo = ObsData[EpochIdx[i]:EpochIdx[i + 1]]
+            Sod = EpochInfo["SOD"][0]
+            if SodWindow is None or \
+                (Sod >= SodWindow[0] and Sod <= SodWindow[1]):
+                yield EpochInfo
+
+# End of readObsEpochs()
+
+
+def mergeObsEpochs(EpochStreams):
+    
+    # Purpose: merge by SoD the epochs of several OBS readers (e.g. one
+    #          per fragment of the same receiver and day, which may
+    #          overlap), keeping only one epoch in memory per reader
+       
+    # Parameters
+    # ==========
+    # EpochStreams: list
+    #         OBS epoch generators (see readObsEpochs), each one sorted
+    #         by SoD
+
+    # Returns
+    # =======
+    # EpochInfo: numpy structured array (generator)
+    #         all the LoS of one epoch, with the duplicated satellites
+    #         dropped (the first reader having them is kept)
+    
+
+    # Merge the epochs of all the readers with a heap. The epochs with
+    # the same SoD come out in the order of the readers
+    Pending = []
+    for EpochInfo in heapq.merge(*EpochStreams, 
+        key=lambda EpochInfo: EpochInfo["SOD"][0]):
+        # If a new epoch starts, yield the previous one
+        if len(Pending) != 0 and EpochInfo["SOD"][0] != Pending[0]["SOD"][0]:
+            yield combineObsEpoch(Pending)
+            Pending = []
+        Pending.append(EpochInfo)
+
+    # Yield the last epoch
+    if len(Pending) != 0:
+        yield combineObsEpoch(Pending)
+
+# End of mergeObsEpochs()
+
+
+def combineObsEpoch(EpochInfos):
+    
+    # Purpose: combine the LoS of the same epoch read from several OBS
+    #          files, dropping the duplicated satellites
+       
+    # Parameters
+    # ==========
+    # EpochInfos: list
+    #         OBS data of the same epoch (ObsDtype)
+
+    # Returns
+    # =======
+    # EpochInfo: numpy structured array
+    #         all the LoS of the epoch, each satellite once
+    
+
+    # If the epoch is only in one file, take it as is
+    if len(EpochInfos) == 1:
+        return EpochInfos[0]
+
+    # Otherwise, keep the first LoS of each satellite in file order
+    EpochInfo = np.concatenate(EpochInfos)
+    Sats, First = np.unique(EpochInfo[["CONST", "PRN"]], return_index=True)
+
+    return EpochInfo[np.sort(First)]
+
+# End of combineObsEpoch()
+
+
+def getZenithGeometry(Year, Doy, Sod, Const, Prn):
+    
+    # Purpose: default geometry provider of the RINEX reader. Without
+    #          orbits, all the satellites are placed at the zenith, so
+    #          that no one is rejected by the mask angle
+       
+    # Parameters
+    # ==========
+    # Year, Doy, Sod: numpy array
+    #         Epoch of each LoS
+    # Const, Prn: numpy array
+    #         Satellite of each LoS
+
+    # Returns
+    # =======
+    # Elev, Azim: numpy array
+    #         Elevation and azimuth of each LoS [deg]
+    
+
+    return np.full(len(Sod), 90.0), np.zeros(len(Sod))
+
+# End of getZenithGeometry()
+
+
+def readRinexHeader(Lines):
+    
+    # Purpose: read the header of a RINEX 2.11/3.x observation file
+       
+    # Parameters
+    # ==========
+    # Lines: list
+    #         RINEX file lines
+
+    # Returns
+    # =======
+    # Header: dict
+    #         VERSION: RINEX version
+    #         OBS_TYPES: observation codes of each constellation
+    #                    ("*" for all of them in RINEX 2)
+    #         NLINES: number of header lines
+    
+
+    Header = {"VERSION": None, "OBS_TYPES": OrderedDict({}), "NLINES": 0}
+    Sys = None
+
+    # Loop over header lines
+    for i, Line in enumerate(Lines):
+        Label = Line[60:80].strip()
+        if Label == RinexVersionLabel:
+            Header["VERSION"] = float(Line[:9])
+            if Line[20] != 'O':
+                sys.stderr.write("ERROR: %s is not a RINEX observation file\n" %
+                Line[20])
+                sys.exit(-1)
+
+        # RINEX 2 observation codes (9 per line)
+        elif Label == RinexObsTypes2Label:
+            Types = Header["OBS_TYPES"].setdefault("*", [])
+            Types.extend(Line[6:60].split())
+
+        # RINEX 3 observation codes (13 per line)
+        elif Label == RinexObsTypes3Label:
+            if Line[0] != ' ':
+                Sys = Line[0]
+            Types = Header["OBS_TYPES"].setdefault(Sys, [])
+            Types.extend(Line[7:60].split())
+
+        elif Label == RinexEndOfHeaderLabel:
+            Header["NLINES"] = i + 1
+            break
+
+    # Check the header is complete
+    if Header["VERSION"] is None or Header["NLINES"] == 0 or \
+        len(Header["OBS_TYPES"]) == 0:
+        sys.stderr.write("ERROR: Wrong RINEX observation header\n")
+        sys.exit(-1)
+
+    return Header
+
+# End of readRinexHeader()
+
+
+def computeRinexEpoch(Year, Month, Day, Hour, Minute, Second):
+    
+    # Purpose: compute the epoch of a RINEX epoch line
+       
+    # Parameters
+    # ==========
+    # Year, Month, Day, Hour, Minute: int
+    # Second: float
+
+    # Returns
+    # =======
+    # Epoch: list
+    #         [Year, DoY, SoD]
+    
+
+    # Correct two-digit years (RINEX 2)
+    if Year < 80:
+        Year = Year + 2000
+    elif Year < 100:
+        Year = Year + 1900
+
+    return [Year, convertYearMonthDay2Doy(Year, Month, Day),
+    Hour * 3600 + Minute * 60 + Second]
+
+# End of computeRinexEpoch()
+
+
+def splitRinexEpochs(Lines, Header):
+    
+    # Purpose: split the RINEX observation records into satellite
+    #          records with fixed columns: system (1), PRN (2) and
+    #          all the observations (16 each)
+       
+    # Parameters
+    # ==========
+    # Lines: list
+    #         RINEX file lines after the header
+    # Header: dict
+    #         RINEX header (see readRinexHeader)
+
+    # Returns
+    # =======
+    # Epochs: list
+    #         [Year, DoY, SoD] of each epoch
+    # EpochNums: list
+    #         Epoch number of each satellite record
+    # Records: list
+    #         Satellite records
+    
+
+    Epochs = []
+    EpochNums = []
+    Records = []
+    NLines = len(Lines)
+    i = 0
+
+    # RINEX 3: one line per satellite starting with its id
+    if Header["VERSION"] >= 3:
+        while i < NLines:
+            Line = Lines[i]
+            i = i + 1
+            if not Line.startswith('>'):
+                continue
+            Flag = int(Line[29:32])
+            NSats = int(Line[32:35])
+
+            # Skip events and cycle slip records
+            if Flag > 1:
+                i = i + NSats
+                continue
+
+            Epochs.append(computeRinexEpoch(int(Line[2:6]), int(Line[7:9]),
+            int(Line[10:12]), int(Line[13:15]), int(Line[16:18]),
+            float(Line[18:29])))
+            EpochNums.extend([len(Epochs) - 1] * NSats)
+            Records.extend(Lines[i:i + NSats])
+            i = i + NSats
+
+    # RINEX 2: satellite ids in the epoch line and observations
+    # wrapped every 5
+    else:
+        NObsLines = -(-len(Header["OBS_TYPES"]["*"]) // RinexObsPerLine2)
+        LineWidth = RinexObsPerLine2 * RinexObsWidth
+        while i < NLines:
+            Line = Lines[i]
+            i = i + 1
+            if not Line.strip():
+                continue
+            Flag = int(Line[26:29])
+            NSats = int(Line[29:32])
+
+            # Skip events
+            if Flag > 1 and Flag != 6:
+                i = i + NSats
+                continue
+
+            # Read satellite ids, with continuation lines
+            SatIds = Line[32:68]
+            for j in range(1, -(-NSats // RinexSatsPerLine2)):
+                SatIds = SatIds + Lines[i][32:68]
+                i = i + 1
+
+            # Skip cycle slip records
+            if Flag == 6:
+                i = i + NSats * NObsLines
+                continue
+
+            Epochs.append(computeRinexEpoch(int(Line[1:3]), int(Line[4:6]),
+            int(Line[7:9]), int(Line[10:12]), int(Line[13:15]),
+            float(Line[15:26])))
+            EpochNums.extend([len(Epochs) - 1] * NSats)
+            for j in range(NSats):
+                Records.append(SatIds[3*j:3*j + 3] + "".join(
+                [ObsLine.ljust(LineWidth) for ObsLine in Lines[i:i + NObsLines]]))
+                i = i + NObsLines
+
+    return Epochs, EpochNums, Records
+
+# End of splitRinexEpochs()
+
+
+def getRinexObsCols(Header, Sys, GalFreq="E1E5A"):
+    
+    # Purpose: get the position of the observation code of each OBS
+    #          column in the satellite records of a constellation
+       
+    # Parameters
+    # ==========
+    # Header: dict
+    #         RINEX header (see readRinexHeader)
+    # Sys: str
+    #         RINEX constellation id
+    # GalFreq: str
+    #         Galileo dual-frequency selection (see GAL_FREQ)
+
+    # Returns
+    # =======
+    # ObsCols: dict
+    #         Position of each OBS column found
+    
+
+    ObsCols = OrderedDict({})
+
+    # Get the observation codes of the constellation
+    if Header["VERSION"] >= 3:
+        if Sys not in RinexObsCodes3 or Sys not in Header["OBS_TYPES"]:
+            return ObsCols
+        Codes = RinexObsCodes3[Sys]
+        if Sys == "E":
+            Codes = OrderedDict(list(Codes.items()) + 
+            list(RinexGalFreqCodes3[GalFreq].items()))
+        Types = Header["OBS_TYPES"][Sys]
+    else:
+        Codes = RinexObsCodes2
+        Types = Header["OBS_TYPES"]["*"]
+
+    # Take the first code found of each column
+    for Col, ColCodes in Codes.items():
+        for Code in ColCodes:
+            if Code in Types:
+                ObsCols[Col] = Types.index(Code)
+                break
+
+    return ObsCols
+
+# End of getRinexObsCols()
+
+
+def readRinexObsFile(RinexFile, GeomProvider=getZenithGeometry, ObsFilter=None,
+GalFreq="E1E5A"):
+    
+    # Purpose: read a whole RINEX 2.11/3.x observation file into the 
+    #          OBS typed structured array, decoding the fixed columns
+    #          of all the satellite records at once
+       
+    # Parameters
+    # ==========
+    # RinexFile: str
+    #         Path to RINEX file, which may be compressed
+    # GeomProvider: function
+    #         Function returning the elevation and azimuth of the LoS
+    #         (see getZenithGeometry)
+    # ObsFilter: dict
+    #         OBS filter (see buildObsFilter). If None, all the rows
+    #         and columns are read
+    # GalFreq: str
+    #         Galileo dual-frequency selection (see GAL_FREQ): E5a or
+    #         E5b codes read into P2, L2 and S2
+
+    # Returns
+    # =======
+    # ObsData: numpy structured array
+    #         OBS data (ObsDtype), as read by readObsFile
+    # EpochIdx: numpy array
+    #         Epoch boundaries (see computeObsEpochIdx)
+    
+
+    # Read all the lines
+    with openObsFile(RinexFile) as f:
+        Lines = f.read().splitlines()
+
+    # Read the header and split the satellite records
+    Header = readRinexHeader(Lines)
+    Epochs, EpochNums, Records = splitRinexEpochs(
+        Lines[Header["NLINES"]:], Header)
+
+    # Build the fixed-column layout of the records
+    NObs = max([len(Types) for Types in Header["OBS_TYPES"].values()])
+    RecordDtype = np.dtype([("SYS", "S1"), ("PRN", "S2")] + 
+    [Field for i in range(NObs) for Field in 
+    [("O%d" % i, "S%d" % RinexValueWidth), 
+    ("F%d" % i, "S%d" % (RinexObsWidth - RinexValueWidth))]])
+
+    # Decode all the records at once
+    Width = RecordDtype.itemsize
+    RecordData = np.frombuffer("".join(
+        [Record.ljust(Width)[:Width] for Record in Records]).encode(
+            "ascii", "replace"), dtype=RecordDtype)
+
+    # Fill epoch and satellite
+    ObsData = np.zeros(len(RecordData), dtype=ObsDtype)
+    Epochs = np.array(Epochs).reshape(-1, 3)
+    EpochNums = np.array(EpochNums, dtype=int)
+    ObsData["YEAR"] = Epochs[EpochNums, 0]
+    ObsData["DOY"] = Epochs[EpochNums, 1]
+    ObsData["SOD"] = Epochs[EpochNums, 2]
+    Sys = np.char.replace(RecordData["SYS"], b' ', b'G')
+    ObsData["CONST"] = np.where(Sys == b'S', b'G', Sys).astype("U1")
+    ObsData["PRN"] = RecordData["PRN"].astype(int) + \
+        np.where(Sys == b'S', RinexSbasPrnOffset, 0)
+
+    # Fill the measurements of each constellation
+    Selected = np.zeros(len(RecordData), dtype=bool)
+    for SysId in np.unique(Sys):
+        SysRecords = Sys == SysId
+        ObsCols = getRinexObsCols(Header, SysId.decode(), GalFreq)
+        if len(ObsCols) == 0:
+            continue
+        Selected |= SysRecords
+        for Col, i in ObsCols.items():
+            Values = RecordData["O%d" % i]
+            Valid = SysRecords & (Values != b' ' * RinexValueWidth)
+            ObsData[Col][Valid] = Values[Valid].astype(float)
+
+    # Keep only the constellations with known observation codes
+    ObsData = ObsData[Selected]
+
+    # Fill the geometry
+    ObsData["ELEV"], ObsData["AZIM"] = GeomProvider(ObsData["YEAR"],
+    ObsData["DOY"], ObsData["SOD"], ObsData["CONST"], ObsData["PRN"])
+
+    # Apply the OBS filter
+    if ObsFilter is not None:
+        ObsData = applyObsFilter(ObsData, ObsFilter)
+
+    return ObsData, computeObsEpochIdx(ObsData)
+
+# End of readRinexObsFile()
+
+
+def isPreproFileCompressed(Path):
+    
+    # Purpose: check whether the PREPRO OBS file is compressed
+       
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to PREPRO OBS file
+
+    # Returns
+    # =======
+    # Compressed: bool
+    #         True if the file has a supported compression extension
+    
+
+    Ext = os.path.splitext(Path)[1]
+
+    return Ext != "" and Ext in PreproCompression.values()
+
+# End of isPreproFileCompressed()
+
+
+def compressPreproBlock(Ext, Block):
+    
+    # Purpose: compress a block of a PREPRO OBS file as a whole
+    #          compressed stream (gzip member, bzip2 stream, xz
+    #          stream or zstd frame)
+       
+    # Parameters
+    # ==========
+    # Ext: str
+    #         Compression extension
+    # Block: bytes
+    #         Text to compress
+
+    # Returns
+    # =======
+    # Data: bytes
+    #         Compressed block
+    
+
+    if Ext == ".gz":
+        return gzip.compress(Block, compresslevel=6, mtime=0)
+    elif Ext == ".bz2":
+        return bz2.compress(Block)
+    elif Ext == ".xz":
+        return lzma.compress(Block)
+    else:
+        return zstandard.ZstdCompressor().compress(Block)
+
+# End of compressPreproBlock()
+
+
+class PreproCompressWriter:
+    
+    # Purpose: write-only text file object over a compressed PREPRO
+    #          OBS file. As pigz does, the text is cut in blocks that
+    #          are compressed independently by a pool of threads and
+    #          written in order. Consecutive compressed streams are
+    #          read as a single one by gzip, bzip2, xz and zstd. A
+    #          flush ends the current block, so the size of the file
+    #          after a flush is a valid point to resume from
+       
+    # Attributes
+    # ==========
+    # WaitTime: float
+    #         Time the writer waited for compressed blocks [s]
+    # NChars, NBytes: int
+    #         Characters written and compressed bytes
+    
+
+    def __init__(self, f, Ext, Threads):
+        self.File = f
+        self.Ext = Ext
+        self.Threads = Threads
+        self.WaitTime = 0.0
+        self.NChars = 0
+        self.NBytes = 0
+        self.Buffer = []
+        self.BufferSize = 0
+        self.Blocks = []
+        self.Pool = ThreadPoolExecutor(Threads)
+
+    def submit(self):
+        # Send the text buffered to be compressed
+        if self.BufferSize == 0:
+            return
+        Block = "".join(self.Buffer).encode()
+        self.Blocks.append(self.Pool.submit(compressPreproBlock, self.Ext, Block))
+        self.Buffer = []
+        self.BufferSize = 0
+
+        # Write the oldest blocks, if too many are being compressed
+        while len(self.Blocks) > PreproCompressQueueSize * self.Threads:
+            self.writeBlock()
+
+    def writeBlock(self):
+        # Wait for the oldest block and write it
+        Start = time.perf_counter()
+        Data = self.Blocks.pop(0).result()
+        self.WaitTime += time.perf_counter() - Start
+        self.File.write(Data)
+        self.NBytes += len(Data)
+
+    def write(self, Text):
+        # Buffer the text, up to a block
+        self.Buffer.append(Text)
+        self.BufferSize += len(Text)
+        self.NChars += len(Text)
+        if self.BufferSize >= PreproCompressBlockSize:
+            self.submit()
+
+        return len(Text)
+
+    def flush(self):
+        # Compress and write all the text buffered
+        self.submit()
+        while self.Blocks:
+            self.writeBlock()
+        self.File.flush()
+
+    def fileno(self):
+        return self.File.fileno()
+
+    def tell(self):
+        # Size of the file, once all the text buffered is written
+        self.flush()
+        return self.File.tell()
+
+    def close(self):
+        # Write all the text buffered and close the file
+        try:
+            self.flush()
+        finally:
+            self.Pool.shutdown()
+            self.File.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *Args):
+        self.close()
+
+# End of class PreproCompressWriter
+
+
+def openPreproFile(Path):
+    
+    # Purpose: open a PREPRO OBS file for reading, decompressing it
+    #          if it is compressed
+       
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to PREPRO OBS file
+
+    # Returns
+    # =======
+    # f: file descriptor
+    #         PREPRO OBS file opened in text mode
+    
+
+    Ext = os.path.splitext(Path)[1]
+    if Ext in ObsCompression:
+        return ObsDecompressReader(Path)
+
+    elif Ext == ".zst":
+        if zstandard is None:
+            sys.stderr.write("ERROR: Reading %s requires the zstandard "\
+                "package\n" % Path)
+            sys.exit(-1)
+
+        # Read across the frames written by PreproCompressWriter
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(
+            open(Path, 'rb'), read_across_frames=True, closefd=True))
+
+    return open(Path, 'r')
+
+# End of openPreproFile()
+
+
+def createOutputFile(Path, Hdr, Threads=1):
+    
+    # Purpose: open output file and write its header. PREPRO OBS files
+    #          with a compression extension are compressed
+       
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to file
+    # Hdr: str
+    #         File header
+    # Threads: int
+    #         Threads compressing the file, if it is compressed
+
+    # Returns
+    # =======
+    # f: File descriptor
+    #         Descriptor of output file
+    
+    # Check that a zstd PREPRO OBS file can be written
+    if os.path.splitext(Path)[1] == ".zst" and zstandard is None:
+        sys.stderr.write("ERROR: Writing %s requires the zstandard "\
+            "package\n" % Path)
+        sys.exit(-1)
+
+    # Display Message
+    print("INFO: Creating file: %s..." % Path)
+
+    # Create output directory, if needed
+    if not os.path.exists(os.path.dirname(Path)):
+        os.makedirs(os.path.dirname(Path))
+
+    # Open PREPRO OBS file
+    if isPreproFileCompressed(Path):
+        f = PreproCompressWriter(open(Path, 'wb'), 
+        os.path.splitext(Path)[1], Threads)
+    else:
+        f = open(Path, 'w')
+
+    # Write header
+    f.write(Hdr)
 
     return f
 
 # End of createOutputFile()
 
 
-def generatePreproFile(fpreprobs, PreproObsInfo):
+class PreproAsyncWriter:
+    
+    # Purpose: write-only text file object over a PREPRO OBS file.
+    #          The formatted epochs are queued in a bounded queue and
+    #          written in large blocks by a background thread, so that
+    #          the preprocessing only waits for the disk when the
+    #          queue is full. Write errors of the thread are raised
+    #          by the next write, flush or close
+       
+    # Attributes
+    # ==========
+    # WriteTime: float
+    #         Time spent by the thread writing [s]
+    # MaxWriteTime: float
+    #         Longest write of the thread [s]
+    # StallTime: float
+    #         Time the preprocessing waited for room in the queue [s]
+    # MaxDepth: int
+    #         Maximum number of epochs waiting in the queue
+    # DepthSum, NPuts: int
+    #         Sum of the queue depths found by each write, and number
+    #         of writes (mean queue depth = DepthSum / NPuts)
+    # NBlocks, NChars: int
+    #         Blocks and characters written by the thread
+    
+
+    def __init__(self, f, QueueSize, AutoFlush=False):
+        self.File = f
+        self.AutoFlush = AutoFlush
+        self.Error = None
+        self.WriteTime = 0.0
+        self.MaxWriteTime = 0.0
+        self.StallTime = 0.0
+        self.MaxDepth = 0
+        self.DepthSum = 0
+        self.NPuts = 0
+        self.NBlocks = 0
+        self.NChars = 0
+        self.Queue = queue.Queue(QueueSize)
+        self.Thread = threading.Thread(target=self.writeBlocks, daemon=True)
+        self.Thread.start()
+
+    def writeBlocks(self):
+        # Write the queued text until closed. Items are formatted text,
+        # True (flush request) or None (end of file)
+        Pending = []
+        PendingSize = 0
+        Closed = False
+        while not Closed:
+            # Wait for text and gather the one already queued, up to
+            # a block or a flush request
+            Items = [self.Queue.get()]
+            while isinstance(Items[-1], str):
+                Pending.append(Items[-1])
+                PendingSize += len(Items[-1])
+                if PendingSize >= PreproWriterBlockSize:
+                    break
+                try:
+                    Items.append(self.Queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # Write a whole block, or what is pending if requested,
+            # unless a previous write failed
+            Flush = not isinstance(Items[-1], str) or \
+                (self.AutoFlush and self.Queue.empty())
+            if self.Error is None and \
+                (PendingSize >= PreproWriterBlockSize or Flush):
+                try:
+                    Start = time.perf_counter()
+                    if Pending:
+                        self.File.write("".join(Pending))
+                        self.NBlocks += 1
+                        self.NChars += PendingSize
+                    if Flush:
+                        self.File.flush()
+                    Elapsed = time.perf_counter() - Start
+                    self.WriteTime += Elapsed
+                    self.MaxWriteTime = max(self.MaxWriteTime, Elapsed)
+
+                except Exception as Error:
+                    # Propagate the error to the preprocessing
+                    self.Error = Error
+
+                Pending = []
+                PendingSize = 0
+
+            for Item in Items:
+                self.Queue.task_done()
+            Closed = Items[-1] is None
+
+    def put(self, Item):
+        # Raise the error of the thread, if any
+        if self.Error is not None:
+            raise self.Error
+
+        # Put an item in the queue, waiting for room if it is full
+        try:
+            self.Queue.put_nowait(Item)
+        except queue.Full:
+            Start = time.perf_counter()
+            self.Queue.put(Item)
+            self.StallTime += time.perf_counter() - Start
+
+    def write(self, Text):
+        # Queue the text to be written
+        Depth = self.Queue.qsize()
+        self.MaxDepth = max(self.MaxDepth, Depth)
+        self.DepthSum += Depth
+        self.NPuts += 1
+        self.put(Text)
+
+        return len(Text)
+
+    def flush(self):
+        # Wait until all the text queued is written and flushed
+        self.put(True)
+        self.Queue.join()
+        if self.Error is not None:
+            raise self.Error
+
+    def fileno(self):
+        return self.File.fileno()
+
+    def tell(self):
+        # Size of the file, once all the text queued is written
+        self.flush()
+        return self.File.tell()
+
+    def close(self):
+        # Write all the text queued, stop the thread and close the file
+        if self.Thread.is_alive():
+            self.Queue.put(None)
+            self.Thread.join()
+        self.File.close()
+        if self.Error is not None:
+            raise self.Error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *Args):
+        self.close()
+
+# End of class PreproAsyncWriter
+
+
+def reportPreproWriter(Path, f):
+    
+    # Purpose: report the activity of the background writer and of
+    #          the compression of an output file
+       
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to output file
+    # f: file descriptor
+    #         Output file, possibly a PreproAsyncWriter or a
+    #         PreproCompressWriter
+
+    # Returns
+    # =======
+    # Nothing
+    
+
+    if isinstance(f, PreproAsyncWriter):
+        print("INFO: Wrote %s: %d blocks, %.1f MB in %.3f s (background, "\
+            "longest %.3f s), queue depth mean %.1f max %d of %d, "\
+            "preprocessing stalled %.3f s" % 
+            (Path, f.NBlocks, f.NChars / 1e6, f.WriteTime, f.MaxWriteTime,
+            f.DepthSum / max(f.NPuts, 1), f.MaxDepth, f.Queue.maxsize,
+            f.StallTime))
+        f = f.File
+
+    if isinstance(f, PreproCompressWriter):
+        print("INFO: Compressed %s: %.1f MB into %.1f MB with %d threads, "\
+            "waiting for compression %.3f s" % 
+            (Path, f.NChars / 1e6, f.NBytes / 1e6, f.Threads, f.WaitTime))
+
+# End of reportPreproWriter()
+
+
+def getPreproLayout(Conf):
+
+    # Purpose: get the layout of the PREPRO OBS file from the columns,
+    #          rows and decimation configured
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration data
+
+    # Returns
+    # =======
+    # PreproLayout: dict
+    #         PREPRO OBS file layout:
+    #         PreproLayout["COLS"]: columns written (see PreproIdx)
+    #         PreproLayout["HDR"]: file header
+    #         PreproLayout["ROW_FMT"]: whole line format
+    #         PreproLayout["ROWS"]: rows written (see PreproRows)
+    #         PreproLayout["DECIMATION"]: decimation [s] (0: none)
+
+    PreproLayout = {"COLS": Conf["PREPRO_COLS"], "ROWS": Conf["PREPRO_ROWS"],
+    "DECIMATION": Conf["PREPRO_DECIMATION"]}
+
+    # Keep the usual header and format for all the columns
+    if PreproLayout["COLS"] == list(PreproIdx):
+        PreproLayout["HDR"] = PreproHdr
+        PreproLayout["ROW_FMT"] = PreproRowFmt
+
+    # Otherwise, build them with the selected ones
+    else:
+        PreproLayout["HDR"] = "# " + " ".join([PreproHdrLabels[Col] \
+            for Col in PreproLayout["COLS"]]) + "\n"
+        PreproLayout["ROW_FMT"] = "".join([PreproFmt[PreproIdx[Col]] + " " \
+            for Col in PreproLayout["COLS"]]) + "\n"
+
+    return PreproLayout
+
+# End of getPreproLayout()
+
+
+def getPreproFileIdx(Hdr):
+
+    # Purpose: get the position of the columns of a PREPRO OBS file
+    #          from its header
+
+    # Parameters
+    # ==========
+    # Hdr: str
+    #         PREPRO OBS file header
+
+    # Returns
+    # =======
+    # FileIdx: dict
+    #         Position of each column in the file (see PreproIdx),
+    #         only for the columns written
+
+    Labels = Hdr[1:].split()
+    FileIdx = OrderedDict({})
+    for Col, Label in PreproHdrLabels.items():
+        if Label in Labels:
+            FileIdx[Col] = Labels.index(Label)
+
+    return FileIdx
+
+# End of getPreproFileIdx()
+
+
+def selectPreproRows(Cols, PreproLayout):
+
+    # Purpose: select the rows of the PREPRO OBS file to be written
+
+    # Parameters
+    # ==========
+    # Cols: dict
+    #         Values of each PREPRO OBS column (see getPreproCols)
+    # PreproLayout: dict
+    #         PREPRO OBS file layout (see getPreproLayout)
+
+    # Returns
+    # =======
+    # Keep: numpy array or None
+    #         True for the rows to be written (None: all of them)
+
+    Keep = None
+
+    # Valid or rejected measurements only
+    if PreproLayout["ROWS"] == "VALID":
+        Keep = np.asarray(Cols["VALID"]) == 1
+    elif PreproLayout["ROWS"] == "REJECTED":
+        Keep = np.asarray(Cols["REJECT"]) != 0
+
+    # Epochs multiple of the decimation only
+    if PreproLayout["DECIMATION"] > 0:
+        Decimated = np.round(np.asarray(Cols["SOD"], dtype=float)) % \
+            PreproLayout["DECIMATION"] == 0
+        Keep = Decimated if Keep is None else Keep & Decimated
+
+    return Keep
+
+# End of selectPreproRows()
+
+
+def getPreproCols(PreproObsInfo):
+
+    # Purpose: get the columns of the PREPRO OBS file from the
+    #          Preprocessing results
+
+    # Parameters
+    # ==========
+    # PreproObsInfo: dict or numpy structured array
+    #         Dictionary containing Preprocessing info for the 
+    #         current epoch, or one row per satellite (PreproObsDtype)
+
+    # Returns
+    # =======
+    # Cols: dict
+    #         Values of each PREPRO OBS column (see PreproObsCols):
+    #         arrays from the vectorized engines output, lists from
+    #         the dictionary of satellites
+
+    Cols = OrderedDict({})
+
+    # Get the columns of the vectorized engines output
+    if isinstance(PreproObsInfo, np.ndarray):
+        for Col, Field in PreproObsCols.items():
+            Cols[Col] = PreproObsInfo[Field]
+
+    # Or of the dictionary of satellites
+    else:
+        for Col, Field in PreproObsCols.items():
+            if Col == "CONST":
+                Cols[Col] = [SatLabel[0] for SatLabel in PreproObsInfo]
+            elif Col == "PRN":
+                Cols[Col] = [int(SatLabel[1:]) for SatLabel in PreproObsInfo]
+            else:
+                Cols[Col] = [SatPreproObs[Field] \
+                    for SatPreproObs in PreproObsInfo.values()]
+
+    return Cols
+
+# End of getPreproCols()
+
+
+def formatPreproRows(PreproObsInfo, PreproLayout=None):
+
+    # Purpose: format the PREPRO OBS lines of the Preprocessing results
+    #          from their columns, a block of lines at once
+
+    # Parameters
+    # ==========
+    # PreproObsInfo: dict or numpy structured array
+    #         Dictionary containing Preprocessing info for the 
+    #         current epoch, or one row per satellite (PreproObsDtype)
+    # PreproLayout: dict
+    #         PREPRO OBS file layout (see getPreproLayout). All the
+    #         rows and columns if None
+
+    # Returns
+    # =======
+    # Text: str
+    #         PREPRO OBS lines
+
+    # Get the columns
+    Cols = getPreproCols(PreproObsInfo)
+    RowFmt = PreproRowFmt
+
+    # Keep the selected rows and columns only
+    if PreproLayout is not None:
+        Keep = selectPreproRows(Cols, PreproLayout)
+        Cols = OrderedDict([(Col, Cols[Col] if Keep is None else \
+            np.asarray(Cols[Col])[Keep]) for Col in PreproLayout["COLS"]])
+        RowFmt = PreproLayout["ROW_FMT"]
+
+    Cols = [Col.tolist() if isinstance(Col, np.ndarray) else Col \
+        for Col in Cols.values()]
+
+    # Interleave the columns, row after row
+    Values = tuple([Value for Row in zip(*Cols) for Value in Row])
+    NRows = len(Values) // len(Cols)
+
+    # Format each block of lines with a single operation
+    Blocks = []
+    for First in range(0, NRows, PreproBlockRows):
+        Rows = min(PreproBlockRows, NRows - First)
+        Blocks.append((RowFmt * Rows) % \
+            Values[First * len(Cols):(First + Rows) * len(Cols)])
+
+    return "".join(Blocks)
+
+# End of formatPreproRows()
+
+
+def generatePreproFile(fpreprobs, PreproObsInfo, PreproLayout=None):
 
     # Purpose: generate output file with Preprocessing results
 
@@ -1005,43 +3504,153 @@ def generatePreproFile(fpreprobs, PreproObsInfo):
     # ==========
     # fpreprobs: file descriptor
     #         Descriptor for PREPRO OBS output file
-    # PreproObsInfo: dict
+    # PreproObsInfo: dict or numpy structured array
     #         Dictionary containing Preprocessing info for the 
-    #         current epoch
+    #         current epoch, or one row per satellite (PreproObsDtype)
+    #         (e.g. the whole day of the batch engine)
+    # PreproLayout: dict
+    #         PREPRO OBS file layout (see getPreproLayout). All the
+    #         rows and columns if None
 
     # Returns
     # =======
     # Nothing
 
-    # Loop over satellites
-    for SatLabel, SatPreproObs in PreproObsInfo.items():
-        # Prepare outputs
-        Outputs = OrderedDict({})
-        Outputs["SOD"] = SatPreproObs["Sod"]
-        Outputs["DOY"] = SatPreproObs["Doy"]
-        Outputs["CONST"] = SatLabel[0]
-        Outputs["PRN"] = int(SatLabel[1:])
-        Outputs["ELEV"] = SatPreproObs["Elevation"]
-        Outputs["AZIM"] = SatPreproObs["Azimuth"]
-        Outputs["VALID"] = SatPreproObs["ValidL1"]
-        Outputs["REJECT"] = SatPreproObs["RejectionCause"]
-        Outputs["STATUS"] = SatPreproObs["Status"]
-        Outputs["C1"] = SatPreproObs["C1"]
-        Outputs["C1SMOOTHED"] = SatPreproObs["SmoothC1"]
-        Outputs["L1"] = SatPreproObs["L1Meters"]
-        Outputs["S1"] = SatPreproObs["S1"]
-        Outputs["CODE RATE"] = SatPreproObs["RangeRateL1"]
-        Outputs["CODE ACC"] = SatPreproObs["RangeRateStepL1"]
-        Outputs["PHASE RATE"] = SatPreproObs["PhaseRateL1"]
-        Outputs["PHASE ACC"] = SatPreproObs["PhaseRateStepL1"]
-        Outputs["GEOM FREE"] = SatPreproObs["GeomFree"]
-        Outputs["VTEC RATE"] = SatPreproObs["VtecRate"]
-        Outputs["iAATR"] = SatPreproObs["iAATR"]
-
-        # Write line
-        for i, result in enumerate(Outputs):
-            fpreprobs.write(((PreproFmt[i] + " ") % Outputs[result]))
-
-        fpreprobs.write("\n")
+    # Write all the lines at once
+    fpreprobs.write(formatPreproRows(PreproObsInfo, PreproLayout))
 
 # End of generatePreproFile
+
+
+def buildPreproTable(ColsList):
+
+    # Purpose: build an Arrow table of Preprocessing results, with the
+    #          PREPRO OBS columns and the types of the engines output
+
+    # Parameters
+    # ==========
+    # ColsList: list
+    #         Columns of consecutive Preprocessing results (see
+    #         getPreproCols). If empty, the table is empty
+
+    # Returns
+    # =======
+    # Table: pyarrow.Table
+    #         Preprocessing results
+
+    return pyarrow.table(OrderedDict([(Col, 
+        np.concatenate([np.asarray(Cols[Col], dtype=PreproObsDtype[Field]) \
+            for Cols in ColsList] + [np.zeros(0, dtype=PreproObsDtype[Field])]))
+        for Col, Field in PreproObsCols.items()]))
+
+# End of buildPreproTable()
+
+
+def createParquetOutput(Path, Rows, ResumeSod=None):
+
+    # Purpose: open the Parquet partition of the PREPRO OBS results of
+    #          a receiver and day. They are buffered and written as part
+    #          files, each one renamed into place once complete
+
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to partition directory
+    # Rows: int
+    #         Rows of each row group
+    # ResumeSod: float
+    #         Last epoch of the checkpoint, if resuming. The part files
+    #         written after it are discarded (all of them, if None)
+
+    # Returns
+    # =======
+    # ParquetOut: dict
+    #         Parquet output:
+    #         ParquetOut["DIR"]: path to partition directory
+    #         ParquetOut["ROWS"]: rows of each row group
+    #         ParquetOut["BUFFER"]: columns pending to be written
+    #         ParquetOut["NROWS"]: rows pending to be written
+
+    # Display Message
+    print("INFO: Creating Parquet partition: %s..." % Path)
+
+    # Create partition directory, if needed
+    if not os.path.exists(Path):
+        os.makedirs(Path)
+
+    # Discard the part files of a previous run
+    for PartFile in glob.glob(Path + '/' + "part-*.parquet"):
+        FirstSod = int(os.path.basename(PartFile)[5:10])
+        if ResumeSod is None or FirstSod > ResumeSod:
+            os.remove(PartFile)
+
+    return {"DIR": Path, "ROWS": Rows, "BUFFER": [], "NROWS": 0}
+
+# End of createParquetOutput()
+
+
+def generatePreproParquet(ParquetOut, PreproObsInfo):
+
+    # Purpose: add Preprocessing results to the Parquet output, writing
+    #          a part file once there are rows enough for a row group
+
+    # Parameters
+    # ==========
+    # ParquetOut: dict
+    #         Parquet output (see createParquetOutput)
+    # PreproObsInfo: dict or numpy structured array
+    #         Dictionary containing Preprocessing info for the 
+    #         current epoch, or one row per satellite (PreproObsDtype)
+
+    # Returns
+    # =======
+    # Nothing
+
+    Cols = getPreproCols(PreproObsInfo)
+    if len(Cols["SOD"]) == 0:
+        return
+
+    ParquetOut["BUFFER"].append(Cols)
+    ParquetOut["NROWS"] += len(Cols["SOD"])
+    if ParquetOut["NROWS"] >= ParquetOut["ROWS"]:
+        flushParquetOutput(ParquetOut)
+
+# End of generatePreproParquet()
+
+
+def flushParquetOutput(ParquetOut):
+
+    # Purpose: write the rows pending in the Parquet output as a new
+    #          part file (e.g. before a checkpoint)
+
+    # Parameters
+    # ==========
+    # ParquetOut: dict
+    #         Parquet output (see createParquetOutput)
+
+    # Returns
+    # =======
+    # Nothing
+
+    if ParquetOut["NROWS"] == 0:
+        return
+
+    # Build the table
+    Table = buildPreproTable(ParquetOut["BUFFER"])
+
+    # Split it in even row groups, so that the rows exceeding the
+    # row groups size do not make a small one
+    NGroups = max(ParquetOut["NROWS"] // ParquetOut["ROWS"], 1)
+    GroupRows = -(-ParquetOut["NROWS"] // NGroups)
+
+    # Write it to a hidden temporary file and rename it
+    PartFile = ParquetOut["DIR"] + '/' + \
+        PreproParquetFileFmt % Table.column("SOD")[0].as_py()
+    TmpFile = ParquetOut["DIR"] + "/." + os.path.basename(PartFile) + ".tmp"
+    pyarrow.parquet.write_table(Table, TmpFile, row_group_size=GroupRows)
+    os.replace(TmpFile, PartFile)
+
+    ParquetOut["BUFFER"] = []
+    ParquetOut["NROWS"] = 0
+
+# End of flushParquetOutput()
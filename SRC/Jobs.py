@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+########################################################################
+# PETRUS/SRC/Jobs.py:
+# This is the Jobs Module of PETRUS tool
+# It splits the processing of a scenario in independent jobs (a
+# receiver and day, or all the days of a receiver) and runs them in a
+# pool of processes, each job with its own log
+#
+#  Project:        PETRUS
+#  File:           Jobs.py
+#  Date(YY/MM/DD): 26/10/17
+#
+#   Author: PETRUS contributors
+#
+# -----------------------------------------------------------------
+# Date       | Author             | Action
+# -----------------------------------------------------------------
+# 26/10/17   | PETRUS contrib.    | Created
+#
+########################################################################
+
+
+# Import External and Internal functions and Libraries
+#----------------------------------------------------------------------
+import sys, os
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from COMMON.Dates import convertJulianDay2YearMonthDay
+from COMMON.Dates import convertYearMonthDay2Doy
+from InputOutput import FLAG
+from Checkpoint import getCheckpointDir
+from ObsCache import getObsCacheDir
+
+# Jobs
+#----------------------------------------------------------------------
+# Main script, run by each job
+PetrusScript = os.path.dirname(os.path.abspath(__file__)) + "/Petrus.py"
+
+# Log directory inside the scenario
+JobLogDirName = "/OUT/LOG"
+
+# Name of a job of a receiver and day, and of all the days of a
+# receiver
+JobDayFmt = "PETRUS_%s_Y%02dD%03d"
+JobRcvrFmt = "PETRUS_%s"
+
+# Extension of the log file of a job
+JobLogExt = ".log"
+
+# Jobs functions
+#----------------------------------------------------------------------
+
+def getPetrusJobs(Conf, RcvrInfo, Follow):
+
+    # Purpose: split the processing in independent jobs. Each receiver
+    #          and day is a job, unless the days of a receiver depend
+    #          on each other (preprocessing state carried across days,
+    #          checkpoints of the receiver, or following the OBS
+    #          files): then each receiver is a job
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration data
+    # RcvrInfo: dict
+    #         Receivers information
+    # Follow: bool
+    #         True if the OBS files are followed
+
+    # Returns
+    # =======
+    # Jobs: list
+    #         [Receiver acronym, first Julian Day, last Julian Day]
+    #         of each job
+
+    PerDay = Conf["CARRY_PREPRO_STATE"] == 0 and \
+        Conf["CHECKPOINT"][FLAG] == 0 and not Follow
+
+    Jobs = []
+    for Rcvr in RcvrInfo.keys():
+        if PerDay:
+            for Jd in range(Conf["INI_DATE_JD"], Conf["END_DATE_JD"] + 1):
+                Jobs.append([Rcvr, Jd, Jd])
+        else:
+            Jobs.append([Rcvr, Conf["INI_DATE_JD"], Conf["END_DATE_JD"]])
+
+    return Jobs
+
+# End of getPetrusJobs()
+
+
+def getJobName(Job):
+
+    # Purpose: get the name of a job, as in its log file
+
+    # Parameters
+    # ==========
+    # Job: list
+    #         [Receiver acronym, first Julian Day, last Julian Day]
+
+    # Returns
+    # =======
+    # Name: str
+    #         Job name
+
+    Rcvr, FirstJd, LastJd = Job
+    if FirstJd != LastJd:
+        return JobRcvrFmt % Rcvr
+
+    Year, Month, Day = convertJulianDay2YearMonthDay(FirstJd)
+    return JobDayFmt % (Rcvr, Year % 100,
+    convertYearMonthDay2Doy(Year, Month, Day))
+
+# End of getJobName()
+
+
+def runPetrusJob(Scen, Job, Options):
+
+    # Purpose: run a job in its own process, writing its output into
+    #          its log file
+
+    # Parameters
+    # ==========
+    # Scen: str
+    #         Path to scenario
+    # Job: list
+    #         [Receiver acronym, first Julian Day, last Julian Day]
+    # Options: list
+    #         Command line options of the job (--resume, --follow)
+
+    # Returns
+    # =======
+    # ReturnCode: int
+    #         Exit status of the job (0 if it succeeded)
+    # Elapsed: float
+    #         Duration of the job [s]
+
+    LogFile = Scen + JobLogDirName + "/" + getJobName(Job) + JobLogExt
+    Cmd = [sys.executable, PetrusScript, Scen] + Options + \
+        ["--job", Job[0], str(Job[1]), str(Job[2])]
+
+    Start = time.perf_counter()
+    with open(LogFile, 'w') as flog:
+        Result = subprocess.run(Cmd, stdin=subprocess.DEVNULL, stdout=flog,
+        stderr=subprocess.STDOUT)
+
+    return Result.returncode, time.perf_counter() - Start
+
+# End of runPetrusJob()
+
+
+def runPetrusJobs(Scen, Conf, Jobs, NProcs, Options):
+
+    # Purpose: run the jobs in a pool of processes. A failed job does
+    #          not stop the others
+
+    # Parameters
+    # ==========
+    # Scen: str
+    #         Path to scenario
+    # Conf: dict
+    #         Configuration data
+    # Jobs: list
+    #         Jobs to run (see getPetrusJobs)
+    # NProcs: int
+    #         Maximum number of jobs running at once
+    # Options: list
+    #         Command line options of the jobs (--resume, --follow)
+
+    # Returns
+    # =======
+    # Failed: list
+    #         Names of the jobs failed
+
+    # Create the directories shared by the jobs, so that they do not
+    # race to create them
+    SharedDirs = [Scen + JobLogDirName, Scen + '/OUT/PPVE']
+    if Conf["CHECKPOINT"][FLAG] == 1:
+        SharedDirs.append(getCheckpointDir(Scen))
+    if Conf["OBS_CACHE"][FLAG] == 1:
+        SharedDirs.append(getObsCacheDir(Scen))
+    for SharedDir in SharedDirs:
+        if not os.path.exists(SharedDir):
+            os.makedirs(SharedDir)
+
+    # Display Message
+    print("INFO: Running %d jobs in %d processes, logs in %s..." %
+    (len(Jobs), min(NProcs, len(Jobs)), Scen + JobLogDirName))
+
+    # Each thread of the pool waits for the process of a job
+    Failed = []
+    with ThreadPoolExecutor(NProcs) as Pool:
+        Futures = dict([(Pool.submit(runPetrusJob, Scen, Job, Options), Job) \
+            for Job in Jobs])
+        for Future in as_completed(Futures):
+            Name = getJobName(Futures[Future])
+            ReturnCode, Elapsed = Future.result()
+            if ReturnCode == 0:
+                print("INFO: Job %s done in %.1f s" % (Name, Elapsed))
+            else:
+                print("ERROR: Job %s failed (exit status %d) after %.1f s: "\
+                    "see %s" % (Name, ReturnCode, Elapsed,
+                    Scen + JobLogDirName + "/" + Name + JobLogExt))
+                Failed.append(Name)
+
+    return Failed
+
+# End of runPetrusJobs()
+
+
+########################################################################
+# END OF JOBS MODULE
+########################################################################
@@ -0,0 +1,710 @@
+#!/usr/bin/env python
+
+########################################################################
+# PETRUS/SRC/Kernels.py:
+# This is the Kernels Module of PETRUS tool
+# It gathers the sequential recursions of the preprocessing, which
+# can be compiled with Numba (when it is installed) or run as plain
+# Python with the same results
+#
+#  Project:        PETRUS
+#  File:           Kernels.py
+#  Date(YY/MM/DD): 26/10/17
+#
+#   Author: PETRUS contributors
+#
+# -----------------------------------------------------------------
+# Date       | Author             | Action
+# -----------------------------------------------------------------
+# 26/10/17   | PETRUS contrib.    | Created
+#
+# Usage:
+#   Kernels.py
+#   (reports the available kernel backends; the outputs of the
+#   engines with both backends are compared by
+#   Benchmarks.py PREPRO_CHECK)
+########################################################################
+
+
+# Import External and Internal functions and Libraries
+#----------------------------------------------------------------------
+import sys
+import types
+from collections import OrderedDict
+import numpy as np
+
+# Numba is optional: without it, the kernels run as plain Python
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Kernel backends
+#----------------------------------------------------------------------
+# PYTHON: kernels run by the Python interpreter (reference)
+# NUMBA: kernels compiled to machine code by Numba
+KERNEL_BACKENDS = ["PYTHON", "NUMBA"]
+
+# Backend in use
+KernelBackend = "PYTHON"
+
+# Compiled kernels (compiled at the first selection of NUMBA backend)
+CompiledKernels = OrderedDict({})
+
+# Kernels
+#----------------------------------------------------------------------
+# They are written on plain indexable sequences (lists or 1-D arrays)
+# and scalars, so that Numba can compile them without changes
+
+def computeL1Weights(Sod, t1, t2, t3):
+
+    # Purpose: compute the weights of the L1 carrier phase at three
+    #          previous epochs extrapolating it at the current one
+    #          (Lagrange polynomial, valid for unevenly spaced epochs)
+
+    # Parameters
+    # ==========
+    # Sod: float or numpy array
+    #         Current epoch
+    # t1, t2, t3: float or numpy array
+    #         Epochs t-1, t-2 and t-3
+
+    # Returns
+    # =======
+    # W1, W2, W3: float or numpy array
+    #         Weights of the L1 at t-1, t-2 and t-3
+
+    W1 = ((Sod - t2) * (Sod - t3)) / ((t1 - t2) * (t1 - t3))
+    W2 = ((Sod - t1) * (Sod - t3)) / ((t2 - t1) * (t2 - t3))
+    W3 = ((Sod - t1) * (Sod - t2)) / ((t3 - t1) * (t3 - t2))
+
+    return W1, W2, W3
+
+# End of computeL1Weights()
+
+
+def extrapolateL1(Sod, t1, t2, t3, L1_1, L1_2, L1_3):
+
+    # Purpose: extrapolate the L1 carrier phase at the current epoch
+    #          with the Lagrange polynomial through three previous ones
+
+    # Parameters
+    # ==========
+    # Sod: float or numpy array
+    #         Current epoch
+    # t1, t2, t3: float or numpy array
+    #         Epochs t-1, t-2 and t-3
+    # L1_1, L1_2, L1_3: float or numpy array
+    #         L1 carrier phase at t-1, t-2 and t-3 [cycles]
+
+    # Returns
+    # =======
+    # L1Pred: float or numpy array
+    #         Predicted L1 carrier phase [cycles]
+
+    W1, W2, W3 = computeL1Weights(Sod, t1, t2, t3)
+
+    return W1 * L1_1 + W2 * L1_2 + W3 * L1_3
+
+# End of extrapolateL1()
+
+
+def preproSatKernel(SatIdx, Sod, C1, L1, L1Meters, CsChecked, CsFlag,
+CsConfirmed, RatesGiven, DeltaT, PhaseRate, RangeRate, L1Hist, tHist,
+PhaseHistIdx, NPhaseHist, CsBuff, CsIdx, CsFull, CsNFlags, ResetHatchFilter,
+Ksmooth, DivCount, PrevEpoch, PrevC1, PrevL1, PrevSmoothC1, PrevRangeRateL1,
+PrevPhaseRateL1, GapTh, CsNEpochs, CsTh, MaxPhaseRate, MaxPhaseRateStep,
+MaxCodeRate, MaxCodeRateStep, HatchTime, HatchStateF, DivTh, DivTime, Causes):
+
+    # Purpose: check the measurement of a satellite in view against its
+    #          previous ones (data gaps, cycle slips, rates) and smooth
+    #          it with the Hatch filter, updating the satellite
+    #          preprocessing information. This is the recursion of all
+    #          the preprocessing engines
+
+    # Parameters
+    # ==========
+    # SatIdx: int
+    #         Index of the satellite
+    # Sod: float
+    #         Current epoch
+    # C1, L1, L1Meters: float
+    #         Code [m] and carrier phase [cycles] and [m]
+    # CsChecked: bool
+    #         True if the cycle slips were already checked and their
+    #         flags stored (see Preprocessing.detectCycleSlips)
+    # CsFlag, CsConfirmed: bool
+    #         Cycle slip flagged and confirmed, if CsChecked
+    # RatesGiven: bool
+    #         True if the time since the previous measurement and the
+    #         rates were already computed from it
+    # DeltaT, PhaseRate, RangeRate: float
+    #         Time since the previous measurement [s], and Phase and
+    #         Code Rates [m/s], if RatesGiven
+    # L1Hist ... PrevPhaseRateL1: numpy array
+    #         Preprocessing information of all the satellites (see
+    #         Preprocessing.initPreproState). Updated
+    # GapTh: float
+    #         Data gap threshold [s]
+    # CsNEpochs, CsTh: int, float
+    #         Epochs to confirm a cycle slip (0: no check) and cycle
+    #         slip threshold [cycles]
+    # MaxPhaseRate ... MaxCodeRateStep: float
+    #         Maximum Phase Rate, Phase Rate Step, Code Rate and Code
+    #         Rate Step (inf: no check)
+    # HatchTime, HatchStateF: float
+    #         Hatch filter smoothing time [s] and steady state factor
+    # DivTh, DivTime: float
+    #         Hatch filter divergence threshold [m] and epochs to reset
+    #         (0: no check)
+    # Causes: sequence
+    #         Rejection causes, in the order of REJECTION_CAUSE
+
+    # Returns
+    # =======
+    # RejectionCause: int
+    #         Rejection cause, or 0 if the measurement is accepted
+    # SmoothC1: float
+    #         Smoothed C1 [m] (0 if rejected)
+    # Status: int
+    #         1 if the Hatch filter is in steady state
+    # PhaseRate, RangeRate, PhaseRateStep, RangeRateStep: float
+    #         L1 Phase and Code Rates and Rate Steps (0 if not computed)
+
+    CsCause, GapCause, PhaseRateCause, PhaseRateStepCause, CodeRateCause, \
+        CodeRateStepCause = Causes[4], Causes[5], Causes[6], Causes[7], \
+            Causes[8], Causes[9]
+
+    # If the Hatch filter has to be reset, start a new arc
+    if ResetHatchFilter[SatIdx] == 1:
+        # Reset Hatch filter, L1 history and cycle slips buffer
+        Ksmooth[SatIdx] = 0
+        DivCount[SatIdx] = 0
+        NPhaseHist[SatIdx] = 0
+        CsIdx[SatIdx] = 0
+        CsFull[SatIdx] = False
+        CsNFlags[SatIdx] = 0
+        ResetHatchFilter[SatIdx] = 0
+
+        # Initialize Hatch filter with the code
+        SmoothC1 = C1
+        Status = 0
+        PhaseRate = 0.0
+        RangeRate = 0.0
+        PhaseRateStep = 0.0
+        RangeRateStep = 0.0
+
+    else:
+        # Compute the actual time since the previous measurement
+        if not RatesGiven:
+            DeltaT = Sod - PrevEpoch[SatIdx]
+
+        # Check Data Gaps
+        if DeltaT > GapTh:
+            ResetHatchFilter[SatIdx] = 1
+            return GapCause, 0.0, 0, 0.0, 0.0, 0.0, 0.0
+
+        # Check Cycle Slips: compare the L1 with its prediction from
+        # the three previous epochs and store the flag, overwriting
+        # the oldest one
+        if not CsChecked and CsNEpochs > 0 and \
+            NPhaseHist[SatIdx] >= len(tHist[SatIdx]):
+            Next = PhaseHistIdx[SatIdx]
+            Slot1 = (Next + 2) % len(tHist[SatIdx])
+            Slot2 = (Next + 1) % len(tHist[SatIdx])
+            CsFlag = abs(L1 - extrapolateL1(Sod, tHist[SatIdx, Slot1],
+            tHist[SatIdx, Slot2], tHist[SatIdx, Next], L1Hist[SatIdx, Slot1],
+            L1Hist[SatIdx, Slot2], L1Hist[SatIdx, Next])) > CsTh
+            Slot = CsIdx[SatIdx]
+            CsOld = CsBuff[SatIdx, Slot] if CsFull[SatIdx] else 0
+            CsBuff[SatIdx, Slot] = 1 if CsFlag else 0
+            CsNFlags[SatIdx] = CsNFlags[SatIdx] + (1 if CsFlag else 0) - CsOld
+            CsIdx[SatIdx] = (Slot + 1) % CsNEpochs
+            CsFull[SatIdx] = CsFull[SatIdx] or CsIdx[SatIdx] == 0
+            CsConfirmed = CsNFlags[SatIdx] == CsNEpochs
+
+        # If flagged, reject the measurement and, if flagged in all
+        # the last epochs, the cycle slip is confirmed
+        if CsFlag:
+            if CsConfirmed:
+                ResetHatchFilter[SatIdx] = 1
+            return CsCause, 0.0, 0, 0.0, 0.0, 0.0, 0.0
+
+        # Compute Phase and Code Rates and Rate Steps (available if
+        # the previous rates are)
+        if not RatesGiven:
+            PhaseRate = (L1Meters - PrevL1[SatIdx]) / DeltaT
+            RangeRate = (C1 - PrevC1[SatIdx]) / DeltaT
+        RateSteps = Ksmooth[SatIdx] > 0
+        PhaseRateStep = 0.0
+        RangeRateStep = 0.0
+        if RateSteps:
+            PhaseRateStep = (PhaseRate - PrevPhaseRateL1[SatIdx]) / DeltaT
+            RangeRateStep = (RangeRate - PrevRangeRateL1[SatIdx]) / DeltaT
+
+        # Check Maximum Phase Rate, Phase Rate Step, Code Rate and
+        # Code Rate Step, the first check failed prevailing
+        RateCause = 0
+        if abs(PhaseRate) > MaxPhaseRate:
+            RateCause = PhaseRateCause
+        elif RateSteps and abs(PhaseRateStep) > MaxPhaseRateStep:
+            RateCause = PhaseRateStepCause
+        elif abs(RangeRate) > MaxCodeRate:
+            RateCause = CodeRateCause
+        elif RateSteps and abs(RangeRateStep) > MaxCodeRateStep:
+            RateCause = CodeRateStepCause
+
+        # If rejected, reset Hatch filter
+        if RateCause != 0:
+            ResetHatchFilter[SatIdx] = 1
+            return RateCause, 0.0, 0, PhaseRate, RangeRate, PhaseRateStep, \
+                RangeRateStep
+
+        # Hatch filter: smooth the code with the carrier phase,
+        # updating the smoothing time with the actual time gap
+        Ksmooth[SatIdx] = Ksmooth[SatIdx] + DeltaT
+        Alpha = DeltaT / max(min(Ksmooth[SatIdx], HatchTime), DeltaT)
+        SmoothC1 = Alpha * C1 + (1 - Alpha) * \
+            (PrevSmoothC1[SatIdx] + L1Meters - PrevL1[SatIdx])
+
+        # Check if the filter is in steady state
+        Status = 1 if Ksmooth[SatIdx] >= HatchStateF * HatchTime else 0
+
+        # Check Hatch filter divergence: if the smoothed code departs
+        # from the code during several epochs, reset Hatch filter
+        if DivTime > 0:
+            if abs(SmoothC1 - C1) > DivTh:
+                DivCount[SatIdx] = DivCount[SatIdx] + 1
+                if DivCount[SatIdx] >= DivTime:
+                    ResetHatchFilter[SatIdx] = 1
+            else:
+                DivCount[SatIdx] = 0
+
+    # End of if ResetHatchFilter[SatIdx] == 1:
+
+    # Update satellite preprocessing information
+    PrevEpoch[SatIdx] = Sod
+    PrevC1[SatIdx] = C1
+    PrevL1[SatIdx] = L1Meters
+    PrevSmoothC1[SatIdx] = SmoothC1
+    PrevRangeRateL1[SatIdx] = RangeRate
+    PrevPhaseRateL1[SatIdx] = PhaseRate
+
+    # Push L1 in history, overwriting the oldest one
+    Next = PhaseHistIdx[SatIdx]
+    L1Hist[SatIdx, Next] = L1
+    tHist[SatIdx, Next] = Sod
+    PhaseHistIdx[SatIdx] = (Next + 1) % len(tHist[SatIdx])
+    NPhaseHist[SatIdx] = NPhaseHist[SatIdx] + 1
+
+    return 0, SmoothC1, Status, PhaseRate, RangeRate, PhaseRateStep, \
+        RangeRateStep
+
+# End of preproSatKernel()
+
+
+def preproEpochKernel(ObsInfo, PreproObsInfo, L1Hist, tHist, PhaseHistIdx,
+NPhaseHist, CsBuff, CsIdx, CsFull, CsNFlags, ResetHatchFilter, Ksmooth,
+DivCount, PrevEpoch, PrevC1, PrevL1, PrevSmoothC1, PrevRangeRateL1,
+PrevPhaseRateL1, PreproConst, MaxPrn, Mask, NChannels, MinCnr, MaxPsr,
+L1Wave, GapTh, CsNEpochs, CsTh, MaxPhaseRate, MaxPhaseRateStep, MaxCodeRate,
+MaxCodeRateStep, HatchTime, HatchStateF, DivTh, DivTime, Causes):
+
+    # Purpose: preprocess all the satellites of an epoch, running the
+    #          recursion of each one in the channels (see
+    #          preproSatKernel), so that the whole epoch is a single
+    #          kernel call
+
+    # Parameters
+    # ==========
+    # ObsInfo: numpy structured array
+    #         OBS info for current epoch (ObsDtype)
+    # PreproObsInfo: numpy structured array
+    #         Preprocessed observations, one row per row of ObsInfo,
+    #         set to 0 (PreproObsDtype). Output
+    # L1Hist ... PrevPhaseRateL1: numpy array
+    #         Preprocessing information of all the satellites (see
+    #         Preprocessing.initPreproState). Updated
+    # PreproConst: str
+    #         Constellation in the preprocessing information ("" if
+    #         out of the navigation solution)
+    # MaxPrn: int
+    #         Maximum PRN in the preprocessing information
+    # Mask: float
+    #         Masking angle [deg]
+    # NChannels: int
+    #         Number of channels
+    # MinCnr, MaxPsr: float
+    #         Minimum C/N0 and maximum PR (-inf and inf: no check)
+    # L1Wave: float
+    #         L1 wave length [m]
+    # GapTh ... Causes:
+    #         Parameters of the recursion (see preproSatKernel)
+
+    # Returns
+    # =======
+    # Nothing
+
+    NChannelsCause, MaskCause, MinCnrCause, MaxPsrCause, NotPreproCause = \
+        Causes[0], Causes[1], Causes[2], Causes[3], Causes[10]
+
+    # Prepare outputs, check Minimum Masking angle and the satellites
+    # with preprocessing information
+    NSats = len(ObsInfo)
+    InView = np.zeros(NSats, dtype=np.bool_)
+    NInView = 0
+    for i in range(NSats):
+        PreproObsInfo[i]["Sod"] = ObsInfo[i]["SOD"]
+        PreproObsInfo[i]["Doy"] = ObsInfo[i]["DOY"]
+        PreproObsInfo[i]["Const"] = ObsInfo[i]["CONST"]
+        PreproObsInfo[i]["Prn"] = ObsInfo[i]["PRN"]
+        PreproObsInfo[i]["Elevation"] = ObsInfo[i]["ELEV"]
+        PreproObsInfo[i]["Azimuth"] = ObsInfo[i]["AZIM"]
+        if not ObsInfo[i]["ELEV"] >= Mask:
+            PreproObsInfo[i]["RejectionCause"] = MaskCause
+        elif ObsInfo[i]["CONST"] != PreproConst or \
+            ObsInfo[i]["PRN"] < 1 or ObsInfo[i]["PRN"] > MaxPrn:
+            PreproObsInfo[i]["RejectionCause"] = NotPreproCause
+        else:
+            InView[i] = True
+            NInView = NInView + 1
+            PreproObsInfo[i]["C1"] = ObsInfo[i]["C1"]
+            PreproObsInfo[i]["L1"] = ObsInfo[i]["L1"]
+            PreproObsInfo[i]["S1"] = ObsInfo[i]["S1"]
+            PreproObsInfo[i]["P2"] = ObsInfo[i]["P2"]
+            PreproObsInfo[i]["L2"] = ObsInfo[i]["L2"]
+            PreproObsInfo[i]["S2"] = ObsInfo[i]["S2"]
+        PreproObsInfo[i]["L1Meters"] = PreproObsInfo[i]["L1"] * L1Wave
+
+    # Limit the satellites to the Number of Channels: keep those
+    # ranked first by elevation (keeping the order for equal ones)
+    if NInView > NChannels:
+        Kept = np.zeros(NSats, dtype=np.bool_)
+        for i in range(NSats):
+            if InView[i]:
+                Rank = 0
+                for j in range(NSats):
+                    if InView[j] and (ObsInfo[j]["ELEV"] > ObsInfo[i]["ELEV"] or \
+                        (ObsInfo[j]["ELEV"] == ObsInfo[i]["ELEV"] and j < i)):
+                        Rank = Rank + 1
+                Kept[i] = Rank < NChannels
+        for i in range(NSats):
+            if InView[i] and not Kept[i]:
+                InView[i] = False
+                PreproObsInfo[i]["RejectionCause"] = NChannelsCause
+
+    # Loop over the satellites in the channels
+    for i in range(NSats):
+        if not InView[i]:
+            continue
+
+        # Check Minimum Carrier-To-Noise Ratio (CN0)
+        if PreproObsInfo[i]["S1"] < MinCnr:
+            PreproObsInfo[i]["RejectionCause"] = MinCnrCause
+            continue
+
+        # Check Pseudo-Range Out of Range
+        if PreproObsInfo[i]["C1"] > MaxPsr:
+            PreproObsInfo[i]["RejectionCause"] = MaxPsrCause
+            continue
+
+        # Check the measurement against the previous ones and smooth it
+        Cause, SmoothC1, Status, PhaseRate, RangeRate, PhaseRateStep, \
+            RangeRateStep = preproSatKernel(ObsInfo[i]["PRN"] - 1,
+            PreproObsInfo[i]["Sod"], PreproObsInfo[i]["C1"],
+            PreproObsInfo[i]["L1"], PreproObsInfo[i]["L1Meters"],
+            False, False, False, False, 0.0, 0.0, 0.0,
+            L1Hist, tHist, PhaseHistIdx, NPhaseHist, CsBuff, CsIdx, CsFull,
+            CsNFlags, ResetHatchFilter, Ksmooth, DivCount, PrevEpoch, PrevC1,
+            PrevL1, PrevSmoothC1, PrevRangeRateL1, PrevPhaseRateL1, GapTh,
+            CsNEpochs, CsTh, MaxPhaseRate, MaxPhaseRateStep, MaxCodeRate,
+            MaxCodeRateStep, HatchTime, HatchStateF, DivTh, DivTime, Causes)
+        PreproObsInfo[i]["RejectionCause"] = Cause
+        PreproObsInfo[i]["ValidL1"] = 1 if Cause == 0 else 0
+        PreproObsInfo[i]["SmoothC1"] = SmoothC1
+        PreproObsInfo[i]["Status"] = Status
+        PreproObsInfo[i]["PhaseRateL1"] = PhaseRate
+        PreproObsInfo[i]["RangeRateL1"] = RangeRate
+        PreproObsInfo[i]["PhaseRateStepL1"] = PhaseRateStep
+        PreproObsInfo[i]["RangeRateStepL1"] = RangeRateStep
+
+    # End of for i in range(NSats):
+
+# End of preproEpochKernel()
+
+
+def preproArcKernel(SatIdx, Sod, C1, L1, L1Meters, DeltaT, PhaseRate,
+RangeRate, RejectionCause, SmoothC1, Status, PhaseRateOut, RangeRateOut,
+PhaseRateStepOut, RangeRateStepOut, L1Hist, tHist, PhaseHistIdx, NPhaseHist,
+CsBuff, CsIdx, CsFull, CsNFlags, ResetHatchFilter, Ksmooth, DivCount,
+PrevEpoch, PrevC1, PrevL1, PrevSmoothC1, PrevRangeRateL1, PrevPhaseRateL1,
+GapTh, CsNEpochs, CsTh, MaxPhaseRate, MaxPhaseRateStep, MaxCodeRate,
+MaxCodeRateStep, HatchTime, HatchStateF, DivTh, DivTime, Causes):
+
+    # Purpose: run the recursion of a satellite (see preproSatKernel)
+    #          over the consecutive epochs of an arc, with the time
+    #          deltas and rates computed from the previous epoch
+
+    # Parameters
+    # ==========
+    # SatIdx: int
+    #         Index of the satellite
+    # Sod, C1, L1, L1Meters: sequence
+    #         Epochs, code [m] and carrier phase [cycles] and [m]
+    # DeltaT, PhaseRate, RangeRate: sequence
+    #         Time since the previous epoch [s], and Phase and Code
+    #         Rates from it [m/s]
+    # RejectionCause ... RangeRateStepOut: sequence
+    #         Outputs of preproSatKernel at each epoch. Output
+    # L1Hist ... Causes:
+    #         Preprocessing information of all the satellites, updated,
+    #         and parameters of the recursion (see preproSatKernel)
+
+    # Returns
+    # =======
+    # Nothing
+
+    # The arc starts after a data gap or with the first epoch of the
+    # satellite, whose rates are computed from its preprocessing
+    # information. The next ones are those of the recursion only if
+    # the previous epoch updated it (was accepted)
+    RatesGiven = True
+    for i in range(len(Sod)):
+        RejectionCause[i], SmoothC1[i], Status[i], PhaseRateOut[i], \
+            RangeRateOut[i], PhaseRateStepOut[i], RangeRateStepOut[i] = \
+            preproSatKernel(SatIdx, Sod[i], C1[i], L1[i], L1Meters[i],
+            False, False, False, RatesGiven, DeltaT[i], PhaseRate[i],
+            RangeRate[i], L1Hist, tHist, PhaseHistIdx, NPhaseHist, CsBuff,
+            CsIdx, CsFull, CsNFlags, ResetHatchFilter, Ksmooth, DivCount,
+            PrevEpoch, PrevC1, PrevL1, PrevSmoothC1, PrevRangeRateL1,
+            PrevPhaseRateL1, GapTh, CsNEpochs, CsTh, MaxPhaseRate,
+            MaxPhaseRateStep, MaxCodeRate, MaxCodeRateStep, HatchTime,
+            HatchStateF, DivTh, DivTime, Causes)
+        RatesGiven = RejectionCause[i] == 0
+
+# End of preproArcKernel()
+
+
+# Python kernels, by name
+PythonKernels = OrderedDict({})
+PythonKernels["L1_WEIGHTS"] = computeL1Weights
+PythonKernels["EXTRAPOLATE_L1"] = extrapolateL1
+PythonKernels["PREPRO_SAT"] = preproSatKernel
+PythonKernels["PREPRO_EPOCH"] = preproEpochKernel
+PythonKernels["PREPRO_ARC"] = preproArcKernel
+
+# Fields of the preprocessing information handed to the kernels, in
+# order (see Preprocessing.initPreproState)
+PreproStateFields = ["L1Hist", "tHist", "PhaseHistIdx", "NPhaseHist", "CsBuff",
+"CsIdx", "CsFull", "CsNFlags", "ResetHatchFilter", "Ksmooth", "DivCount",
+"PrevEpoch", "PrevC1", "PrevL1", "PrevSmoothC1", "PrevRangeRateL1",
+"PrevPhaseRateL1"]
+
+# Backend selection
+#----------------------------------------------------------------------
+def setKernelBackend(Backend):
+
+    # Purpose: select the backend of the kernels. If NUMBA is selected
+    #          but not installed, PYTHON is used
+
+    # Parameters
+    # ==========
+    # Backend: str
+    #         Kernel backend [PYTHON|NUMBA]
+
+    # Returns
+    # =======
+    # KernelBackend: str
+    #         Backend in use
+
+    global KernelBackend
+
+    if Backend not in KERNEL_BACKENDS:
+        sys.stderr.write("ERROR: Unknown kernel backend %s\n" % Backend)
+        sys.exit(-1)
+
+    if Backend == "NUMBA" and numba is None:
+        print("WARNING: Numba is not installed: using PYTHON kernels")
+        Backend = "PYTHON"
+
+    # Compile the kernels (only once; the machine code is cached
+    # next to this module for the next runs). The kernels call each
+    # other by name, so they are compiled in a namespace where those
+    # names are the compiled kernels
+    if Backend == "NUMBA" and len(CompiledKernels) == 0:
+        Namespace = dict(globals())
+        for Name, Kernel in PythonKernels.items():
+            CompiledKernels[Name] = numba.njit(cache=True, nogil=True)(
+                types.FunctionType(Kernel.__code__, Namespace, Kernel.__name__))
+            Namespace[Kernel.__name__] = CompiledKernels[Name]
+
+    KernelBackend = Backend
+
+    return KernelBackend
+
+# End of setKernelBackend()
+
+
+def getKernelBackend():
+
+    # Purpose: get the backend of the kernels in use
+
+    # Returns
+    # =======
+    # KernelBackend: str
+    #         Backend in use
+
+    return KernelBackend
+
+# End of getKernelBackend()
+
+
+def getKernelReport():
+
+    # Purpose: report the kernel backends available and in use
+
+    # Returns
+    # =======
+    # Report: list
+    #         Lines of the report
+
+    Report = []
+    Report.append("Kernel backend in use: %s" % KernelBackend)
+    Report.append("Numba: %s" %
+    (numba.__version__ if numba is not None else "not installed"))
+    for Name in PythonKernels:
+        Report.append("  %-14s %s" % (Name,
+        "compiled" if KernelBackend == "NUMBA" else "python"))
+
+    return Report
+
+# End of getKernelReport()
+
+
+# Kernel calls
+#----------------------------------------------------------------------
+def runPreproEpoch(ObsInfo, PreproObsInfo, PrevPreproState, Params):
+
+    # Purpose: preprocess all the satellites of an epoch in a single
+    #          kernel call (see preproEpochKernel)
+
+    # Parameters
+    # ==========
+    # ObsInfo: numpy structured array
+    #         OBS info for current epoch (ObsDtype)
+    # PreproObsInfo: numpy structured array
+    #         Preprocessed observations, one row per row of ObsInfo,
+    #         set to 0 (PreproObsDtype). Output
+    # PrevPreproState: dict
+    #         Preprocessing information of all the satellites (see
+    #         Preprocessing.initPreproState). Updated
+    # Params: tuple
+    #         Parameters of preproEpochKernel, from PreproConst on
+
+    # Returns
+    # =======
+    # Nothing
+
+    if KernelBackend == "NUMBA":
+        Kernel = CompiledKernels["PREPRO_EPOCH"]
+    else:
+        Kernel = preproEpochKernel
+
+    Kernel(ObsInfo, PreproObsInfo, 
+    *[PrevPreproState[Field] for Field in PreproStateFields], *Params)
+
+# End of runPreproEpoch()
+
+
+def runPreproSat(PrevPreproState, SatIdx, Sod, C1, L1, L1Meters, CycleSlip,
+Params):
+
+    # Purpose: check the measurement of a satellite against its
+    #          previous ones and smooth it (see preproSatKernel)
+
+    # Parameters
+    # ==========
+    # PrevPreproState: dict
+    #         Preprocessing information of all the satellites (see
+    #         Preprocessing.initPreproState). Updated
+    # SatIdx: int
+    #         Index of the satellite
+    # Sod, C1, L1, L1Meters: float
+    #         Current epoch, code [m] and carrier phase [cycles] and [m]
+    # CycleSlip: list
+    #         [CsFlag, CsConfirmed] of the satellite, if its cycle slips
+    #         were already checked, or None
+    # Params: tuple
+    #         Parameters of preproSatKernel, from GapTh on
+
+    # Returns
+    # =======
+    # Outputs: tuple
+    #         RejectionCause, SmoothC1, Status, PhaseRate, RangeRate,
+    #         PhaseRateStep and RangeRateStep (see preproSatKernel)
+
+    if KernelBackend == "NUMBA":
+        Kernel = CompiledKernels["PREPRO_SAT"]
+    else:
+        Kernel = preproSatKernel
+
+    CsChecked = CycleSlip is not None
+    CsFlag, CsConfirmed = CycleSlip if CsChecked else (False, False)
+
+    return Kernel(int(SatIdx), float(Sod), float(C1), float(L1),
+    float(L1Meters), CsChecked, bool(CsFlag), bool(CsConfirmed), False, 0.0,
+    0.0, 0.0, *[PrevPreproState[Field] for Field in PreproStateFields], 
+    *Params)
+
+# End of runPreproSat()
+
+
+def runPreproArc(PrevPreproState, SatIdx, Arc, Outputs, Params):
+
+    # Purpose: run the recursion of a satellite over the epochs of an
+    #          arc in a single kernel call (see preproArcKernel)
+
+    # Parameters
+    # ==========
+    # PrevPreproState: dict
+    #         Preprocessing information of all the satellites (see
+    #         Preprocessing.initPreproState). Updated
+    # SatIdx: int
+    #         Index of the satellite
+    # Arc: list
+    #         Sod, C1, L1, L1Meters, DeltaT, PhaseRate and RangeRate
+    #         at the epochs of the arc (numpy arrays)
+    # Outputs: list
+    #         RejectionCause, SmoothC1, Status, PhaseRate, RangeRate,
+    #         PhaseRateStep and RangeRateStep at the epochs of the arc
+    #         (numpy arrays). Output
+    # Params: tuple
+    #         Parameters of preproSatKernel, from GapTh on
+
+    # Returns
+    # =======
+    # Nothing
+
+    if KernelBackend == "NUMBA":
+        Kernel = CompiledKernels["PREPRO_ARC"]
+    else:
+        Kernel = preproArcKernel
+
+    Kernel(int(SatIdx), *Arc, *Outputs, 
+    *[PrevPreproState[Field] for Field in PreproStateFields], *Params)
+
+# End of runPreproArc()
+
+
+#######################################################
+# MAIN BODY
+#######################################################
+
+if __name__ == "__main__":
+    # Report the capabilities
+    for Line in getKernelReport():
+        print(Line)
+
+########################################################################
+# END OF KERNELS MODULE
+########################################################################
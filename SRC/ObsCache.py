@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+
+########################################################################
+# PETRUS/SRC/ObsCache.py:
+# This is the OBS Cache Module of PETRUS tool
+# It keeps the parsed OBS files as binary NumPy files so that
+# later runs over the same inputs skip text parsing
+#
+#  Project:        PETRUS
+#  File:           ObsCache.py
+#  Date(YY/MM/DD): 26/10/17
+#
+#   Author: PETRUS contributors
+#
+# -----------------------------------------------------------------
+# Date       | Author             | Action
+# -----------------------------------------------------------------
+# 26/10/17   | PETRUS contrib.    | Created
+#
+# Usage:
+#   ObsCache.py $SCEN_PATH list
+#   ObsCache.py $SCEN_PATH purge [MAX_SIZE_MB]
+########################################################################
+
+
+# Import External and Internal functions and Libraries
+#----------------------------------------------------------------------
+import sys, os
+import time
+import hashlib
+import numpy as np
+from InputOutput import readObsFile
+from InputOutput import sliceObsWindow
+from InputOutput import applyObsFilter
+from InputOutput import computeObsEpochIdx
+
+# Cache layout
+#----------------------------------------------------------------------
+# Cache directory inside the scenario
+CacheDirName = "/CACHE/OBS"
+
+# Extension of the parsed OBS data files
+CacheDataExt = ".npy"
+
+# Extension of the OBS files keys (SIZE MTIME HASH)
+CacheKeyExt = ".key"
+
+# Size of the blocks read to compute the content hash
+HashBlockSize = 1 << 20
+
+# Bytes in one MB
+BYTES_IN_MB = 1 << 20
+
+# Cache functions
+#----------------------------------------------------------------------
+def getObsCacheDir(Scen):
+
+    # Purpose: get the OBS cache directory of a scenario
+
+    # Parameters
+    # ==========
+    # Scen: str
+    #         Path to scenario
+
+    # Returns
+    # =======
+    # CacheDir: str
+    #         Path to OBS cache directory
+
+    return Scen + CacheDirName
+
+# End of getObsCacheDir()
+
+
+def computeObsFileHash(ObsFile):
+
+    # Purpose: compute the hash of the OBS file content
+
+    # Parameters
+    # ==========
+    # ObsFile: str
+    #         Path to OBS file
+
+    # Returns
+    # =======
+    # Hash: str
+    #         SHA-1 hex digest of the file content
+
+    Sha = hashlib.sha1()
+    with open(ObsFile, 'rb') as f:
+        Block = f.read(HashBlockSize)
+        while Block:
+            Sha.update(Block)
+            Block = f.read(HashBlockSize)
+
+    return Sha.hexdigest()
+
+# End of computeObsFileHash()
+
+
+def getObsCacheEntry(CacheDir, ObsFile):
+
+    # Purpose: get the cache entry name of the OBS file. It is keyed on
+    #          the file size, mtime and content hash. The content hash
+    #          is only recomputed when the size or mtime change
+
+    # Parameters
+    # ==========
+    # CacheDir: str
+    #         Path to OBS cache directory
+    # ObsFile: str
+    #         Path to OBS file
+
+    # Returns
+    # =======
+    # Entry: str
+    #         Path to cache entry (without extension)
+
+    # Get file size and modification time
+    Stat = os.stat(ObsFile)
+    ObsName = os.path.basename(ObsFile)
+    KeyFile = CacheDir + '/' + ObsName + CacheKeyExt
+    Hash = None
+
+    # Check if the content hash is already known
+    if os.path.exists(KeyFile):
+        with open(KeyFile, 'r') as f:
+            KeySplit = f.readline().split()
+        if len(KeySplit) == 3 and \
+            int(KeySplit[0]) == Stat.st_size and \
+                int(KeySplit[1]) == Stat.st_mtime_ns:
+            Hash = KeySplit[2]
+
+    # Otherwise compute it and store the key
+    if Hash is None:
+        Hash = computeObsFileHash(ObsFile)
+        with open(KeyFile, 'w') as f:
+            f.write("%d %d %s\n" % (Stat.st_size, Stat.st_mtime_ns, Hash))
+
+    return CacheDir + '/' + ObsName + '_' + Hash
+
+# End of getObsCacheEntry()
+
+
+def listObsCache(CacheDir):
+
+    # Purpose: list the parsed OBS data files in the cache
+
+    # Parameters
+    # ==========
+    # CacheDir: str
+    #         Path to OBS cache directory
+
+    # Returns
+    # =======
+    # Entries: list
+    #         [Path, Size, LastAccess] of each cache file, from the
+    #         least to the most recently used
+
+    Entries = []
+    if os.path.isdir(CacheDir):
+        for Name in os.listdir(CacheDir):
+            if Name.endswith(CacheDataExt):
+                Stat = os.stat(CacheDir + '/' + Name)
+                Entries.append(
+                    [CacheDir + '/' + Name, Stat.st_size, Stat.st_mtime])
+
+    # Sort by last access
+    Entries.sort(key=lambda Entry: Entry[2])
+
+    return Entries
+
+# End of listObsCache()
+
+
+def evictObsCache(CacheDir, MaxSize, Keep=None):
+
+    # Purpose: remove the least recently used cache files until the
+    #          cache size is below the maximum
+
+    # Parameters
+    # ==========
+    # CacheDir: str
+    #         Path to OBS cache directory
+    # MaxSize: float
+    #         Maximum cache size [MB]
+    # Keep: str
+    #         Path to cache file not to be removed
+
+    # Returns
+    # =======
+    # Removed: list
+    #         Paths of the removed cache files
+
+    Removed = []
+    Entries = listObsCache(CacheDir)
+    TotalSize = sum([Entry[1] for Entry in Entries])
+
+    # Loop over files from the least recently used
+    for Path, Size, LastAccess in Entries:
+        if TotalSize <= MaxSize * BYTES_IN_MB:
+            break
+        if Path != Keep:
+            os.remove(Path)
+            TotalSize = TotalSize - Size
+            Removed.append(Path)
+
+    return Removed
+
+# End of evictObsCache()
+
+
+def readObsFileCached(CacheDir, ObsFile, MaxSize, ObsFilter=None):
+
+    # Purpose: read the OBS file through the cache. If the parsed data
+    #          is cached, it is memory-mapped; otherwise, the file is
+    #          parsed and the cache updated
+
+    # Parameters
+    # ==========
+    # CacheDir: str
+    #         Path to OBS cache directory
+    # ObsFile: str
+    #         Path to OBS file
+    # MaxSize: float
+    #         Maximum cache size [MB]
+    # ObsFilter: dict
+    #         OBS filter (see buildObsFilter). If None, all the rows
+    #         and columns are read. The cache always keeps them all
+
+    # Returns
+    # =======
+    # ObsData: numpy structured array
+    #         OBS data (ObsDtype)
+    # EpochIdx: numpy array
+    #         Epoch boundaries (see computeObsEpochIdx)
+
+    # Create cache directory, if needed
+    if not os.path.exists(CacheDir):
+        os.makedirs(CacheDir)
+
+    # Get cache entry
+    CacheFile = getObsCacheEntry(CacheDir, ObsFile) + CacheDataExt
+
+    # If the parsed data is cached
+    if os.path.exists(CacheFile):
+        # Update last access for the LRU policy
+        os.utime(CacheFile)
+
+        # Map it
+        ObsData = np.load(CacheFile, mmap_mode='r')
+
+    else:
+        # Parse the whole file
+        ObsData, EpochIdx = readObsFile(ObsFile)
+
+        # Store it writing a temporary file and renaming it, so that
+        # concurrent runs never see a partial file
+        TmpFile = CacheFile + ".%d.tmp" % os.getpid()
+        with open(TmpFile, 'wb') as f:
+            np.save(f, ObsData)
+        os.replace(TmpFile, CacheFile)
+
+        # Apply eviction policy
+        evictObsCache(CacheDir, MaxSize, Keep=CacheFile)
+
+    # If there is no filter, return the cached data as is
+    if ObsFilter is None:
+        return ObsData, computeObsEpochIdx(ObsData)
+
+    # Select the SoD window first, which is only a view
+    ObsData, EpochIdx = sliceObsWindow(ObsData, ObsFilter["SOD_WINDOW"])
+
+    # And apply the OBS filter
+    ObsData = applyObsFilter(ObsData, ObsFilter)
+
+    return ObsData, computeObsEpochIdx(ObsData)
+
+# End of readObsFileCached()
+
+
+def purgeObsCache(CacheDir, MaxSize=0):
+
+    # Purpose: purge the cache down to a maximum size
+
+    # Parameters
+    # ==========
+    # CacheDir: str
+    #         Path to OBS cache directory
+    # MaxSize: float
+    #         Maximum cache size after purge [MB]. If 0, all the cache
+    #         is removed
+
+    # Returns
+    # =======
+    # Removed: list
+    #         Paths of the removed cache files
+
+    Removed = evictObsCache(CacheDir, MaxSize)
+
+    # Remove the keys of the OBS files no longer cached
+    if MaxSize == 0 and os.path.isdir(CacheDir):
+        for Name in os.listdir(CacheDir):
+            if Name.endswith(CacheKeyExt):
+                os.remove(CacheDir + '/' + Name)
+
+    return Removed
+
+# End of purgeObsCache()
+
+
+#----------------------------------------------------------------------
+# INTERNAL FUNCTIONS
+#----------------------------------------------------------------------
+
+def displayUsage():
+    sys.stderr.write("ERROR: Please provide path to SCENARIO and command:\n"\
+        "  ObsCache.py $SCEN_PATH list\n"\
+        "  ObsCache.py $SCEN_PATH purge [MAX_SIZE_MB]\n")
+
+#######################################################
+# MAIN BODY
+#######################################################
+
+if __name__ == "__main__":
+    # Check InputOutput Arguments
+    if len(sys.argv) < 3 or \
+        sys.argv[2] not in ["list", "purge"] or \
+            (sys.argv[2] == "list" and len(sys.argv) != 3) or \
+                len(sys.argv) > 4:
+        displayUsage()
+        sys.exit(-1)
+
+    # Extract the arguments
+    CacheDir = getObsCacheDir(sys.argv[1])
+    Command = sys.argv[2]
+
+    # List the cache
+    if Command == "list":
+        Entries = listObsCache(CacheDir)
+        for Path, Size, LastAccess in Entries:
+            print("%10.1f MB  %s  %s" % (Size / BYTES_IN_MB,
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(LastAccess)),
+            os.path.basename(Path)))
+        print("TOTAL: %d files, %.1f MB in %s" % (len(Entries),
+        sum([Entry[1] for Entry in Entries]) / BYTES_IN_MB, CacheDir))
+
+    # Purge the cache
+    else:
+        MaxSize = float(sys.argv[3]) if len(sys.argv) == 4 else 0
+        Removed = purgeObsCache(CacheDir, MaxSize)
+        for Path in Removed:
+            print("INFO: Removed %s" % Path)
+        print("INFO: %d files removed from %s" % (len(Removed), CacheDir))
+
+########################################################################
+# END OF OBS CACHE MODULE
+########################################################################
@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+
+########################################################################
+# PETRUS/SRC/Orbits.py:
+# This is the Orbits Module of PETRUS tool
+# It reads the precise orbits (SP3 files) and provides the elevation
+# and azimuth of each line of sight to the RINEX reader
+#
+#  Project:        PETRUS
+#  File:           Orbits.py
+#  Date(YY/MM/DD): 26/10/17
+#
+#   Author: PETRUS contributors
+#
+# -----------------------------------------------------------------
+# Date       | Author             | Action
+# -----------------------------------------------------------------
+# 26/10/17   | PETRUS contrib.    | Created
+#
+########################################################################
+
+
+# Import External and Internal functions and Libraries
+#----------------------------------------------------------------------
+import os
+import glob
+import numpy as np
+from COMMON.Dates import convertYearMonthDay2JulianDay
+from COMMON.Dates import convertJulianDay2YearMonthDay
+from COMMON.Dates import convertYearMonthDay2Doy
+from COMMON import GnssConstants as Const
+from InputOutput import RcvrIdx
+from InputOutput import ObsCompression
+from InputOutput import RinexSbasPrnOffset
+from InputOutput import findObsFile
+from InputOutput import openObsFile
+
+# SP3 files
+#----------------------------------------------------------------------
+# SP3 directory inside the scenario
+Sp3DirName = "/INP/SP3"
+
+# Number of samples of the Lagrange interpolation of the positions
+# (order 9)
+Sp3InterpPoints = 10
+
+# Position of a satellite without orbits: at the nadir, so that it
+# is rejected by any mask angle
+NadirElev = -90.0
+
+# Orbits functions
+#----------------------------------------------------------------------
+def getSp3Dir(Scen):
+
+    # Purpose: get the SP3 directory of a scenario
+
+    # Parameters
+    # ==========
+    # Scen: str
+    #         Path to scenario
+
+    # Returns
+    # =======
+    # Sp3Dir: str
+    #         Path to SP3 directory
+
+    return Scen + Sp3DirName
+
+# End of getSp3Dir()
+
+
+def findSp3File(Sp3Dir, Year, Doy):
+
+    # Purpose: find the SP3 file of a day
+
+    # Parameters
+    # ==========
+    # Sp3Dir: str
+    #         Path to SP3 directory
+    # Year: int
+    #         Year
+    # Doy: int
+    #         Day of Year
+
+    # Returns
+    # =======
+    # Sp3File: str
+    #         Path to the SP3 file: long name or short name, either
+    #         uncompressed or compressed. None if not found
+
+    # Candidate names: long names first
+    Candidates = [Sp3File for Sp3File in sorted(glob.glob(Sp3Dir + '/' +
+    "*_%04d%03d0000_01D_*_ORB.[Ss][Pp]3*" % (Year, Doy)))
+    if os.path.splitext(Sp3File)[1].lower() in [".sp3"] + list(ObsCompression)]
+    Week, Dow = divmod(int(convertYearMonthDay2JulianDay(Year, 1, 1) + \
+        Doy - 1 - Const.JD_0), Const.D_IN_W)
+    Candidates.extend(sorted(glob.glob(Sp3Dir + '/' +
+    "???%04d%d.[Ss][Pp]3" % (Week, Dow))))
+
+    # Take the first one found
+    for Sp3File in Candidates:
+        Sp3File = findObsFile(Sp3File)
+        if os.path.exists(Sp3File):
+            return Sp3File
+
+    return None
+
+# End of findSp3File()
+
+
+def readSp3File(Sp3File, RefJd):
+
+    # Purpose: read the satellite positions of a SP3 file (versions
+    #          a, c and d)
+
+    # Parameters
+    # ==========
+    # Sp3File: str
+    #         Path to SP3 file
+    # RefJd: float
+    #         Julian Day of the time origin
+
+    # Returns
+    # =======
+    # Epochs: list
+    #         [Time, Positions] of each epoch. Time in seconds since
+    #         the origin. Positions: ECEF position [m] of each
+    #         satellite label (e.g. "G01")
+
+    Epochs = []
+    with openObsFile(Sp3File) as f:
+        for Line in f:
+            # Epoch header
+            if Line.startswith("* "):
+                Fields = Line[1:].split()
+                Jd = convertYearMonthDay2JulianDay(int(Fields[0]),
+                int(Fields[1]), int(Fields[2]))
+                Epochs.append([(Jd - RefJd) * Const.S_IN_D + \
+                    int(Fields[3]) * 3600 + int(Fields[4]) * 60 + \
+                        float(Fields[5]), {}])
+
+            # Satellite position [km]
+            elif Line.startswith("P") and len(Epochs) > 0:
+                Sys = Line[1] if Line[1] != ' ' else 'G'
+                Prn = int(Line[2:4])
+                if Sys == 'S':
+                    Sys, Prn = 'G', Prn + RinexSbasPrnOffset
+                Pos = [float(Line[4:18]), float(Line[18:32]),
+                float(Line[32:46])]
+
+                # Positions set to 0 are bad or missing
+                if Pos != [0.0, 0.0, 0.0]:
+                    Epochs[-1][1][Sys + "%02d" % Prn] = np.array(Pos) * 1e3
+
+            elif Line.startswith("EOF"):
+                break
+
+    return Epochs
+
+# End of readSp3File()
+
+
+def readSp3Orbits(Sp3Dir, Year, Doy):
+
+    # Purpose: read the satellite positions of a day, with those of
+    #          the previous and next days (if available) to
+    #          interpolate up to the day boundaries
+
+    # Parameters
+    # ==========
+    # Sp3Dir: str
+    #         Path to SP3 directory
+    # Year: int
+    #         Year
+    # Doy: int
+    #         Day of Year
+
+    # Returns
+    # =======
+    # Orbits: dict
+    #         Orbits["JD"]: Julian Day of the time origin (start of
+    #         the day)
+    #         Orbits["TIME"]: epochs [s since the origin]
+    #         Orbits["POS"]: ECEF positions [m] of each satellite
+    #         label, one row per epoch (NaN if missing)
+    #         None if the SP3 file of the day is not found
+
+    # Get the SP3 file of the day
+    Sp3File = findSp3File(Sp3Dir, Year, Doy)
+    if Sp3File is None:
+        return None
+
+    # Read it with those of the adjacent days
+    RefJd = convertYearMonthDay2JulianDay(Year, 1, 1) + Doy - 1
+    Epochs = []
+    for DayJd in [RefJd - 1, RefJd, RefJd + 1]:
+        DayYear, DayMonth, DayDay = convertJulianDay2YearMonthDay(DayJd)
+        DayFile = Sp3File if DayJd == RefJd else findSp3File(Sp3Dir, 
+        DayYear, convertYearMonthDay2Doy(DayYear, DayMonth, DayDay))
+        if DayFile is not None:
+            print("INFO: Reading file: %s..." % DayFile)
+            Epochs.extend(readSp3File(DayFile, RefJd))
+
+    # Sort the epochs, dropping those repeated in adjacent files
+    Epochs.sort(key=lambda Epoch: Epoch[0])
+    Epochs = [Epoch for i, Epoch in enumerate(Epochs)
+    if i == 0 or Epoch[0] != Epochs[i - 1][0]]
+
+    # Build the positions of each satellite
+    Orbits = {
+        "JD": RefJd,
+        "TIME": np.array([Epoch[0] for Epoch in Epochs]),
+        "POS": {},
+    }
+    for i, Epoch in enumerate(Epochs):
+        for SatLabel, Pos in Epoch[1].items():
+            if SatLabel not in Orbits["POS"]:
+                Orbits["POS"][SatLabel] = np.full((len(Epochs), 3), np.nan)
+            Orbits["POS"][SatLabel][i] = Pos
+
+    return Orbits
+
+# End of readSp3Orbits()
+
+
+def interpolateSp3Pos(Orbits, SatLabel, Time):
+
+    # Purpose: interpolate the position of a satellite with a Lagrange
+    #          polynomial of the closest SP3 epochs
+
+    # Parameters
+    # ==========
+    # Orbits: dict
+    #         Orbits (see readSp3Orbits)
+    # SatLabel: str
+    #         Satellite label
+    # Time: numpy array
+    #         Epochs [s since the origin of the orbits]
+
+    # Returns
+    # =======
+    # Pos: numpy array
+    #         ECEF position [m] at each epoch, NaN out of the orbits
+    #         or close to missing positions
+
+    Pos = np.full((len(Time), 3), np.nan)
+    T = Orbits["TIME"]
+    if SatLabel not in Orbits["POS"] or len(T) < Sp3InterpPoints:
+        return Pos
+
+    # Take the samples around each epoch (not extrapolating)
+    Inside = (Time >= T[0]) & (Time <= T[-1])
+    Start = np.clip(np.searchsorted(T, Time[Inside]) - Sp3InterpPoints // 2,
+    0, len(T) - Sp3InterpPoints)
+    Samples = Start[:, None] + np.arange(Sp3InterpPoints)
+
+    # Normalize the times with the sampling interval
+    Interval = T[Start + 1] - T[Start]
+    X = (Time[Inside] - T[Start]) / Interval
+    Xs = (T[Samples] - T[Start][:, None]) / Interval[:, None]
+
+    # Lagrange weights
+    Weights = np.ones((len(X), Sp3InterpPoints))
+    for j in range(Sp3InterpPoints):
+        for k in range(Sp3InterpPoints):
+            if k != j:
+                Weights[:, j] *= (X - Xs[:, k]) / (Xs[:, j] - Xs[:, k])
+
+    Pos[Inside] = np.einsum("ij,ijk->ik", Weights,
+    Orbits["POS"][SatLabel][Samples])
+
+    return Pos
+
+# End of interpolateSp3Pos()
+
+
+def getSp3Geometry(Orbits, Rcvr, Year, Doy, Sod, Constel, Prn):
+
+    # Purpose: geometry provider of the RINEX reader from SP3 orbits.
+    #          The satellite position is taken at the transmission time
+    #          and rotated with the Earth during the signal travel
+
+    # Parameters
+    # ==========
+    # Orbits: dict
+    #         Orbits (see readSp3Orbits)
+    # Rcvr: list
+    #         Receiver information: position, masking angle...
+    # Year, Doy, Sod: numpy array
+    #         Epoch of each LoS
+    # Constel, Prn: numpy array
+    #         Satellite of each LoS
+
+    # Returns
+    # =======
+    # Elev, Azim: numpy array
+    #         Elevation and azimuth of each LoS [deg]. Satellites
+    #         without orbits are placed at the nadir
+
+    # Receiver position and local frame (East, North, Up)
+    RcvrPos = np.array(Rcvr[RcvrIdx["XYZ"]])
+    Lon = np.radians(float(Rcvr[RcvrIdx["LON"]]))
+    Lat = np.radians(float(Rcvr[RcvrIdx["LAT"]]))
+    East = np.array([-np.sin(Lon), np.cos(Lon), 0.0])
+    North = np.array([-np.sin(Lat) * np.cos(Lon), -np.sin(Lat) * np.sin(Lon),
+    np.cos(Lat)])
+    Up = np.array([np.cos(Lat) * np.cos(Lon), np.cos(Lat) * np.sin(Lon),
+    np.sin(Lat)])
+
+    # Epochs since the origin of the orbits
+    Time = np.asarray(Sod, dtype=float)
+    for DayYear, DayDoy in set(zip(np.asarray(Year).tolist(),
+    np.asarray(Doy).tolist())):
+        DayJd = convertYearMonthDay2JulianDay(DayYear, 1, 1) + DayDoy - 1
+        Time = np.where((Year == DayYear) & (Doy == DayDoy),
+        Time + (DayJd - Orbits["JD"]) * Const.S_IN_D, Time)
+
+    # Loop over satellites
+    Elev = np.full(len(Time), NadirElev)
+    Azim = np.zeros(len(Time))
+    SatLabels = np.char.add(np.asarray(Constel).astype(str),
+    np.char.zfill(np.asarray(Prn).astype(str), 2))
+    for SatLabel in np.unique(SatLabels):
+        Rows = (SatLabels == SatLabel).nonzero()[0]
+
+        # Position at the transmission time: one iteration on the
+        # travel time is enough
+        SatPos = interpolateSp3Pos(Orbits, SatLabel, Time[Rows])
+        Tau = np.linalg.norm(SatPos - RcvrPos, axis=1) / Const.SPEED_OF_LIGHT
+        SatPos = interpolateSp3Pos(Orbits, SatLabel, Time[Rows] - Tau)
+
+        # Earth rotation during the travel time
+        Theta = Const.OMEGA_EARTH * Tau
+        LoS = np.column_stack((
+            SatPos[:, 0] * np.cos(Theta) + SatPos[:, 1] * np.sin(Theta),
+            -SatPos[:, 0] * np.sin(Theta) + SatPos[:, 1] * np.cos(Theta),
+            SatPos[:, 2])) - RcvrPos
+        LoS /= np.linalg.norm(LoS, axis=1)[:, None]
+
+        # Elevation and azimuth in the local frame
+        Valid = ~np.isnan(LoS[:, 0])
+        Elev[Rows[Valid]] = np.degrees(np.arcsin(LoS[Valid] @ Up))
+        Azim[Rows[Valid]] = np.degrees(np.arctan2(LoS[Valid] @ East,
+        LoS[Valid] @ North)) % 360.0
+
+    # End of for SatLabel in np.unique(SatLabels):
+
+    return Elev, Azim
+
+# End of getSp3Geometry()
+
+
+########################################################################
+# END OF ORBITS MODULE
+########################################################################
@@ -16,10 +16,15 @@
 # -----------------------------------------------------------------
 #
 # Usage:
-#   Petrus.py $SCEN_PATH
+#   Petrus.py $SCEN_PATH [--resume] [--follow] [--jobs N]
+#   (--jobs runs the receivers and days in N processes at once, each
+#   one as "Petrus.py $SCEN_PATH --job $RCVR $FIRST_JD $LAST_JD")
 ########################################################################
 
 import sys, os
+import time
+from functools import partial
+import numpy as np
 
 # Update Path to reach COMMON
 Common = os.path.dirname(
@@ -35,11 +40,60 @@ from InputOutput import readConf
 from InputOutput import processConf
 from InputOutput import readRcvr
 from InputOutput import createOutputFile
-from InputOutput import readObsEpoch
+from InputOutput import PreproAsyncWriter
+from InputOutput import PreproCompression
+from InputOutput import reportPreproWriter
+from InputOutput import readObsFile
+from InputOutput import iterObsEpochs
+from InputOutput import readObsEpochs
+from InputOutput import findObsFile
+from InputOutput import findObsFragments
+from InputOutput import mergeObsEpochs
+from InputOutput import findRinexFile
+from InputOutput import readRinexObsFile
+from InputOutput import getZenithGeometry
+from InputOutput import RcvrIdx
+from InputOutput import buildObsFilter
+from InputOutput import openObsFile
+from InputOutput import reportObsDecompression
 from InputOutput import generatePreproFile
-from InputOutput import PreproHdr
-from InputOutput import CSNEPOCHS
+from InputOutput import createParquetOutput
+from InputOutput import generatePreproParquet
+from InputOutput import flushParquetOutput
+from InputOutput import PreproParquetDirFmt
+from InputOutput import getPreproLayout
+from InputOutput import ObsDtype
+from InputOutput import FLAG, VALUE
+from InputOutput import NavSolutionConst, REJECTION_CAUSE
+from ObsCache import getObsCacheDir
+from Orbits import getSp3Dir
+from Orbits import readSp3Orbits
+from Orbits import getSp3Geometry
+from ObsCache import readObsFileCached
 from Preprocessing import runPreProcMeas
+from Preprocessing import runPreProcMeasVector
+from Preprocessing import runPreProcMeasBatch
+from Preprocessing import initPreproState
+from Preprocessing import shiftPreproState
+from Checkpoint import getCheckpointDir
+from Checkpoint import getCheckpointFile
+from Checkpoint import writeCheckpoint
+from Checkpoint import readCheckpoint
+from Checkpoint import reopenOutputFile
+from Checkpoint import syncOutputFile
+from Follow import followObsEpochs
+from Follow import initLatencyHist
+from Follow import updateLatencyHist
+from Follow import writeLatencyFile
+from ArrowSink import createArrowSink
+from ArrowSink import publishPreproArrow
+from ArrowSink import flushArrowSink
+from ArrowSink import closeArrowSink
+from ArrowSink import ArrowStreamFmt
+from Jobs import getPetrusJobs
+from Jobs import runPetrusJobs
+from Kernels import setKernelBackend
+from Kernels import getKernelReport
 # from PreprocessingPlots import generatePreproPlots
 from COMMON.Dates import convertJulianDay2YearMonthDay
 from COMMON.Dates import convertYearMonthDay2Doy
@@ -49,19 +103,49 @@ from COMMON.Dates import convertYearMonthDay2Doy
 #----------------------------------------------------------------------
 
 def displayUsage():
-    sys.stderr.write("ERROR: Please provide path to SCENARIO as a unique argument\n")
+    sys.stderr.write("ERROR: Please provide path to SCENARIO and, "\
+        "optionally, --resume to go on from the last checkpoints, "\
+        "--follow to follow the OBS files while they grow "\
+        "and/or --jobs N to run the receivers and days in N processes\n")
+
+def readOptions(Args):
+    # Read the command line options, or display the usage and exit
+    Options = {"--resume": False, "--follow": False, "--jobs": None, 
+    "--job": None}
+    i = 0
+    while i < len(Args):
+        Option = Args[i]
+        if Option in ["--resume", "--follow"] and not Options[Option]:
+            Options[Option] = True
+        elif Option == "--jobs" and Options[Option] is None and \
+            i + 1 < len(Args) and Args[i + 1].isdigit() and int(Args[i + 1]) > 0:
+            Options[Option] = int(Args[i + 1])
+            i = i + 1
+        elif Option == "--job" and Options[Option] is None and \
+            i + 3 < len(Args) and Args[i + 2].isdigit() and Args[i + 3].isdigit():
+            Options[Option] = [Args[i + 1], int(Args[i + 2]), int(Args[i + 3])]
+            i = i + 3
+        else:
+            displayUsage()
+            sys.exit()
+        i = i + 1
+
+    return Options
 
 #######################################################
 # MAIN BODY
 #######################################################
 
 # Check InputOutput Arguments
-if len(sys.argv) != 2:
+if len(sys.argv) < 2:
     displayUsage()
     sys.exit()
 
 # Extract the arguments
 Scen = sys.argv[1]
+Options = readOptions(sys.argv[2:])
+Resume = Options["--resume"]
+Follow = Options["--follow"]
 
 # Select the Configuratiun file name
 CfgFile = Scen + '/CFG/petrus.cfg'
@@ -73,6 +157,23 @@ Conf = readConf(CfgFile)
 # Process Configuration Parameters
 Conf = processConf(Conf)
 
+# In follow mode, the epochs are preprocessed as soon as they arrive
+if Follow:
+    if Conf["OBS_FORMAT"] != "OBS":
+        sys.stderr.write("ERROR: Only OBS files can be followed\n")
+        sys.exit(-1)
+    if Conf["PREPRO_ENGINE"] == "BATCH":
+        print("WARNING: BATCH engine cannot follow the OBS files: using VECTOR")
+        Conf["PREPRO_ENGINE"] = "VECTOR"
+
+# Only GPS is preprocessed: the Galileo satellites are rejected
+if "E" in NavSolutionConst[Conf["NAV_SOLUTION"]]:
+    print("WARNING: Galileo satellites are not preprocessed: they are "\
+        "rejected as NOT_PREPROCESSED (%d)" % REJECTION_CAUSE["NOT_PREPROCESSED"])
+
+# Get the layout of the PREPRO OBS files
+PreproLayout = getPreproLayout(Conf)
+
 # Select the RCVR Positions file name
 RcvrFile = Scen + '/INP/RCVR/' + Conf["RCVR_FILE"]
 
@@ -84,114 +185,373 @@ print( '------------------------------------')
 print( '--> RUNNING PETRUS:')
 print( '------------------------------------')
 
+# Run the receivers and days as independent jobs, if requested
+if Options["--jobs"] is not None:
+    Failed = runPetrusJobs(Scen, Conf, getPetrusJobs(Conf, RcvrInfo, Follow), 
+    Options["--jobs"], [Option for Option in ["--resume", "--follow"] \
+        if Options[Option]])
+
+    print( '\n------------------------------------')
+    print( '--> END OF PETRUS ANALYSIS')
+    print( '------------------------------------')
+
+    if len(Failed) > 0:
+        sys.stderr.write("ERROR: %d jobs failed: %s\n" % 
+        (len(Failed), " ".join(Failed)))
+        sys.exit(-1)
+    sys.exit()
+
+# Select the receivers and days to process: all of them, or the ones
+# of the job
+Rcvrs = list(RcvrInfo.keys())
+IniJd, EndJd = Conf["INI_DATE_JD"], Conf["END_DATE_JD"]
+if Options["--job"] is not None:
+    if Options["--job"][0] not in RcvrInfo:
+        sys.stderr.write("ERROR: Unknown receiver %s\n" % Options["--job"][0])
+        sys.exit(-1)
+    Rcvrs = [Options["--job"][0]]
+    IniJd, EndJd = Options["--job"][1], Options["--job"][2]
+
+# Select the backend of the preprocessing kernels
+if setKernelBackend(Conf["PREPRO_KERNELS"]) == "PYTHON" and \
+    Conf["PREPRO_ENGINE"] == "VECTOR":
+    print("WARNING: VECTOR engine is not faster than SCALAR without "\
+        "PREPRO_KERNELS NUMBA")
+for Line in getKernelReport():
+    print("INFO: " + Line)
+
 # Loop over RCVRs
 #-----------------------------------------------------------------------
-for Rcvr in RcvrInfo.keys():
+for Rcvr in Rcvrs:
     # Display Message
     print( '\n***-----------------------------***')
     print( '*** Processing receiver: ' + Rcvr + '   ***')
     print( '***-----------------------------***')
 
+    # Build the OBS filter, so that the OBS readers deliver only
+    # what the preprocessing needs
+    ObsFilter = buildObsFilter(Conf, RcvrInfo[Rcvr])
+
+    # Get the last checkpoint of the receiver, if resuming
+    CheckpointFile = getCheckpointFile(getCheckpointDir(Scen), Rcvr)
+    Checkpoint = None
+    if Resume:
+        Checkpoint, CheckpointState = readCheckpoint(CheckpointFile, Conf)
+
+    # Preprocessing information of the satellites at the end of the
+    # previous day
+    PrevPreproState = None
+    PrevJd = None
+
     # Loop over Julian Days in simulation
     #-----------------------------------------------------------------------
-    for Jd in range(Conf["INI_DATE_JD"], Conf["END_DATE_JD"] + 1):
+    for Jd in range(IniJd, EndJd + 1):
         # Compute Year, Month and Day in order to build input file name
         Year, Month, Day = convertJulianDay2YearMonthDay(Jd)
         
         # Compute the Day of Year (DoY)
         Doy = convertYearMonthDay2Doy(Year, Month, Day)
 
+        # Skip the days already processed, if resuming
+        ResumeSod = None
+        if Checkpoint is not None and Jd <= Checkpoint["JD"]:
+            if Jd < Checkpoint["JD"] or Checkpoint["DAY_DONE"] == 1:
+                print("INFO: Day of Year %d already processed: skipped" % Doy)
+                if Jd == Checkpoint["JD"]:
+                    PrevPreproState = CheckpointState
+                    PrevJd = Jd
+                continue
+
+            # Go on from the last epoch processed of the day
+            ResumeSod = Checkpoint["SOD"]
+
         # Display Message
         print( '\n*** Processing Day of Year: ' + str(Doy) + ' ... ***')
 
-        # Define the full path and name to the OBS INFO file to read
-        ObsFile = Scen + \
-            '/INP/OBS/' + "OBS_%s_Y%02dD%03d.dat" % \
+        # Define the full path and name to the OBS file to follow, 
+        # which may not exist yet, and to the one of the next day
+        if Follow:
+            ObsFile = Scen + '/INP/OBS/' + "OBS_%s_Y%02dD%03d.dat" % \
                 (Rcvr, Year % 100, Doy)
+            NextYear, NextMonth, NextDay = convertJulianDay2YearMonthDay(Jd + 1)
+            NextObsFile = Scen + '/INP/OBS/' + "OBS_%s_Y%02dD%03d.dat" % \
+                (Rcvr, NextYear % 100, 
+                convertYearMonthDay2Doy(NextYear, NextMonth, NextDay))
+
+        # Define the full path and name to the RINEX file to read
+        elif Conf["OBS_FORMAT"] == "RINEX":
+            ObsFile = findRinexFile(Scen + '/INP/OBS', Rcvr, Year, Doy)
+
+            # Get ELEV and AZIM from the SP3 orbits of the day
+            Orbits = readSp3Orbits(getSp3Dir(Scen), Year, Doy)
+            if Orbits is not None:
+                GeomProvider = partial(getSp3Geometry, Orbits, RcvrInfo[Rcvr])
+
+            # Without orbits, all the satellites are placed at the
+            # zenith: the mask angle and the number of channels could
+            # not select them
+            elif RcvrInfo[Rcvr][RcvrIdx["MASK"]] > 0 or \
+                Conf["NCHANNELS_GPS"] < Const.MAX_NUM_SATS_CONSTEL:
+                sys.stderr.write("ERROR: No SP3 file for %s Y%02dD%03d in %s: "\
+                    "ELEV and AZIM are needed to apply the mask angle (%g deg) "\
+                    "and the number of channels (%d)\n" % 
+                    (Rcvr, Year % 100, Doy, getSp3Dir(Scen), 
+                    RcvrInfo[Rcvr][RcvrIdx["MASK"]], Conf["NCHANNELS_GPS"]))
+                sys.exit(-1)
+
+            else:
+                print("WARNING: No SP3 file for %s: ELEV and AZIM set to "\
+                    "the zenith" % ObsFile)
+                GeomProvider = getZenithGeometry
+
+        # Define the full path and name to the OBS INFO file to read
+        # (or to its compressed variant)
+        else:
+            ObsFile = findObsFile(Scen + \
+                '/INP/OBS/' + "OBS_%s_Y%02dD%03d.dat" % \
+                    (Rcvr, Year % 100, Doy))
+
+        # If there is no whole OBS file, look for its fragments
+        ObsFragments = []
+        if Conf["OBS_FORMAT"] == "OBS" and not Follow and not os.path.exists(ObsFile):
+            ObsFragments = findObsFragments(ObsFile)
 
         # If Preprocessing outputs are activated
         if Conf["PREPRO_OUT"] == 1:
             # Define the full path and name to the output PREPRO OBS file
+            # (compressed, if configured)
             PreproObsFile = Scen + \
                 '/OUT/PPVE/' + "PREPRO_OBS_%s_Y%02dD%03d.dat" % \
-                    (Rcvr, Year % 100, Doy)
-
-            # Create output file
-            fpreprobs = createOutputFile(PreproObsFile, PreproHdr)
+                    (Rcvr, Year % 100, Doy) + \
+                        PreproCompression[Conf["PREPRO_COMPRESS"][0]]
+
+            # Create output file, or go on writing it if resuming
+            if ResumeSod is not None:
+                fpreprobs = reopenOutputFile(PreproObsFile, Checkpoint["OUT_POS"],
+                Conf["PREPRO_COMPRESS"][1])
+            else:
+                fpreprobs = createOutputFile(PreproObsFile, PreproLayout["HDR"], 
+                Conf["PREPRO_COMPRESS"][1])
+
+            # Write it from a background thread, if configured. When
+            # following, every epoch is flushed as soon as it is written
+            if Conf["PREPRO_WRITER"][FLAG] == 1:
+                fpreprobs = PreproAsyncWriter(fpreprobs, 
+                Conf["PREPRO_WRITER"][VALUE], Follow)
+
+        # If the Parquet outputs are activated, open the partition of
+        # the receiver and day
+        if Conf["PREPRO_PARQUET"][FLAG] == 1:
+            ParquetOut = createParquetOutput(Scen + '/OUT/PPVE/' + \
+                PreproParquetDirFmt % (Rcvr, Year % 100, Doy), 
+                Conf["PREPRO_PARQUET"][VALUE], ResumeSod)
+
+        # If the Arrow outputs are activated, open the Arrow stream of
+        # the receiver and day
+        if Conf["PREPRO_ARROW"][0] != "NONE":
+            ArrowOut = createArrowSink(Scen + '/OUT/PPVE/' + \
+                ArrowStreamFmt % (Rcvr, Year % 100, Doy), 
+                Conf["PREPRO_ARROW"][0], Conf["PREPRO_ARROW"][1], ResumeSod)
 
         # Initialize Variables
         EndOfFile = False
         ObsInfo = [None]
-        PrevPreproObsInfo = {}
-        for prn in range(1, Const.MAX_NUM_SATS_CONSTEL + 1):
-            PrevPreproObsInfo["G%02d" % prn] = {
-            "L1_n_1": 0.0,           # t-1 Carrier Phase in L1
-            "L1_n_2": 0.0,           # t-2 Carrier Phase in L1
-            "L1_n_3": 0.0,           # t-3 Carrier Phase in L1
-            "t_n_1": 0.0,            # t-1 epoch
-            "t_n_2": 0.0,            # t-2 epoch
-            "t_n_3": 0.0,            # t-3 epoch
-            "CsBuff": [0] * \
-int(Conf["MIN_NCS_TH"][CSNEPOCHS]),  # Number of consecutive epochs for CS
-            "CsIdx": 0,              # Index of CS detector buffer
-            "ResetHatchFilter": 1,   # Flag to reset Hatch filter
-            "Ksmooth": 0,            # Hatch filter K
-            "PrevEpoch": 86400,      # Previous SoD
-            "PrevL1": 0.0,           # Previous L1
-            "PrevSmoothC1": 0.0,     # Previous Smoothed C1
-            "PrevRangeRateL1": 0.0,  # Previous Code Rate
-            "PrevPhaseRateL1": 0.0,  # Previous Phase Rate
-            "PrevGeomFree": 0.0,     # Previous Geometry-Free Observable
-            "PrevGeomFreeEpoch": 0.0,# Previous Geometry-Free Observable
-            "PrevRej": 0,            # Previous Rejection flag
-                                     # ...
-        } # End of SatPreproObsInfo
-
-        # Open OBS file
-        with open(ObsFile, 'r') as fobs:
-            # Read header line of OBS file
-            fobs.readline()
-
-            # LOOP over all Epochs of UPOS file
-            # ----------------------------------------------------------
-            while not EndOfFile:
-
-                # If ObsInfo is not empty
-                if ObsInfo != []:
-
-                    # Read Only One Epoch
-                    ObsInfo = readObsEpoch(fobs)
-
-                    # If ObsInfo is empty, exit loop
-                    if ObsInfo == []:
-                        break
-
-                    # Preprocess OBS measurements
-                    # ----------------------------------------------------------
-                    PreproObsInfo = runPreProcMeas(Conf, RcvrInfo[Rcvr], ObsInfo, PrevPreproObsInfo)
-
-                    # If PREPRO outputs are requested
-                    if Conf["PREPRO_OUT"] == 1:
-                        # Generate output file
-                        generatePreproFile(fpreprobs, PreproObsInfo)
-
-                    # To be continued in next WP...
-
-                # End of if ObsInfo != []:
-
+        ObsData = None
+        ReadTime = 0.0
+
+        # Initialize the preprocessing information of the satellites:
+        # from the checkpoint, if resuming, or from the end of the
+        # previous day, if it is carried across days (always when
+        # following the OBS files)
+        if ResumeSod is not None:
+            PrevPreproState = CheckpointState
+            print("INFO: Resuming Day of Year %d after SoD %d" % (Doy, ResumeSod))
+        elif (Conf["CARRY_PREPRO_STATE"] == 1 or Follow) and \
+            PrevPreproState is not None:
+            shiftPreproState(PrevPreproState, -Const.S_IN_D * (Jd - PrevJd))
+        else:
+            PrevPreproState = initPreproState(Conf)
+
+        # Next periodic checkpoint
+        NextCheckpointSod = (ResumeSod if ResumeSod is not None else 0) + \
+            Conf["CHECKPOINT"][VALUE]
+
+        # Read the OBS file (or only the configured SoD window)
+        if Follow:
+            # Epoch by epoch while it grows, up to the end of the day
+            print("INFO: Following file: %s..." % ObsFile)
+            FollowInfo = {}
+            LatencyHist = initLatencyHist()
+            ObsEpochs = followObsEpochs(ObsFile, NextObsFile, ObsFilter, 
+            Conf, FollowInfo)
+
+        elif Conf["OBS_FORMAT"] == "RINEX":
+            # Directly from RINEX in one pass
+            ObsData, ObsEpochIdx = readRinexObsFile(ObsFile, GeomProvider, 
+            ObsFilter, Conf["GAL_FREQ"])
+            ObsEpochs = iterObsEpochs(ObsData, ObsEpochIdx)
+
+        elif len(ObsFragments) > 0:
+            # Merging the fragments epoch by epoch with bounded memory
+            print("INFO: Merging %d OBS fragments of %s" % 
+            (len(ObsFragments), ObsFile))
+            ffrags = [openObsFile(Fragment) for Fragment in ObsFragments]
+            ObsEpochs = mergeObsEpochs([readObsEpochs(ffrag, ObsFilter) 
+            for ffrag in ffrags])
+
+        elif Conf["OBS_READER"] == "STREAM":
+            # Epoch by epoch with bounded memory
+            fobs = openObsFile(ObsFile)
+            ObsEpochs = readObsEpochs(fobs, ObsFilter)
+
+        elif Conf["OBS_CACHE"][FLAG] == 1:
+            # Through the parsed OBS data cache
+            ObsData, ObsEpochIdx = readObsFileCached(getObsCacheDir(Scen), 
+            ObsFile, Conf["OBS_CACHE"][VALUE], ObsFilter)
+            ObsEpochs = iterObsEpochs(ObsData, ObsEpochIdx)
+
+        else:
+            # In one pass
+            ObsData, ObsEpochIdx = readObsFile(ObsFile, ObsFilter)
+            ObsEpochs = iterObsEpochs(ObsData, ObsEpochIdx)
+
+        # In batch mode, preprocess the whole day at once
+        # ----------------------------------------------------------
+        if Conf["PREPRO_ENGINE"] == "BATCH":
+            # Gather the epochs, if they are read one by one
+            if ObsData is None:
+                StartTime = time.perf_counter()
+                ObsEpochs = list(ObsEpochs)
+                if len(ObsEpochs) != 0:
+                    ObsData = np.concatenate(ObsEpochs)
                 else:
-                    EndOfFile = True
-
-                # End of if ObsInfo != []:
-                
-            # End of while not EndOfFile:
-    
-        # End of with open(ObsFile, 'r') as f:
+                    ObsData = np.zeros(0, dtype=ObsDtype)
+                ReadTime = ReadTime + time.perf_counter() - StartTime
+
+            # Skip the epochs already processed, if resuming
+            if ResumeSod is not None:
+                ObsData = ObsData[ObsData["SOD"] > ResumeSod]
+
+            # Preprocess OBS measurements
+            PreproObsInfo = runPreProcMeasBatch(Conf, RcvrInfo[Rcvr], 
+            ObsData, PrevPreproState)
+
+            # If PREPRO outputs are requested
+            if Conf["PREPRO_OUT"] == 1:
+                # Generate output file
+                generatePreproFile(fpreprobs, PreproObsInfo, PreproLayout)
+            if Conf["PREPRO_PARQUET"][FLAG] == 1:
+                generatePreproParquet(ParquetOut, PreproObsInfo)
+            if Conf["PREPRO_ARROW"][0] != "NONE":
+                publishPreproArrow(ArrowOut, PreproObsInfo)
+
+            # Skip the epoch loop
+            EndOfFile = True
+
+        # LOOP over all Epochs of OBS file
+        # ----------------------------------------------------------
+        while not EndOfFile:
+
+            # If ObsInfo is not empty
+            if len(ObsInfo) != 0:
+
+                # Get Only One Epoch
+                StartTime = time.perf_counter()
+                ObsInfo = next(ObsEpochs, [])
+                ReadTime = ReadTime + time.perf_counter() - StartTime
+
+                # If ObsInfo is empty, exit loop
+                if len(ObsInfo) == 0:
+                    break
+
+                # Skip the epochs already processed, if resuming
+                Sod = ObsInfo["SOD"][0]
+                if ResumeSod is not None and Sod <= ResumeSod:
+                    continue
+
+                # Preprocess OBS measurements
+                # ----------------------------------------------------------
+                if Conf["PREPRO_ENGINE"] == "VECTOR":
+                    PreproObsInfo = runPreProcMeasVector(Conf, RcvrInfo[Rcvr], 
+                    ObsInfo, PrevPreproState)
+                else:
+                    PreproObsInfo = runPreProcMeas(Conf, RcvrInfo[Rcvr], 
+                    ObsInfo, PrevPreproState)
+
+                # If PREPRO outputs are requested
+                if Conf["PREPRO_OUT"] == 1:
+                    # Generate output file
+                    generatePreproFile(fpreprobs, PreproObsInfo, PreproLayout)
+                if Conf["PREPRO_PARQUET"][FLAG] == 1:
+                    generatePreproParquet(ParquetOut, PreproObsInfo)
+                if Conf["PREPRO_ARROW"][0] != "NONE":
+                    publishPreproArrow(ArrowOut, PreproObsInfo)
+
+                # In follow mode, deliver the epoch right away and
+                # measure its latency since it was read
+                if Follow:
+                    if Conf["PREPRO_OUT"] == 1 and Conf["PREPRO_WRITER"][FLAG] == 0:
+                        fpreprobs.flush()
+                    updateLatencyHist(LatencyHist, 
+                    time.perf_counter() - FollowInfo["INGEST_TIME"])
+
+                # Write the checkpoint periodically
+                if Conf["CHECKPOINT"][FLAG] == 1 and Sod >= NextCheckpointSod:
+                    if Conf["PREPRO_PARQUET"][FLAG] == 1:
+                        flushParquetOutput(ParquetOut)
+                    if Conf["PREPRO_ARROW"][0] != "NONE":
+                        flushArrowSink(ArrowOut)
+                    writeCheckpoint(CheckpointFile, PrevPreproState, Jd, Sod,
+                    syncOutputFile(fpreprobs) if Conf["PREPRO_OUT"] == 1 else 0, 0)
+                    NextCheckpointSod = Sod + Conf["CHECKPOINT"][VALUE]
+
+                # To be continued in next WP...
+
+            # End of if len(ObsInfo) != 0:
+
+            else:
+                EndOfFile = True
+
+            # End of if len(ObsInfo) != 0:
+            
+        # End of while not EndOfFile:
+
+        # Close OBS files, if they were read epoch by epoch
+        if len(ObsFragments) > 0:
+            for ffrag in ffrags:
+                ffrag.close()
+
+        elif Conf["OBS_FORMAT"] == "OBS" and Conf["OBS_READER"] == "STREAM" and \
+            not Follow:
+            reportObsDecompression(ObsFile, fobs, ReadTime)
+            fobs.close()
+
+        # Write the latency histogram of the day
+        if Follow:
+            if not os.path.exists(Scen + '/OUT/PPVE'):
+                os.makedirs(Scen + '/OUT/PPVE')
+            writeLatencyFile(Scen + '/OUT/PPVE/' + "LATENCY_%s_Y%02dD%03d.dat" % \
+                (Rcvr, Year % 100, Doy), LatencyHist)
+
+        # Write the last Parquet part file of the day
+        if Conf["PREPRO_PARQUET"][FLAG] == 1:
+            flushParquetOutput(ParquetOut)
+
+        # End the Arrow stream of the day
+        if Conf["PREPRO_ARROW"][0] != "NONE":
+            closeArrowSink(ArrowOut)
+
+        # Write the checkpoint of the whole day
+        if Conf["CHECKPOINT"][FLAG] == 1:
+            writeCheckpoint(CheckpointFile, PrevPreproState, Jd, Const.S_IN_D,
+            syncOutputFile(fpreprobs) if Conf["PREPRO_OUT"] == 1 else 0, 1)
+        PrevJd = Jd
 
         # If PREPRO outputs are requested
         if Conf["PREPRO_OUT"] == 1:
             # Close PREPRO output file
             fpreprobs.close()
+            reportPreproWriter(PreproObsFile, fpreprobs)
 
             # Display Message
             print("INFO: Reading file: %s and generating PREPRO figures..." %
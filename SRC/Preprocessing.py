@@ -28,15 +28,297 @@ sys.path.insert(0, Common)
 from collections import OrderedDict
 from COMMON import GnssConstants as Const
 from InputOutput import RcvrIdx, ObsIdx, REJECTION_CAUSE
+from InputOutput import NavSolutionConst
+from InputOutput import PreproObsDtype
 from InputOutput import FLAG, VALUE, TH, CSNEPOCHS
 import numpy as np
 from COMMON.Iono import computeIonoMappingFunction
+from Kernels import extrapolateL1
+from Kernels import runPreproEpoch, runPreproSat, runPreproArc
 
-# Preprocessing internal functions
+# Satellite state store
 #-----------------------------------------------------------------------
+# The preprocessing information of all the satellites is kept as 
+# contiguous arrays indexed by a dense satellite index (PRN - 1),
+# so that it can be read and written for several satellites at once
 
+# Constellation of the satellites in the preprocessing state.
+# Only GPS L1 C/A is preprocessed: the thresholds of the checks and
+# the Hatch filter are defined for it. The satellites of the other
+# constellations in NAV_SOLUTION are rejected as NOT_PREPROCESSED
+PreproStateConst = "G"
 
-def runPreProcMeas(Conf, Rcvr, ObsInfo, PrevPreproObsInfo):
+# Number of epochs in the L1 history (cycle slips prediction)
+PhaseHistLen = 3
+
+# Rejection causes handed to the kernels, in the order of REJECTION_CAUSE
+PreproCauses = np.array(list(REJECTION_CAUSE.values()))
+
+def initPreproState(Conf):
+
+    # Purpose: initialize the preprocessing information of all the
+    #          satellites
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+
+    # Returns
+    # =======
+    # PrevPreproState: dict
+    #         Preprocessing information: one array per field with
+    #         one element per satellite
+    #         PrevPreproState["PrevC1"][SatIdx]
+
+    NSats = Const.MAX_NUM_SATS_CONSTEL
+    CsNEpochs = int(Conf["MIN_NCS_TH"][CSNEPOCHS])
+
+    PrevPreproState = {
+    "L1Hist": np.zeros((NSats, PhaseHistLen)), # Ring buffer of last Carrier Phases in L1
+    "tHist": np.zeros((NSats, PhaseHistLen)),  # Ring buffer of last epochs
+    "PhaseHistIdx": np.zeros(NSats, dtype=np.int32), # Next slot (the oldest) of L1 history
+    "NPhaseHist": np.zeros(NSats, dtype=np.int32),   # Number of epochs in L1 history
+    "CsBuff": np.zeros((NSats, CsNEpochs), dtype=np.int8), # Ring buffer of CS flags
+    "CsIdx": np.zeros(NSats, dtype=np.int32),  # Next slot of CS flags buffer
+    "CsFull": np.zeros(NSats, dtype=bool),     # CS flags buffer filled since reset
+    "CsNFlags": np.zeros(NSats, dtype=np.int32), # Number of CS flags set in buffer
+    "ResetHatchFilter": np.ones(NSats, dtype=np.int8), # Flag to reset Hatch filter
+    "Ksmooth": np.zeros(NSats),                # Hatch filter K
+    "DivCount": np.zeros(NSats, dtype=np.int32), # Epochs with Hatch filter diverged
+    "PrevEpoch": np.full(NSats, 86400.0),      # Previous SoD
+    "PrevC1": np.zeros(NSats),                 # Previous C1
+    "PrevL1": np.zeros(NSats),                 # Previous L1
+    "PrevSmoothC1": np.zeros(NSats),           # Previous Smoothed C1
+    "PrevRangeRateL1": np.zeros(NSats),        # Previous Code Rate
+    "PrevPhaseRateL1": np.zeros(NSats),        # Previous Phase Rate
+    } # End of PrevPreproState
+
+    return PrevPreproState
+
+# End of initPreproState()
+
+
+def getPreproSatIdx(ObsInfo):
+
+    # Purpose: get the index of the satellites of an epoch in the 
+    #          preprocessing state
+
+    # Parameters
+    # ==========
+    # ObsInfo: numpy structured array
+    #         OBS info for current epoch (ObsDtype)
+
+    # Returns
+    # =======
+    # SatIdx: numpy array
+    #         Index of each satellite, or -1 if it is not in the
+    #         preprocessing state
+
+    return np.where((ObsInfo["CONST"] == PreproStateConst) & \
+        (ObsInfo["PRN"] >= 1) & (ObsInfo["PRN"] <= Const.MAX_NUM_SATS_CONSTEL),
+        ObsInfo["PRN"] - 1, -1)
+
+# End of getPreproSatIdx()
+
+
+def shiftPreproState(PrevPreproState, Shift):
+
+    # Purpose: refer the epochs of the preprocessing information to 
+    #          another day, so that the satellites tracked at the end
+    #          of a day go on being tracked the next one
+
+    # Parameters
+    # ==========
+    # PrevPreproState: dict
+    #         Preprocessing information of all the satellites
+    # Shift: float
+    #         Seconds added to the epochs (e.g. -86400 for the next day)
+
+    # Returns
+    # =======
+    # Nothing
+
+    PrevPreproState["PrevEpoch"] += Shift
+    PrevPreproState["tHist"] += Shift
+
+# End of shiftPreproState()
+
+
+def predictL1(Sod, PrevPreproState, SatIdx):
+
+    # Purpose: predict the L1 carrier phase at the current epoch
+    #          from the three previous ones (Lagrange extrapolation,
+    #          valid for unevenly spaced epochs)
+
+    # Parameters
+    # ==========
+    # Sod: float or numpy array
+    #         Current epoch
+    # PrevPreproState: dict
+    #         Preprocessing information of all the satellites
+    # SatIdx: int or numpy array
+    #         Index of the satellites
+
+    # Returns
+    # =======
+    # L1Pred: float or numpy array
+    #         Predicted L1 carrier phase [cycles]
+
+    # Get t-1, t-2 and t-3 slots of the history ring buffer
+    Next = PrevPreproState["PhaseHistIdx"][SatIdx]
+    Slot1 = (Next + 2) % PhaseHistLen
+    Slot2 = (Next + 1) % PhaseHistLen
+
+    return extrapolateL1(Sod, 
+    PrevPreproState["tHist"][SatIdx, Slot1], 
+    PrevPreproState["tHist"][SatIdx, Slot2], 
+    PrevPreproState["tHist"][SatIdx, Next],
+    PrevPreproState["L1Hist"][SatIdx, Slot1], 
+    PrevPreproState["L1Hist"][SatIdx, Slot2], 
+    PrevPreproState["L1Hist"][SatIdx, Next])
+
+# End of predictL1()
+
+
+def pushCsFlag(PrevPreproState, SatIdx, CsFlag, CsNEpochs):
+
+    # Purpose: store the cycle slip flags of satellites in the buffer
+    #          of their last epochs
+
+    # Parameters
+    # ==========
+    # PrevPreproState: dict
+    #         Preprocessing information of all the satellites
+    # SatIdx: int or numpy array
+    #         Index of the satellites
+    # CsFlag: int or numpy array
+    #         Cycle slip flag of each satellite
+    # CsNEpochs: int
+    #         Number of consecutive epochs to confirm a cycle slip
+
+    # Returns
+    # =======
+    # CsConfirmed: bool or numpy array
+    #         True if flagged in all the last CsNEpochs epochs
+
+    # Overwrite the oldest flag, which only counts if the buffer was 
+    # already filled since the last reset
+    CsIdx = PrevPreproState["CsIdx"][SatIdx]
+    CsOld = PrevPreproState["CsBuff"][SatIdx, CsIdx] * PrevPreproState["CsFull"][SatIdx]
+    PrevPreproState["CsBuff"][SatIdx, CsIdx] = CsFlag
+    PrevPreproState["CsNFlags"][SatIdx] += CsFlag - CsOld
+
+    # Advance the buffer
+    CsIdx = (CsIdx + 1) % CsNEpochs
+    PrevPreproState["CsIdx"][SatIdx] = CsIdx
+    PrevPreproState["CsFull"][SatIdx] |= CsIdx == 0
+
+    return PrevPreproState["CsNFlags"][SatIdx] == CsNEpochs
+
+# End of pushCsFlag()
+
+
+def detectCycleSlips(Conf, PrevPreproState, SatIdx, Sod, L1):
+
+    # Purpose: check the cycle slips of several tracked satellites at
+    #          once: the L1 of those with three previous epochs is 
+    #          compared with its extrapolation, and the flags stored in
+    #          the buffer of their last epochs
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # PrevPreproState: dict
+    #         Preprocessing information of all the satellites
+    # SatIdx: numpy array
+    #         Index of the satellites (not starting a new arc nor
+    #         after a data gap)
+    # Sod: numpy array
+    #         Current epoch of each satellite
+    # L1: numpy array
+    #         L1 carrier phase of each satellite [cycles]
+
+    # Returns
+    # =======
+    # CsFlag: numpy array
+    #         True if the L1 departs from its prediction
+    # CsConfirmed: numpy array
+    #         True if flagged in all the last CsNEpochs epochs
+
+    CsFlag = np.zeros(len(SatIdx), dtype=bool)
+    CsConfirmed = np.zeros(len(SatIdx), dtype=bool)
+
+    # Number of consecutive epochs to declare a cycle slip
+    CsNEpochs = int(Conf["MIN_NCS_TH"][CSNEPOCHS])
+    if Conf["MIN_NCS_TH"][FLAG] != 1 or CsNEpochs <= 0:
+        return CsFlag, CsConfirmed
+
+    # Only the satellites with three previous epochs can be checked
+    CsRows = (PrevPreproState["NPhaseHist"][SatIdx] >= PhaseHistLen).nonzero()[0]
+    Idx = SatIdx[CsRows]
+
+    # Compare the L1 with its prediction from previous epochs
+    CsFlag[CsRows] = np.abs(L1[CsRows] - predictL1(Sod[CsRows], PrevPreproState, Idx)) > \
+        Conf["MIN_NCS_TH"][TH]
+
+    # Store the flags in the buffer of the last epochs
+    CsConfirmed[CsRows] = CsFlag[CsRows] & \
+        pushCsFlag(PrevPreproState, Idx, CsFlag[CsRows], CsNEpochs)
+
+    return CsFlag, CsConfirmed
+
+# End of detectCycleSlips()
+
+
+def runSatPreProcMeas(Conf, SatPreproObsInfo, PrevPreproState, SatIdx, 
+CycleSlip=None):
+
+    # Purpose: check the measurement of a satellite in view against its
+    #          previous ones (data gaps, cycle slips, rates) and smooth
+    #          it with the Hatch filter, updating the satellite 
+    #          preprocessing information
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # SatPreproObsInfo: dict or numpy structured array row
+    #         Preprocessed observations of the satellite at current 
+    #         epoch. Updated in place
+    # PrevPreproState: dict
+    #         Preprocessing information of all the satellites
+    # SatIdx: int
+    #         Index of the satellite
+    # CycleSlip: list
+    #         [CsFlag, CsConfirmed] of the satellite, if its cycle slips
+    #         were already checked (see detectCycleSlips)
+
+    # Returns
+    # =======
+    # Nothing
+
+    # Check the measurement and smooth it with the recursion shared
+    # by all the engines
+    RejectionCause, SmoothC1, Status, PhaseRate, RangeRate, PhaseRateStep, \
+        RangeRateStep = runPreproSat(PrevPreproState, SatIdx, 
+        SatPreproObsInfo["Sod"], SatPreproObsInfo["C1"], SatPreproObsInfo["L1"],
+        SatPreproObsInfo["L1Meters"], CycleSlip, getPreproSatParams(Conf))
+
+    SatPreproObsInfo["RejectionCause"] = int(RejectionCause)
+    SatPreproObsInfo["ValidL1"] = int(RejectionCause == 0)
+    SatPreproObsInfo["SmoothC1"] = float(SmoothC1)
+    SatPreproObsInfo["Status"] = int(Status)
+    SatPreproObsInfo["PhaseRateL1"] = float(PhaseRate)
+    SatPreproObsInfo["RangeRateL1"] = float(RangeRate)
+    SatPreproObsInfo["PhaseRateStepL1"] = float(PhaseRateStep)
+    SatPreproObsInfo["RangeRateStepL1"] = float(RangeRateStep)
+
+# End of runSatPreProcMeas()
+
+
+def runPreProcMeas(Conf, Rcvr, ObsInfo, PrevPreproState):
     
     # Purpose: preprocess GNSS raw measurements from OBS file
     #          and generate PREPRO OBS file with the cleaned,
@@ -65,13 +347,13 @@ def runPreProcMeas(Conf, Rcvr, ObsInfo, PrevPreproObsInfo):
     #         Configuration dictionary
     # Rcvr: list
     #         Receiver information: position, masking angle...
-    # ObsInfo: list
+    # ObsInfo: list or numpy structured array
     #         OBS info for current epoch
     #         ObsInfo[1][1] is the second field of the 
     #         second satellite
-    # PrevPreproObsInfo: dict
-    #         Preprocessed observations for previous epoch per sat
-    #         PrevPreproObsInfo["G01"]["C1"]
+    # PrevPreproState: dict
+    #         Preprocessing information of all the satellites
+    #         (see initPreproState)
 
     # Returns
     # =======
@@ -83,8 +365,17 @@ def runPreProcMeas(Conf, Rcvr, ObsInfo, PrevPreproObsInfo):
     # Initialize output
     PreproObsInfo = OrderedDict({})
 
+    # Index of each satellite in the preprocessing state
+    PreproSatIdx = {}
+
+    # Get the constellations of the navigation solution
+    NavConst = NavSolutionConst[Conf["NAV_SOLUTION"]]
+
     # Loop over satellites
     for SatObs in ObsInfo:
+        # Get satellite label
+        SatLabel = SatObs[ObsIdx["CONST"]] + "%02d" % int(SatObs[ObsIdx["PRN"]])
+
         # Initialize output info
         SatPreproObsInfo = {
             "Sod": 0.0,             # Second of day
@@ -116,28 +407,446 @@ def runPreProcMeas(Conf, Rcvr, ObsInfo, PrevPreproObsInfo):
 
         } # End of SatPreproObsInfo
 
-        # Get satellite label
-        SatLabel = SatObs[ObsIdx["CONST"]] + "%02d" % int(SatObs[ObsIdx["PRN"]])
-
         # Prepare outputs
         # Get SoD
         SatPreproObsInfo["Sod"] = float(SatObs[ObsIdx["SOD"]])
         # Get DoY
         SatPreproObsInfo["Doy"] = int(SatObs[ObsIdx["DOY"]])
         # Get Elevation
-        # ...
+        SatPreproObsInfo["Elevation"] = float(SatObs[ObsIdx["ELEV"]])
+        # Get Azimuth
+        SatPreproObsInfo["Azimuth"] = float(SatObs[ObsIdx["AZIM"]])
+
+        # Check Minimum Masking angle
+        # ----------------------------------------------------------
+        if SatPreproObsInfo["Elevation"] < Rcvr[RcvrIdx["MASK"]]:
+            # Reject satellite
+            SatPreproObsInfo["ValidL1"] = 0
+            SatPreproObsInfo["RejectionCause"] = REJECTION_CAUSE["MASKANGLE"]
+
+        # Reject satellites out of the navigation solution or
+        # without preprocessing information
+        elif SatObs[ObsIdx["CONST"]] not in NavConst or \
+            SatObs[ObsIdx["CONST"]] != PreproStateConst or \
+                not 1 <= int(SatObs[ObsIdx["PRN"]]) <= Const.MAX_NUM_SATS_CONSTEL:
+            SatPreproObsInfo["ValidL1"] = 0
+            SatPreproObsInfo["RejectionCause"] = REJECTION_CAUSE["NOT_PREPROCESSED"]
+
+        else:
+            PreproSatIdx[SatLabel] = int(SatObs[ObsIdx["PRN"]]) - 1
+
+            # Get measurements
+            SatPreproObsInfo["C1"] = float(SatObs[ObsIdx["C1"]])
+            SatPreproObsInfo["L1"] = float(SatObs[ObsIdx["L1"]])
+            SatPreproObsInfo["L1Meters"] = \
+                SatPreproObsInfo["L1"] * Const.GPS_L1_WAVE
+            SatPreproObsInfo["S1"] = float(SatObs[ObsIdx["S1"]])
+            SatPreproObsInfo["P2"] = float(SatObs[ObsIdx["P2"]])
+            SatPreproObsInfo["L2"] = float(SatObs[ObsIdx["L2"]])
+            SatPreproObsInfo["S2"] = float(SatObs[ObsIdx["S2"]])
+
+        # End of if SatPreproObsInfo["Elevation"] < Rcvr[RcvrIdx["MASK"]]:
 
         # Prepare output for the satellite
         PreproObsInfo[SatLabel] = SatPreproObsInfo
 
     # Limit the satellites to the Number of Channels
     # ----------------------------------------------------------
-    # ...
+    # Get the satellites in view (above the mask)
+    SatsInView = [SatLabel for SatLabel, SatPreproObsInfo in PreproObsInfo.items()
+    if SatPreproObsInfo["ValidL1"] == 1]
+
+    # If there are more satellites than channels
+    if len(SatsInView) > Conf["NCHANNELS_GPS"]:
+        # Sort them by elevation (keeping the order for equal elevations)
+        SatsInView.sort(key=lambda SatLabel: -PreproObsInfo[SatLabel]["Elevation"])
+
+        # Reject the lowest ones
+        for SatLabel in SatsInView[int(Conf["NCHANNELS_GPS"]):]:
+            PreproObsInfo[SatLabel]["ValidL1"] = 0
+            PreproObsInfo[SatLabel]["RejectionCause"] = REJECTION_CAUSE["NCHANNELS_GPS"]
+
+    # Satellites checked against their previous measurements
+    SatsChecked = []
+
+    # Loop over satellites
+    for SatLabel, SatPreproObsInfo in PreproObsInfo.items():
+        # Skip satellites already rejected
+        if SatPreproObsInfo["ValidL1"] == 0:
+            continue
+
+        # Check Minimum Carrier-To-Noise Ratio (CN0)
+        # ----------------------------------------------------------
+        if Conf["MIN_CNR"][FLAG] == 1 and \
+            SatPreproObsInfo["S1"] < Conf["MIN_CNR"][VALUE]:
+            SatPreproObsInfo["ValidL1"] = 0
+            SatPreproObsInfo["RejectionCause"] = REJECTION_CAUSE["MIN_CNR"]
+            continue
+
+        # Check Pseudo-Range Out of Range
+        # ----------------------------------------------------------
+        if Conf["MAX_PSR_OUTRNG"][FLAG] == 1 and \
+            SatPreproObsInfo["C1"] > Conf["MAX_PSR_OUTRNG"][VALUE]:
+            SatPreproObsInfo["ValidL1"] = 0
+            SatPreproObsInfo["RejectionCause"] = REJECTION_CAUSE["MAX_PSR_OUTRNG"]
+            continue
+
+        SatsChecked.append(SatLabel)
+
+    # End of for SatLabel, SatPreproObsInfo in PreproObsInfo.items():
+
+    # Check Cycle Slips of all the tracked satellites at once
+    # ----------------------------------------------------------
+    # (those not starting a new arc nor after a data gap)
+    SatIdx = np.array([PreproSatIdx[SatLabel] for SatLabel in SatsChecked], dtype=int)
+    Sod = np.array([PreproObsInfo[SatLabel]["Sod"] for SatLabel in SatsChecked])
+    L1 = np.array([PreproObsInfo[SatLabel]["L1"] for SatLabel in SatsChecked])
+    Tracked = ((PrevPreproState["ResetHatchFilter"][SatIdx] == 0) & \
+        (Sod - PrevPreproState["PrevEpoch"][SatIdx] <= \
+            max(Conf["HATCH_GAP_TH"], Conf["SAMPLING_RATE"]))).nonzero()[0]
+    CsFlag, CsConfirmed = detectCycleSlips(Conf, PrevPreproState, 
+    SatIdx[Tracked], Sod[Tracked], L1[Tracked])
+    CycleSlips = {SatsChecked[Row]: [CsFlag[i], CsConfirmed[i]] 
+    for i, Row in enumerate(Tracked.tolist())}
+
+    # Loop over satellites
+    for SatLabel in SatsChecked:
+        # Check the measurement against the previous ones and smooth it
+        runSatPreProcMeas(Conf, PreproObsInfo[SatLabel], PrevPreproState, 
+        PreproSatIdx[SatLabel], CycleSlips.get(SatLabel))
+
+    # End of for SatLabel in SatsChecked:
 
     return PreproObsInfo
 
 # End of function runPreProcMeas()
 
+
+# Vectorized preprocessing
+#-----------------------------------------------------------------------
+
+def initPreproObsInfo(Conf, Rcvr, ObsInfo):
+
+    # Purpose: initialize the preprocessed observations of the batch
+    #          engine and check Minimum Masking angle
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # Rcvr: list
+    #         Receiver information: position, masking angle...
+    # ObsInfo: numpy structured array
+    #         OBS info (ObsDtype)
+
+    # Returns
+    # =======
+    # PreproObsInfo: numpy structured array
+    #         Preprocessed observations, one row per row of ObsInfo
+    #         (PreproObsDtype)
+    # InView: numpy array
+    #         True for the rows above the masking angle of the
+    #         satellites of the navigation solution with 
+    #         preprocessing information
+
+    # Initialize output info
+    PreproObsInfo = np.zeros(len(ObsInfo), dtype=PreproObsDtype)
+
+    # Prepare outputs
+    PreproObsInfo["Sod"] = ObsInfo["SOD"]
+    PreproObsInfo["Doy"] = ObsInfo["DOY"]
+    PreproObsInfo["Const"] = ObsInfo["CONST"]
+    PreproObsInfo["Prn"] = ObsInfo["PRN"]
+    PreproObsInfo["Elevation"] = ObsInfo["ELEV"]
+    PreproObsInfo["Azimuth"] = ObsInfo["AZIM"]
+
+    # Check Minimum Masking angle
+    # ----------------------------------------------------------
+    InView = ObsInfo["ELEV"] >= Rcvr[RcvrIdx["MASK"]]
+    PreproObsInfo["RejectionCause"][~InView] = REJECTION_CAUSE["MASKANGLE"]
+
+    # Reject satellites out of the navigation solution or without
+    # preprocessing information
+    # ----------------------------------------------------------
+    if PreproStateConst in NavSolutionConst[Conf["NAV_SOLUTION"]]:
+        Selected = getPreproSatIdx(ObsInfo) >= 0
+    else:
+        Selected = np.zeros(len(ObsInfo), dtype=bool)
+    PreproObsInfo["RejectionCause"][InView & ~Selected] = \
+        REJECTION_CAUSE["NOT_PREPROCESSED"]
+    InView &= Selected
+
+    # Get measurements
+    for Col in ["C1", "L1", "S1", "P2", "L2", "S2"]:
+        PreproObsInfo[Col][InView] = ObsInfo[Col][InView]
+    PreproObsInfo["L1Meters"] = PreproObsInfo["L1"] * Const.GPS_L1_WAVE
+
+    return PreproObsInfo, InView
+
+# End of initPreproObsInfo()
+
+
+def getThreshold(Conf, Key, Unchecked):
+
+    # Purpose: get the threshold of a check, or a threshold never 
+    #          exceeded if the check is not activated
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # Key: str
+    #         Check [FLAG, VALUE] parameter
+    # Unchecked: float
+    #         Threshold of the check not activated
+
+    # Returns
+    # =======
+    # Threshold: float
+    #         Threshold of the check
+
+    return float(Conf[Key][VALUE]) if Conf[Key][FLAG] == 1 else Unchecked
+
+# End of getThreshold()
+
+
+def getPreproSatParams(Conf):
+
+    # Purpose: get the parameters of the recursion of each satellite
+    #          (see Kernels.preproSatKernel) from the configuration
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+
+    # Returns
+    # =======
+    # Params: tuple
+    #         Parameters of the kernel, from GapTh on
+
+    # Data gap threshold: the gaps between epochs cannot be shorter
+    # than the sampling rate
+    GapTh = float(max(Conf["HATCH_GAP_TH"], Conf["SAMPLING_RATE"]))
+
+    # Number of consecutive epochs to declare a cycle slip
+    CsNEpochs = int(Conf["MIN_NCS_TH"][CSNEPOCHS])
+    if Conf["MIN_NCS_TH"][FLAG] != 1 or CsNEpochs <= 0:
+        CsNEpochs = 0
+
+    return (GapTh, CsNEpochs, float(Conf["MIN_NCS_TH"][TH]),
+    getThreshold(Conf, "MAX_PHASE_RATE", np.inf), 
+    getThreshold(Conf, "MAX_PHASE_RATE_STEP", np.inf),
+    getThreshold(Conf, "MAX_CODE_RATE", np.inf), 
+    getThreshold(Conf, "MAX_CODE_RATE_STEP", np.inf),
+    float(Conf["HATCH_TIME"]), float(Conf["HATCH_STATE_F"]), 
+    float(Conf["HATCH_DIV_TH"]), float(Conf["HATCH_DIV_TIME"]), 
+    PreproCauses)
+
+# End of getPreproSatParams()
+
+
+def getPreproEpochParams(Conf, Rcvr):
+
+    # Purpose: get the parameters of the epoch kernel (see
+    #          Kernels.preproEpochKernel) from the configuration. The
+    #          checks not activated get thresholds never exceeded
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # Rcvr: list
+    #         Receiver information: position, masking angle...
+
+    # Returns
+    # =======
+    # Params: tuple
+    #         Parameters of the kernel, from PreproConst on
+
+    if PreproStateConst in NavSolutionConst[Conf["NAV_SOLUTION"]]:
+        PreproConst = PreproStateConst
+    else:
+        PreproConst = ""
+
+    return (PreproConst, int(Const.MAX_NUM_SATS_CONSTEL), 
+    float(Rcvr[RcvrIdx["MASK"]]), int(Conf["NCHANNELS_GPS"]), 
+    getThreshold(Conf, "MIN_CNR", -np.inf), 
+    getThreshold(Conf, "MAX_PSR_OUTRNG", np.inf),
+    float(Const.GPS_L1_WAVE)) + getPreproSatParams(Conf)
+
+# End of getPreproEpochParams()
+
+
+def runPreProcMeasVector(Conf, Rcvr, ObsInfo, PrevPreproState):
+    
+    # Purpose: preprocess GNSS raw measurements as runPreProcMeas,
+    #          with all the satellites of the epoch in a single kernel
+    #          call (see Kernels.preproEpochKernel), compiled with the
+    #          NUMBA kernel backend. The output is the same
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # Rcvr: list
+    #         Receiver information: position, masking angle...
+    # ObsInfo: numpy structured array
+    #         OBS info for current epoch (ObsDtype)
+    # PrevPreproState: dict
+    #         Preprocessing information of all the satellites
+    #         (see initPreproState)
+
+    # Returns
+    # =======
+    # PreproObsInfo: numpy structured array
+    #         Preprocessed observations for current epoch, one row
+    #         per satellite (PreproObsDtype)
+    
+
+    PreproObsInfo = np.zeros(len(ObsInfo), dtype=PreproObsDtype)
+    runPreproEpoch(ObsInfo, PreproObsInfo, PrevPreproState, 
+    getPreproEpochParams(Conf, Rcvr))
+
+    return PreproObsInfo
+
+# End of function runPreProcMeasVector()
+
+# Batch preprocessing
+#-----------------------------------------------------------------------
+
+def runPreProcMeasBatch(Conf, Rcvr, ObsData, PrevPreproState):
+    
+    # Purpose: preprocess GNSS raw measurements as runPreProcMeas, 
+    #          for a whole day at once. The measurements are checked
+    #          for all the epochs at once when they do not depend on
+    #          the previous ones. The others are pivoted into the time
+    #          series of each satellite, split into arcs at the data
+    #          gaps, and each arc runs the recursion of the satellite
+    #          in a single kernel call. The output is the same
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # Rcvr: list
+    #         Receiver information: position, masking angle...
+    # ObsData: numpy structured array
+    #         OBS data sorted by SoD (ObsDtype)
+    # PrevPreproState: dict
+    #         Preprocessing information of all the satellites
+    #         (see initPreproState)
+
+    # Returns
+    # =======
+    # PreproObsInfo: numpy structured array
+    #         Preprocessed observations, one row per satellite and 
+    #         epoch (PreproObsDtype)
+    
+
+    # Initialize output info and check Minimum Masking angle
+    PreproObsInfo, InView = initPreproObsInfo(Conf, Rcvr, ObsData)
+
+    # Epoch of each row
+    EpochId = np.cumsum(np.concatenate(([False], 
+        ObsData["SOD"][1:] != ObsData["SOD"][:-1]))[:len(ObsData)])
+
+    # Limit the satellites to the Number of Channels
+    # ----------------------------------------------------------
+    Rows = InView.nonzero()[0]
+
+    # Sort the satellites of each epoch by elevation (keeping the order
+    # for equal elevations) and keep the first ones
+    Order = np.lexsort((-ObsData["ELEV"][Rows], EpochId[Rows]))
+    SortedEpochId = EpochId[Rows][Order]
+    Kept = np.empty(len(Rows), dtype=bool)
+    Kept[Order] = np.arange(len(Rows)) - \
+        np.searchsorted(SortedEpochId, SortedEpochId) < int(Conf["NCHANNELS_GPS"])
+
+    # Reject the lowest ones
+    PreproObsInfo["RejectionCause"][Rows[~Kept]] = REJECTION_CAUSE["NCHANNELS_GPS"]
+    Rows = Rows[Kept]
+
+    # Check Minimum Carrier-To-Noise Ratio (CN0)
+    # ----------------------------------------------------------
+    if Conf["MIN_CNR"][FLAG] == 1:
+        MinCnr = PreproObsInfo["S1"][Rows] < Conf["MIN_CNR"][VALUE]
+    else:
+        MinCnr = np.zeros(len(Rows), dtype=bool)
+
+    # Check Pseudo-Range Out of Range
+    # ----------------------------------------------------------
+    if Conf["MAX_PSR_OUTRNG"][FLAG] == 1:
+        MaxPsr = PreproObsInfo["C1"][Rows] > Conf["MAX_PSR_OUTRNG"][VALUE]
+    else:
+        MaxPsr = np.zeros(len(Rows), dtype=bool)
+
+    PreproObsInfo["RejectionCause"][Rows[MaxPsr]] = REJECTION_CAUSE["MAX_PSR_OUTRNG"]
+    PreproObsInfo["RejectionCause"][Rows[MinCnr]] = REJECTION_CAUSE["MIN_CNR"]
+    Rows = Rows[~(MinCnr | MaxPsr)]
+
+    # Pivot the measurements into (satellite x epoch): row of each
+    # satellite and epoch, or -1. Read by satellite, they are the time
+    # series of the satellites
+    # ----------------------------------------------------------
+    Pivot = np.full((Const.MAX_NUM_SATS_CONSTEL, EpochId[-1] + 1 if len(EpochId) else 0),
+        -1, dtype=np.int64)
+    Pivot[ObsData["PRN"][Rows] - 1, EpochId[Rows]] = Rows
+    Rows = Pivot[Pivot >= 0]
+    SatIdx = ObsData["PRN"][Rows] - 1
+    Sod = PreproObsInfo["Sod"][Rows]
+    C1 = PreproObsInfo["C1"][Rows]
+    L1 = PreproObsInfo["L1"][Rows]
+    L1Meters = PreproObsInfo["L1Meters"][Rows]
+
+    # First epoch of each satellite
+    First = np.concatenate(([True], SatIdx[1:] != SatIdx[:-1]))[:len(Rows)]
+
+    # Compute the actual time deltas, and Phase and Code Rates from
+    # the previous epoch of the satellite or, at its first one, from
+    # its preprocessing information (the satellites never tracked may
+    # get null time deltas, but they start a new arc without rates)
+    # ----------------------------------------------------------
+    DeltaT = np.diff(Sod, prepend=0.0)
+    DeltaT[First] = Sod[First] - PrevPreproState["PrevEpoch"][SatIdx[First]]
+    PhaseRate = np.diff(L1Meters, prepend=0.0)
+    PhaseRate[First] = L1Meters[First] - PrevPreproState["PrevL1"][SatIdx[First]]
+    RangeRate = np.diff(C1, prepend=0.0)
+    RangeRate[First] = C1[First] - PrevPreproState["PrevC1"][SatIdx[First]]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        PhaseRate /= DeltaT
+        RangeRate /= DeltaT
+
+    # Split the time series into arcs at the data gaps
+    # ----------------------------------------------------------
+    ArcStart = np.flatnonzero(First | 
+        (DeltaT > max(Conf["HATCH_GAP_TH"], Conf["SAMPLING_RATE"])))
+    ArcEnd = np.append(ArcStart[1:], len(Rows))
+
+    # Run the recursion of each arc: the Hatch filter, the cycle slips
+    # and the rate checks (see Kernels.preproSatKernel)
+    # ----------------------------------------------------------
+    Arc = [Sod, C1, L1, L1Meters, DeltaT, PhaseRate, RangeRate]
+    Outputs = [np.zeros(len(Rows), dtype=int), np.zeros(len(Rows)), 
+    np.zeros(len(Rows), dtype=int), np.zeros(len(Rows)), np.zeros(len(Rows)),
+    np.zeros(len(Rows)), np.zeros(len(Rows))]
+    Params = getPreproSatParams(Conf)
+    for Start, End in zip(ArcStart.tolist(), ArcEnd.tolist()):
+        runPreproArc(PrevPreproState, SatIdx[Start], 
+        [Column[Start:End] for Column in Arc], 
+        [Column[Start:End] for Column in Outputs], Params)
+
+    for Field, Output in zip(["RejectionCause", "SmoothC1", "Status", 
+    "PhaseRateL1", "RangeRateL1", "PhaseRateStepL1", "RangeRateStepL1"], Outputs):
+        PreproObsInfo[Field][Rows] = Output
+
+    PreproObsInfo["ValidL1"] = PreproObsInfo["RejectionCause"] == 0
+
+    return PreproObsInfo
+
+# End of function runPreProcMeasBatch()
+
+
 ########################################################################
 # END OF PREPROCESSING FUNCTIONS MODULE
 ########################################################################
@@ -0,0 +1,483 @@
+#!/usr/bin/env python
+
+########################################################################
+# PETRUS/SRC/Replay.py:
+# This is the Replay Module of PETRUS tool
+# It replays the archived OBS files of the receivers of a scenario as
+# live streams, on their original SoD timeline sped up by a factor,
+# to load the on-line modes (server and follow mode)
+#
+#  Project:        PETRUS
+#  File:           Replay.py
+#  Date(YY/MM/DD): 26/10/17
+#
+#   Author: PETRUS contributors
+#
+# -----------------------------------------------------------------
+# Date       | Author             | Action
+# -----------------------------------------------------------------
+# 26/10/17   | PETRUS contrib.    | Created
+#
+# Usage:
+#   Replay.py $SCEN_PATH $SPEEDUP tcp
+#   Replay.py $SCEN_PATH $SPEEDUP udp
+#   Replay.py $SCEN_PATH $SPEEDUP $OBS_DIR
+#   (SPEEDUP: 1, 10, 100... or 0 to replay as fast as possible.
+#   The streams are sent to the server port of the scenario, or
+#   written as growing OBS files into OBS_DIR, e.g. the INP/OBS
+#   directory of a scenario run in follow mode)
+########################################################################
+
+
+# Import External and Internal functions and Libraries
+#----------------------------------------------------------------------
+import sys, os
+import time
+import asyncio
+from collections import OrderedDict
+from COMMON import GnssConstants as Const
+from COMMON.Dates import convertJulianDay2YearMonthDay
+from COMMON.Dates import convertYearMonthDay2Doy
+from InputOutput import readConf
+from InputOutput import processConf
+from InputOutput import readRcvr
+from InputOutput import findObsFile
+from InputOutput import openObsFile
+from Server import ServerHost, RcvrTag, UdpMaxSize
+
+# Replay settings
+#----------------------------------------------------------------------
+# Replay targets (otherwise, the target is an OBS directory)
+ReplayTargets = ["tcp", "udp"]
+
+# Bytes a receiver buffers while the TCP connection is blocked. The
+# epochs that do not fit are dropped, as a real receiver would do
+ReplayBufferSize = 1 << 20
+
+# Period of the progress report [s]
+ReplayReportPeriod = 10.0
+
+# Replay functions
+#----------------------------------------------------------------------
+def getReplayDays(Scen, Conf, Rcvr):
+
+    # Purpose: get the OBS files of a receiver to be replayed, in the
+    #          dates of the configuration
+
+    # Parameters
+    # ==========
+    # Scen: str
+    #         Path to scenario
+    # Conf: dict
+    #         Configuration dictionary
+    # Rcvr: str
+    #         Receiver acronym
+
+    # Returns
+    # =======
+    # Days: list
+    #         (Day, Year, Doy, ObsFile) of each day with an OBS file,
+    #         Day being the number of days from the first date
+
+    Days = []
+    for Jd in range(Conf["INI_DATE_JD"], Conf["END_DATE_JD"] + 1):
+        Year, Month, Day = convertJulianDay2YearMonthDay(Jd)
+        Doy = convertYearMonthDay2Doy(Year, Month, Day)
+        ObsFile = findObsFile(Scen + '/INP/OBS/' + \
+            "OBS_%s_Y%02dD%03d.dat" % (Rcvr, Year % 100, Doy))
+        if os.path.exists(ObsFile):
+            Days.append((Jd - Conf["INI_DATE_JD"], Year, Doy, ObsFile))
+
+    return Days
+
+# End of getReplayDays()
+
+
+def readReplayEpochs(ObsFile):
+
+    # Purpose: read an OBS file as the raw text of its epochs, so that
+    #          they are replayed exactly as they were logged
+
+    # Parameters
+    # ==========
+    # ObsFile: str
+    #         Path to OBS file (it may be compressed)
+
+    # Returns
+    # =======
+    # Header: str
+    #         Header lines
+    # Epochs: list
+    #         (Sod, Text) of each epoch, in order
+
+    Header = ""
+    Epochs = []
+    with openObsFile(ObsFile) as f:
+        Lines = f.read().splitlines(True)
+
+    # Group the lines by SoD
+    EpochLines = []
+    EpochSod = None
+    for Line in Lines:
+        if Line.startswith('#'):
+            Header = Header + Line
+            continue
+        Fields = Line.split(None, 1)
+        if not Fields:
+            continue
+        if Fields[0] != EpochSod:
+            if EpochLines:
+                Epochs.append((float(EpochSod), "".join(EpochLines)))
+            EpochLines = []
+            EpochSod = Fields[0]
+        EpochLines.append(Line)
+    if EpochLines:
+        Epochs.append((float(EpochSod), "".join(EpochLines)))
+
+    return Header, Epochs
+
+# End of readReplayEpochs()
+
+
+def initReplayStats():
+
+    # Purpose: initialize the statistics of a replayed receiver
+
+    # Returns
+    # =======
+    # Stats: dict
+    #         EPOCHS, DROPPED: epochs sent and dropped
+    #         BYTES: bytes sent
+    #         LAG_MAX: maximum delay of an epoch on its schedule [s]
+    #         TIMELINE: timeline replayed [s]
+
+    return OrderedDict([("EPOCHS", 0), ("DROPPED", 0), ("BYTES", 0),
+    ("LAG_MAX", 0.0), ("TIMELINE", 0.0)])
+
+# End of initReplayStats()
+
+
+def formatReplayStats(Name, Stats, Elapsed):
+
+    # Purpose: format the statistics of the replay
+
+    # Parameters
+    # ==========
+    # Name: str
+    #         Receiver acronym, or "TOTAL"
+    # Stats: dict
+    #         Replay statistics (see initReplayStats)
+    # Elapsed: float
+    #         Time since the start of the replay [s]
+
+    # Returns
+    # =======
+    # Line: str
+    #         Statistics report
+
+    Elapsed = max(Elapsed, 1e-9)
+
+    return "%s: %d epochs (%.1f epochs/s, %.1f kB/s, x%.1f), "\
+        "%d dropped, lag max %.1f ms" % (Name, Stats["EPOCHS"],
+        Stats["EPOCHS"] / Elapsed, Stats["BYTES"] / Elapsed / 1000.0,
+        Stats["TIMELINE"] / Elapsed, Stats["DROPPED"],
+        Stats["LAG_MAX"] * 1000.0)
+
+# End of formatReplayStats()
+
+
+async def openReplayTarget(Target, Port, Rcvr):
+
+    # Purpose: open the stream of a receiver
+
+    # Parameters
+    # ==========
+    # Target: str
+    #         "tcp", "udp" or path to OBS directory
+    # Port: int
+    #         Server port
+    # Rcvr: str
+    #         Receiver acronym
+
+    # Returns
+    # =======
+    # Stream: dict
+    #         Stream of the receiver:
+    #         Stream["READER"], ["WRITER"]: TCP streams (tcp)
+    #         Stream["TRANSPORT"]: UDP transport (udp)
+    #         Stream["FILE"]: OBS file being written (OBS directory)
+
+    Stream = {"READER": None, "WRITER": None, "TRANSPORT": None, "FILE": None}
+
+    if Target == "tcp":
+        Stream["READER"], Stream["WRITER"] = \
+            await asyncio.open_connection(ServerHost, Port)
+        Stream["WRITER"].write(("%s %s\n" % (RcvrTag, Rcvr)).encode())
+
+    elif Target == "udp":
+        Stream["TRANSPORT"], Protocol = await asyncio.get_running_loop().\
+            create_datagram_endpoint(asyncio.DatagramProtocol,
+            remote_addr=(ServerHost, Port))
+
+    return Stream
+
+# End of openReplayTarget()
+
+
+def sendReplayEpoch(Stream, Rcvr, Text, Stats):
+
+    # Purpose: send an epoch to the stream of a receiver, or drop it if
+    #          the receiver buffer is full
+
+    # Parameters
+    # ==========
+    # Stream: dict
+    #         Stream of the receiver (see openReplayTarget)
+    # Rcvr: str
+    #         Receiver acronym
+    # Text: str
+    #         OBS lines of the epoch
+    # Stats: dict
+    #         Replay statistics of the receiver (see initReplayStats)
+
+    # Returns
+    # =======
+    # Nothing
+
+    Data = Text.encode()
+
+    # TCP: buffer the epoch while the server accepts it
+    if Stream["WRITER"] is not None:
+        if Stream["WRITER"].transport.get_write_buffer_size() > ReplayBufferSize:
+            Stats["DROPPED"] += 1
+            return
+        Stream["WRITER"].write(Data)
+
+    # UDP: one datagram per epoch (or more if it does not fit in one)
+    elif Stream["TRANSPORT"] is not None:
+        Tag = ("%s %s\n" % (RcvrTag, Rcvr)).encode()
+        Start = 0
+        while Start < len(Data):
+            End = Data.rfind(b'\n', Start, Start + UdpMaxSize - len(Tag)) + 1
+            if End <= Start:
+                End = len(Data)
+            Stream["TRANSPORT"].sendto(Tag + Data[Start:End])
+            Start = End
+
+    # Growing file: append the epoch and make it visible
+    else:
+        Stream["FILE"].write(Data)
+        Stream["FILE"].flush()
+
+    Stats["EPOCHS"] += 1
+    Stats["BYTES"] += len(Data)
+
+# End of sendReplayEpoch()
+
+
+async def replayRcvr(Target, Port, Rcvr, Days, Speedup, Start, Stats):
+
+    # Purpose: replay the OBS files of a receiver on its timeline
+
+    # Parameters
+    # ==========
+    # Target: str
+    #         "tcp", "udp" or path to OBS directory
+    # Port: int
+    #         Server port
+    # Rcvr: str
+    #         Receiver acronym
+    # Days: list
+    #         OBS files to be replayed (see getReplayDays)
+    # Speedup: float
+    #         Speed-up of the timeline, or 0 to replay as fast as possible
+    # Start: float
+    #         Time when the first SoD of the first day is replayed
+    #         (time.perf_counter())
+    # Stats: dict
+    #         Replay statistics of the receiver (see initReplayStats)
+
+    # Returns
+    # =======
+    # Nothing
+
+    Stream = await openReplayTarget(Target, Port, Rcvr)
+
+    # Loop over days, reading each one in the background
+    for Day, Year, Doy, ObsFile in Days:
+        Header, Epochs = await asyncio.to_thread(readReplayEpochs, ObsFile)
+
+        # Start the OBS file of the day
+        if Target not in ReplayTargets:
+            if Stream["FILE"] is not None:
+                Stream["FILE"].close()
+            Stream["FILE"] = open(Target + '/' + \
+                os.path.basename(ObsFile).split(".dat")[0] + ".dat", 'wb')
+            Stream["FILE"].write(Header.encode())
+
+        # Loop over epochs
+        for Sod, Text in Epochs:
+            Stats["TIMELINE"] = Day * Const.S_IN_D + Sod
+
+            # Wait for the epoch on the timeline
+            if Speedup > 0:
+                Delay = Start + Stats["TIMELINE"] / Speedup - time.perf_counter()
+                if Delay > 0:
+                    await asyncio.sleep(Delay)
+                Stats["LAG_MAX"] = max(Stats["LAG_MAX"], -Delay)
+
+            sendReplayEpoch(Stream, Rcvr, Text, Stats)
+
+            # As fast as possible: wait for the server instead of dropping
+            if Speedup == 0:
+                if Stream["WRITER"] is not None:
+                    await Stream["WRITER"].drain()
+                else:
+                    await asyncio.sleep(0)
+
+    # End the stream, waiting for the server to process it
+    if Stream["WRITER"] is not None:
+        Stream["WRITER"].write_eof()
+        Reply = await Stream["READER"].read()
+        if Reply:
+            sys.stderr.write(Reply.decode())
+        Stream["WRITER"].close()
+    if Stream["TRANSPORT"] is not None:
+        Stream["TRANSPORT"].close()
+    if Stream["FILE"] is not None:
+        Stream["FILE"].close()
+
+# End of replayRcvr()
+
+
+def sumReplayStats(Stats):
+
+    # Purpose: add up the statistics of all the replayed receivers
+
+    # Parameters
+    # ==========
+    # Stats: dict
+    #         Replay statistics of each receiver (see initReplayStats)
+
+    # Returns
+    # =======
+    # Total: dict
+    #         Replay statistics of all of them. The timeline is the
+    #         one of the receiver most behind
+
+    Total = initReplayStats()
+    for RcvrStats in Stats.values():
+        for Key in ["EPOCHS", "DROPPED", "BYTES"]:
+            Total[Key] += RcvrStats[Key]
+        Total["LAG_MAX"] = max(Total["LAG_MAX"], RcvrStats["LAG_MAX"])
+    if len(Stats) != 0:
+        Total["TIMELINE"] = min([RcvrStats["TIMELINE"] \
+            for RcvrStats in Stats.values()])
+
+    return Total
+
+# End of sumReplayStats()
+
+
+async def runReplay(Scen, Speedup, Target):
+
+    # Purpose: replay the OBS files of all the receivers of a scenario
+    #          and report the rate achieved
+
+    # Parameters
+    # ==========
+    # Scen: str
+    #         Path to scenario
+    # Speedup: float
+    #         Speed-up of the timeline, or 0 to replay as fast as possible
+    # Target: str
+    #         "tcp", "udp" or path to OBS directory
+
+    # Returns
+    # =======
+    # Stats: dict
+    #         Replay statistics of each receiver (see initReplayStats)
+
+    Conf = processConf(readConf(Scen + '/CFG/petrus.cfg'))
+    RcvrInfo = readRcvr(Scen + '/INP/RCVR/' + Conf["RCVR_FILE"])
+    Port = int(Conf["SERVER"][0])
+
+    # Get the OBS files of the receivers
+    RcvrDays = OrderedDict({})
+    for Rcvr in RcvrInfo:
+        RcvrDays[Rcvr] = getReplayDays(Scen, Conf, Rcvr)
+        if len(RcvrDays[Rcvr]) == 0:
+            print("WARNING: No OBS files of receiver %s: skipped" % Rcvr)
+            del RcvrDays[Rcvr]
+
+    print("INFO: Replaying %d receivers at %s to %s" % (len(RcvrDays),
+    "x%g" % Speedup if Speedup > 0 else "full speed", Target))
+
+    # Replay all the receivers on the same timeline, starting at
+    # SoD 0 of the first day
+    Stats = OrderedDict([(Rcvr, initReplayStats()) for Rcvr in RcvrDays])
+    Start = time.perf_counter()
+    Replays = asyncio.gather(*[replayRcvr(Target, Port, Rcvr, Days,
+    Speedup, Start, Stats[Rcvr]) for Rcvr, Days in RcvrDays.items()])
+
+    # Report the progress periodically
+    while True:
+        try:
+            await asyncio.wait_for(asyncio.shield(Replays), ReplayReportPeriod)
+            break
+        except asyncio.TimeoutError:
+            print("INFO: " + formatReplayStats("TOTAL",
+            sumReplayStats(Stats), time.perf_counter() - Start))
+
+    # Report the rate achieved
+    Elapsed = time.perf_counter() - Start
+    for Rcvr, RcvrStats in Stats.items():
+        print("INFO: " + formatReplayStats(Rcvr, RcvrStats, Elapsed))
+    print("INFO: " + formatReplayStats("TOTAL", sumReplayStats(Stats), Elapsed))
+
+    return Stats
+
+# End of runReplay()
+
+
+#----------------------------------------------------------------------
+# INTERNAL FUNCTIONS
+#----------------------------------------------------------------------
+
+def displayUsage():
+    sys.stderr.write("ERROR: Please provide path to SCENARIO, speed-up "\
+        "(0 for full speed) and target:\n"\
+        "  Replay.py $SCEN_PATH $SPEEDUP tcp\n"\
+        "  Replay.py $SCEN_PATH $SPEEDUP udp\n"\
+        "  Replay.py $SCEN_PATH $SPEEDUP $OBS_DIR\n")
+
+#######################################################
+# MAIN BODY
+#######################################################
+
+if __name__ == "__main__":
+    # Check InputOutput Arguments
+    if len(sys.argv) != 4:
+        displayUsage()
+        sys.exit(-1)
+
+    # Extract the arguments
+    Scen = sys.argv[1]
+    try:
+        Speedup = float(sys.argv[2])
+    except ValueError:
+        Speedup = -1
+    Target = sys.argv[3]
+    if Speedup < 0 or (Target not in ReplayTargets and not os.path.isdir(Target)):
+        displayUsage()
+        sys.exit(-1)
+
+    # Replay the OBS files
+    try:
+        asyncio.run(runReplay(Scen, Speedup, Target))
+    except KeyboardInterrupt:
+        print("INFO: Replay stopped")
+
+########################################################################
+# END OF REPLAY MODULE
+########################################################################
@@ -0,0 +1,636 @@
+#!/usr/bin/env python
+
+########################################################################
+# PETRUS/SRC/Server.py:
+# This is the Server Module of PETRUS tool
+# It receives the live OBS streams of several receivers over local
+# TCP or UDP and preprocesses them in a pool of worker processes,
+# each receiver keeping its own preprocessing state
+#
+#  Project:        PETRUS
+#  File:           Server.py
+#  Date(YY/MM/DD): 26/10/17
+#
+#   Author: PETRUS contributors
+#
+# -----------------------------------------------------------------
+# Date       | Author             | Action
+# -----------------------------------------------------------------
+# 26/10/17   | PETRUS contrib.    | Created
+#
+# Usage:
+#   Server.py $SCEN_PATH
+#   Server.py $SCEN_PATH client $RCVR $OBS_FILE
+#   (the client streams an OBS file to the server as a receiver would)
+#
+# Protocol:
+#   TCP: one connection per receiver. The first line is
+#   "#RCVR <ACRONYM>", followed by the OBS lines in the OBS file format
+#   (the OBS header line may be sent too). The end of the connection
+#   ends the stream
+#   UDP: each datagram starts with the "#RCVR <ACRONYM>" line,
+#   followed by complete OBS lines
+########################################################################
+
+
+# Import External and Internal functions and Libraries
+#----------------------------------------------------------------------
+import sys, os
+import time
+import datetime
+import zlib
+import asyncio
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from COMMON import GnssConstants as Const
+from InputOutput import readConf
+from InputOutput import processConf
+from InputOutput import readRcvr
+from InputOutput import buildObsFilter
+from InputOutput import parseObsLines
+from InputOutput import computeObsEpochIdx
+from InputOutput import iterObsEpochs
+from InputOutput import createOutputFile
+from InputOutput import PreproCompression
+from InputOutput import formatPreproRows
+from InputOutput import getPreproLayout
+from InputOutput import ObsDtype
+from InputOutput import ObsIdx
+from Preprocessing import runPreProcMeas
+from Preprocessing import runPreProcMeasVector
+from Preprocessing import runPreProcMeasBatch
+from Preprocessing import initPreproState
+from Preprocessing import shiftPreproState
+from Kernels import setKernelBackend
+
+# Server settings
+#----------------------------------------------------------------------
+# Host the server listens on (local only)
+ServerHost = "127.0.0.1"
+
+# First line of each stream
+RcvrTag = "#RCVR"
+
+# Bytes read at once from a TCP connection
+ServerChunkSize = 1 << 16
+
+# Period of the metrics report [s]
+MetricsPeriod = 10.0
+
+# Maximum size of a UDP datagram
+UdpMaxSize = 65507
+
+# Worker processes
+#----------------------------------------------------------------------
+# Each worker process keeps the sessions of the receivers assigned to
+# it: configuration and receivers are read once when it starts
+WorkerScen = None
+WorkerConf = None
+WorkerRcvrInfo = None
+WorkerPreproLayout = None
+WorkerSessions = {}
+
+def initServerWorker(Scen):
+
+    # Purpose: initialize a worker process of the server
+
+    # Parameters
+    # ==========
+    # Scen: str
+    #         Path to scenario
+
+    # Returns
+    # =======
+    # Nothing
+
+    global WorkerScen, WorkerConf, WorkerRcvrInfo, WorkerPreproLayout
+
+    WorkerScen = Scen
+    WorkerConf = processConf(readConf(Scen + '/CFG/petrus.cfg'))
+    WorkerRcvrInfo = readRcvr(Scen + '/INP/RCVR/' + WorkerConf["RCVR_FILE"])
+    WorkerPreproLayout = getPreproLayout(WorkerConf)
+    setKernelBackend(WorkerConf["PREPRO_KERNELS"])
+
+# End of initServerWorker()
+
+
+def openRcvrDay(Session, Rcvr, Year, Doy):
+
+    # Purpose: start a new day of a receiver session: open its PREPRO
+    #          OBS file and refer the preprocessing state to it
+
+    # Parameters
+    # ==========
+    # Session: dict
+    #         Receiver session (see processRcvrLines)
+    # Rcvr: str
+    #         Receiver acronym
+    # Year, Doy: int
+    #         Year and Day of Year
+
+    # Returns
+    # =======
+    # Nothing
+
+    DayNumber = datetime.date(Year, 1, 1).toordinal() + Doy - 1
+
+    # Close the PREPRO OBS file of the previous day
+    if Session["FILE"] is not None:
+        Session["FILE"].close()
+        Session["FILE"] = None
+
+    # Carry the preprocessing state to the new day
+    if Session["DAY"] is not None:
+        shiftPreproState(Session["STATE"],
+        -Const.S_IN_D * (DayNumber - Session["DAY"]))
+    Session["DAY"] = DayNumber
+
+    # Create the PREPRO OBS file
+    if WorkerConf["PREPRO_OUT"] == 1:
+        Session["FILE"] = createOutputFile(WorkerScen + \
+            '/OUT/PPVE/' + "PREPRO_OBS_%s_Y%02dD%03d.dat" % \
+                (Rcvr, Year % 100, Doy) + \
+                    PreproCompression[WorkerConf["PREPRO_COMPRESS"][0]], 
+            WorkerPreproLayout["HDR"], WorkerConf["PREPRO_COMPRESS"][1])
+
+# End of openRcvrDay()
+
+
+def processRcvrLines(Rcvr, Lines, EndOfStream):
+
+    # Purpose: preprocess the OBS lines received from a receiver, in
+    #          a worker process. The last epoch is kept until the next
+    #          lines show it is complete, or the stream ends
+
+    # Parameters
+    # ==========
+    # Rcvr: str
+    #         Receiver acronym
+    # Lines: list
+    #         OBS lines, in order
+    # EndOfStream: bool
+    #         True if no more lines will be received in this stream
+
+    # Returns
+    # =======
+    # NEpochs: int
+    #         Number of epochs preprocessed
+
+    # Get the receiver session, or start it
+    if Rcvr not in WorkerSessions:
+        # The stream may go over several days, so the year is needed too
+        ObsFilter = buildObsFilter(WorkerConf, WorkerRcvrInfo[Rcvr])
+        ObsFilter["COLS"] = [Col for Col in ObsIdx \
+            if Col in ObsFilter["COLS"] or Col == "YEAR"]
+        WorkerSessions[Rcvr] = {
+            "STATE": initPreproState(WorkerConf),      # Preprocessing state
+            "FILTER": ObsFilter,                        # OBS filter
+            "PENDING": np.zeros(0, dtype=ObsDtype),     # Last epoch
+            "DAY": None,                                # Current day
+            "FILE": None,                               # PREPRO OBS file
+        }
+    Session = WorkerSessions[Rcvr]
+
+    # Parse the lines and prepend the pending epoch
+    Lines = [Line for Line in Lines if Line.strip() and not Line.startswith('#')]
+    if len(Lines) != 0:
+        ObsData = np.concatenate((Session["PENDING"],
+        parseObsLines(Lines, Session["FILTER"])))
+    else:
+        ObsData = Session["PENDING"]
+
+    # Keep the last epoch, unless the stream ends
+    EpochIdx = computeObsEpochIdx(ObsData)
+    NComplete = len(EpochIdx) - 1 if EndOfStream else max(len(EpochIdx) - 2, 0)
+    Session["PENDING"] = ObsData[EpochIdx[NComplete]:]
+    ObsData = ObsData[:EpochIdx[NComplete]]
+
+    # Loop over the days of the complete epochs
+    DayIdx = np.flatnonzero((ObsData["DOY"][1:] != ObsData["DOY"][:-1]) | \
+        (ObsData["YEAR"][1:] != ObsData["YEAR"][:-1])) + 1
+    for DayData in np.split(ObsData, DayIdx):
+        if len(DayData) == 0:
+            continue
+
+        # Start the new day, if needed
+        Year, Doy = int(DayData["YEAR"][0]), int(DayData["DOY"][0])
+        if Session["DAY"] != datetime.date(Year, 1, 1).toordinal() + Doy - 1:
+            openRcvrDay(Session, Rcvr, Year, Doy)
+
+        # Preprocess OBS measurements
+        if WorkerConf["PREPRO_ENGINE"] == "BATCH":
+            PreproObsInfos = [runPreProcMeasBatch(WorkerConf,
+            WorkerRcvrInfo[Rcvr], DayData, Session["STATE"])]
+        else:
+            if WorkerConf["PREPRO_ENGINE"] == "VECTOR":
+                runEngine = runPreProcMeasVector
+            else:
+                runEngine = runPreProcMeas
+            PreproObsInfos = [runEngine(WorkerConf, WorkerRcvrInfo[Rcvr],
+            EpochInfo, Session["STATE"])
+            for EpochInfo in iterObsEpochs(DayData, computeObsEpochIdx(DayData))]
+
+        # Generate output file, with a single write for the whole batch
+        if Session["FILE"] is not None:
+            Session["FILE"].write("".join([formatPreproRows(PreproObsInfo, 
+                WorkerPreproLayout) for PreproObsInfo in PreproObsInfos]))
+            Session["FILE"].flush()
+
+    return NComplete
+
+# End of processRcvrLines()
+
+
+# Server
+#----------------------------------------------------------------------
+def initRcvrMetrics():
+
+    # Purpose: initialize the metrics of a receiver stream
+
+    # Returns
+    # =======
+    # Metrics: dict
+    #         BYTES, LINES, EPOCHS: received bytes and lines, and
+    #         preprocessed epochs
+    #         BATCHES, DROPPED: batches of lines sent to the workers,
+    #         and dropped (UDP, workers busy)
+    #         IN_FLIGHT: batches sent to the workers and not done yet
+    #         LAG_SUM, LAG_MAX: sum and maximum of the time from the
+    #         reception of a batch to its output [s]
+    #         START: start time of the stream
+
+    return OrderedDict([("BYTES", 0), ("LINES", 0), ("EPOCHS", 0),
+    ("BATCHES", 0), ("DROPPED", 0), ("IN_FLIGHT", 0), ("LAG_SUM", 0.0),
+    ("LAG_MAX", 0.0), ("START", time.perf_counter())])
+
+# End of initRcvrMetrics()
+
+
+def formatRcvrMetrics(Rcvr, Metrics):
+
+    # Purpose: format the metrics of a receiver stream
+
+    # Parameters
+    # ==========
+    # Rcvr: str
+    #         Receiver acronym
+    # Metrics: dict
+    #         Metrics of the receiver stream (see initRcvrMetrics)
+
+    # Returns
+    # =======
+    # Line: str
+    #         Metrics report
+
+    Elapsed = max(time.perf_counter() - Metrics["START"], 1e-9)
+    Done = max(Metrics["BATCHES"] - Metrics["IN_FLIGHT"], 1)
+
+    return "%s: %.1f kB/s %.0f lines/s %.1f epochs/s, lag mean %.1f ms "\
+        "max %.1f ms, %d in flight, %d dropped" % (Rcvr,
+        Metrics["BYTES"] / Elapsed / 1000.0, Metrics["LINES"] / Elapsed,
+        Metrics["EPOCHS"] / Elapsed, Metrics["LAG_SUM"] / Done * 1000.0,
+        Metrics["LAG_MAX"] * 1000.0, Metrics["IN_FLIGHT"], Metrics["DROPPED"])
+
+# End of formatRcvrMetrics()
+
+
+def submitRcvrLines(Server, Rcvr, Lines, EndOfStream):
+
+    # Purpose: send OBS lines of a receiver to its worker process
+
+    # Parameters
+    # ==========
+    # Server: dict
+    #         Server state (see runServer)
+    # Rcvr: str
+    #         Receiver acronym
+    # Lines: list
+    #         OBS lines, in order
+    # EndOfStream: bool
+    #         True if no more lines will be received in this stream
+
+    # Returns
+    # =======
+    # Future: asyncio future
+    #         Done when the lines are preprocessed
+
+    Metrics = Server["METRICS"][Rcvr]
+    Metrics["LINES"] += len(Lines)
+    Metrics["BATCHES"] += 1
+    Metrics["IN_FLIGHT"] += 1
+    StartTime = time.perf_counter()
+
+    # Each receiver is always sent to the same worker, which keeps its
+    # state and runs its batches in order
+    Workers = Server["WORKERS"]
+    Worker = Workers[zlib.crc32(Rcvr.encode()) % len(Workers)]
+    Future = asyncio.get_running_loop().run_in_executor(Worker,
+    processRcvrLines, Rcvr, Lines, EndOfStream)
+
+    # Update the metrics when done
+    def done(Future):
+        Lag = time.perf_counter() - StartTime
+        Metrics["IN_FLIGHT"] -= 1
+        Metrics["LAG_SUM"] += Lag
+        Metrics["LAG_MAX"] = max(Metrics["LAG_MAX"], Lag)
+        if Future.exception() is not None:
+            sys.stderr.write("ERROR: Receiver %s: %s\n" % (Rcvr, Future.exception()))
+        else:
+            Metrics["EPOCHS"] += Future.result()
+
+    Future.add_done_callback(done)
+
+    return Future
+
+# End of submitRcvrLines()
+
+
+def parseRcvrTag(Line, Server):
+
+    # Purpose: get the receiver of a stream from its first line
+
+    # Parameters
+    # ==========
+    # Line: str
+    #         First line of the stream
+    # Server: dict
+    #         Server state (see runServer)
+
+    # Returns
+    # =======
+    # Rcvr: str
+    #         Receiver acronym, or None if unknown
+
+    Fields = Line.split()
+    if len(Fields) != 2 or Fields[0] != RcvrTag or \
+        Fields[1] not in Server["RCVR_INFO"]:
+        return None
+
+    return Fields[1]
+
+# End of parseRcvrTag()
+
+
+async def handleTcpStream(Server, Reader, Writer):
+
+    # Purpose: receive the OBS stream of a receiver over TCP. When its
+    #          worker process is behind, reading stops, so that TCP
+    #          slows the receiver down (backpressure)
+
+    # Parameters
+    # ==========
+    # Server: dict
+    #         Server state (see runServer)
+    # Reader, Writer: asyncio streams
+    #         TCP connection
+
+    # Returns
+    # =======
+    # Nothing
+
+    # Get the receiver
+    Rcvr = parseRcvrTag((await Reader.readline()).decode(), Server)
+    if Rcvr is None or Rcvr in Server["STREAMS"]:
+        Writer.write(b"ERROR: Unknown or already connected receiver\n")
+        await Writer.drain()
+        Writer.close()
+        return
+    Server["STREAMS"].add(Rcvr)
+    Metrics = Server["METRICS"].setdefault(Rcvr, initRcvrMetrics())
+    print("INFO: Receiver %s connected over TCP" % Rcvr)
+
+    # Loop over the chunks received
+    InFlight = []
+    Rest = b""
+    try:
+        while True:
+            Chunk = await Reader.read(ServerChunkSize)
+            if not Chunk:
+                break
+            Metrics["BYTES"] += len(Chunk)
+
+            # Send the complete lines to the worker process
+            Chunk = Rest + Chunk
+            EndOfLines = Chunk.rfind(b'\n')
+            Rest = Chunk[EndOfLines + 1:]
+            if EndOfLines >= 0:
+                InFlight.append(submitRcvrLines(Server, Rcvr,
+                Chunk[:EndOfLines].decode().splitlines(), False))
+
+            # Backpressure: wait for the oldest batches
+            while len(InFlight) >= Server["CONF"]["SERVER"][2]:
+                await InFlight.pop(0)
+
+        # Send the last line, which ends the stream
+        InFlight.append(submitRcvrLines(Server, Rcvr,
+        Rest.decode().splitlines(), True))
+        await asyncio.gather(*InFlight)
+
+    # A batch failed in the worker (already reported): end the stream
+    except Exception as Error:
+        Writer.write(("ERROR: Receiver %s: %s\n" % (Rcvr, Error)).encode())
+
+    finally:
+        Server["STREAMS"].discard(Rcvr)
+        Writer.close()
+        print("INFO: Receiver %s disconnected: %s" %
+        (Rcvr, formatRcvrMetrics(Rcvr, Metrics)))
+
+# End of handleTcpStream()
+
+
+class UdpStreams(asyncio.DatagramProtocol):
+
+    # Purpose: receive the OBS streams of the receivers over UDP. UDP
+    #          cannot slow the receivers down, so the datagrams of a
+    #          receiver whose worker process is behind are dropped
+
+    def __init__(self, Server):
+        self.Server = Server
+
+    def datagram_received(self, Data, Addr):
+        Lines = Data.decode().splitlines()
+        Rcvr = parseRcvrTag(Lines[0], self.Server) if Lines else None
+        if Rcvr is None:
+            return
+        Metrics = self.Server["METRICS"].setdefault(Rcvr, initRcvrMetrics())
+        Metrics["BYTES"] += len(Data)
+
+        # Drop the datagram if the worker is behind
+        if Metrics["IN_FLIGHT"] >= self.Server["CONF"]["SERVER"][2]:
+            Metrics["DROPPED"] += 1
+            return
+
+        submitRcvrLines(self.Server, Rcvr, Lines[1:], False)
+
+# End of class UdpStreams
+
+
+async def reportMetrics(Server):
+
+    # Purpose: report the metrics of the receiver streams periodically
+
+    # Parameters
+    # ==========
+    # Server: dict
+    #         Server state (see runServer)
+
+    # Returns
+    # =======
+    # Nothing
+
+    while True:
+        await asyncio.sleep(MetricsPeriod)
+        for Rcvr, Metrics in Server["METRICS"].items():
+            print("INFO: " + formatRcvrMetrics(Rcvr, Metrics))
+
+# End of reportMetrics()
+
+
+async def runServer(Scen, Started=None):
+
+    # Purpose: run the server until it is cancelled
+
+    # Parameters
+    # ==========
+    # Scen: str
+    #         Path to scenario
+    # Started: asyncio event
+    #         Set once the server listens
+
+    # Returns
+    # =======
+    # Nothing
+
+    # Server state
+    Conf = processConf(readConf(Scen + '/CFG/petrus.cfg'))
+    Server = {
+        "CONF": Conf,                           # Configuration
+        "RCVR_INFO": readRcvr(Scen + '/INP/RCVR/' + Conf["RCVR_FILE"]),
+        "WORKERS": [ProcessPoolExecutor(1,      # Worker processes
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=initServerWorker, initargs=(Scen,))
+        for i in range(int(Conf["SERVER"][1]))],
+        "STREAMS": set(),                       # Receivers connected
+        "METRICS": OrderedDict({}),             # Metrics per receiver
+    }
+
+    # Start the worker processes before listening. They are spawned,
+    # not forked, so that they never hold the connections open
+    await asyncio.gather(*[asyncio.get_running_loop().run_in_executor(
+    Worker, os.getpid) for Worker in Server["WORKERS"]])
+
+    # Listen to TCP and UDP
+    Port = int(Conf["SERVER"][0])
+    TcpServer = await asyncio.start_server(
+        lambda Reader, Writer: handleTcpStream(Server, Reader, Writer),
+        ServerHost, Port)
+    UdpTransport, UdpProtocol = await asyncio.get_running_loop().\
+        create_datagram_endpoint(lambda: UdpStreams(Server),
+        local_addr=(ServerHost, Port))
+    print("INFO: Listening on %s:%d (TCP and UDP) with %d workers" %
+    (ServerHost, Port, len(Server["WORKERS"])))
+    if Started is not None:
+        Started.set()
+
+    try:
+        async with TcpServer:
+            await asyncio.gather(TcpServer.serve_forever(), reportMetrics(Server))
+
+    finally:
+        UdpTransport.close()
+        for Worker in Server["WORKERS"]:
+            Worker.shutdown()
+
+# End of runServer()
+
+
+async def sendObsFile(Port, Rcvr, ObsFile):
+
+    # Purpose: stream an OBS file to the server over TCP as a receiver
+    #          would (local client stand-in)
+
+    # Parameters
+    # ==========
+    # Port: int
+    #         Server port
+    # Rcvr: str
+    #         Receiver acronym
+    # ObsFile: str
+    #         Path to OBS file
+
+    # Returns
+    # =======
+    # Sent: int
+    #         Number of bytes sent
+
+    Reader, Writer = await asyncio.open_connection(ServerHost, Port)
+    Writer.write(("%s %s\n" % (RcvrTag, Rcvr)).encode())
+    Sent = 0
+    with open(ObsFile, 'rb') as f:
+        Chunk = f.read(ServerChunkSize)
+        while Chunk:
+            Writer.write(Chunk)
+            Sent = Sent + len(Chunk)
+
+            # Wait while the server is behind
+            await Writer.drain()
+            Chunk = f.read(ServerChunkSize)
+
+    # End the stream and wait for the server to close it
+    Writer.write_eof()
+    Reply = await Reader.read()
+    if Reply:
+        sys.stderr.write(Reply.decode())
+    Writer.close()
+
+    return Sent
+
+# End of sendObsFile()
+
+
+#----------------------------------------------------------------------
+# INTERNAL FUNCTIONS
+#----------------------------------------------------------------------
+
+def displayUsage():
+    sys.stderr.write("ERROR: Please provide path to SCENARIO and, "\
+        "to run a client, the receiver and OBS file to stream:\n"\
+        "  Server.py $SCEN_PATH\n"\
+        "  Server.py $SCEN_PATH client $RCVR $OBS_FILE\n")
+
+#######################################################
+# MAIN BODY
+#######################################################
+
+if __name__ == "__main__":
+    # Check InputOutput Arguments
+    if len(sys.argv) not in [2, 5] or \
+        (len(sys.argv) == 5 and sys.argv[2] != "client"):
+        displayUsage()
+        sys.exit(-1)
+
+    # Extract the arguments
+    Scen = sys.argv[1]
+
+    # Run the server
+    if len(sys.argv) == 2:
+        try:
+            asyncio.run(runServer(Scen))
+        except KeyboardInterrupt:
+            print("INFO: Server stopped")
+
+    # Or a client
+    else:
+        Conf = processConf(readConf(Scen + '/CFG/petrus.cfg'))
+        StartTime = time.perf_counter()
+        Sent = asyncio.run(sendObsFile(int(Conf["SERVER"][0]),
+        sys.argv[3], sys.argv[4]))
+        print("INFO: %d bytes sent in %.2f s" %
+        (Sent, time.perf_counter() - StartTime))
+
+########################################################################
+# END OF SERVER MODULE
+########################################################################